@@ -0,0 +1,336 @@
+# aggregates.py
+
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Min, Q, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, Least
+
+from .models import AnalyticsAggregate, Student, StudentGrade
+
+
+class Dimension:
+    """Описание накапливаемого агрегата: модель, поле-ключ и суммируемое поле."""
+
+    def __init__(self, name: str, model, key_field: str, value_field: Optional[str] = None, key_type=str):
+        self.name = name
+        self.model = model
+        self.key_field = key_field
+        self.value_field = value_field
+        self.key_type = key_type
+
+    def value(self, instance) -> float:
+        # Для подсчёта количества (без value_field) каждая запись даёт 1
+        return getattr(instance, self.value_field) if self.value_field else 1
+
+
+DIMENSIONS = {
+    'subject': Dimension('subject', StudentGrade, 'subject', 'score'),
+    'major': Dimension('major', Student, 'major'),
+    'year': Dimension('year', Student, 'year', 'missed_hours', key_type=int),
+}
+
+
+def maintained() -> bool:
+    """Поддерживаются ли агрегаты при изменениях: только в режиме EOS_ANALYTICS_BACKEND='aggregates'.
+
+    В остальных режимах таблица не читается и не обновляется; после
+    включения режима её пересобирает manage.py rebuild_analytics_aggregates.
+    """
+    return getattr(settings, 'EOS_ANALYTICS_BACKEND', 'python') == 'aggregates'
+
+
+class AggregateStore:
+    """Хранилище накопленных агрегатов в таблице AnalyticsAggregate.
+
+    Каждое изменение Student/StudentGrade обновляет сумму и количество по
+    ключу одним запросом UPDATE. Минимум и максимум при добавлении значения
+    обновляются так же; при удалении крайнего значения они пересчитываются
+    по исходной таблице для одного ключа. Изменения переносятся, только
+    если агрегаты поддерживаются (см. maintained()).
+    """
+
+    def add(self, dimension: str, key, value: float, count: int = 1,
+            minimum: Optional[float] = None, maximum: Optional[float] = None) -> None:
+        """Добавляет count значений с суммой value (по умолчанию одно значение)."""
+        key = str(key)
+        minimum = float(value if minimum is None else minimum)
+        maximum = float(value if maximum is None else maximum)
+        updated = AnalyticsAggregate.objects.filter(dimension=dimension, key=key).update(
+            total=F('total') + value,
+            count=F('count') + count,
+            minimum=Least(Coalesce(F('minimum'), Value(minimum)), Value(minimum)),
+            maximum=Greatest(Coalesce(F('maximum'), Value(maximum)), Value(maximum)),
+        )
+        if updated:
+            return
+        try:
+            with transaction.atomic():
+                AnalyticsAggregate.objects.create(
+                    dimension=dimension, key=key, total=value, count=count, minimum=minimum, maximum=maximum)
+        except IntegrityError:
+            # Строку успел создать параллельный запрос
+            self.add(dimension, key, value, count, minimum, maximum)
+
+    def remove(self, dimension: str, key, value: float, count: int = 1,
+               minimum: Optional[float] = None, maximum: Optional[float] = None) -> None:
+        """Убирает count значений с суммой value и крайними значениями minimum/maximum."""
+        key = str(key)
+        minimum = value if minimum is None else minimum
+        maximum = value if maximum is None else maximum
+        AnalyticsAggregate.objects.filter(dimension=dimension, key=key).update(
+            total=F('total') - value,
+            count=F('count') - count,
+        )
+        aggregate = AnalyticsAggregate.objects.filter(dimension=dimension, key=key).first()
+        if aggregate is None:
+            return
+        if aggregate.count <= 0:
+            aggregate.delete()
+        elif minimum <= aggregate.minimum or maximum >= aggregate.maximum:
+            self._refresh_bounds(aggregate)
+
+    @staticmethod
+    def _group(groups: Dict, dimension: str, key, value: float) -> None:
+        total, count, minimum, maximum = groups.get((dimension, str(key)), (0, 0, value, value))
+        groups[(dimension, str(key))] = (total + value, count + 1, min(minimum, value), max(maximum, value))
+
+    def apply_many(self, changes: Iterable[Tuple[Dict, Dict]]) -> None:
+        """Переносит вклад многих записей (для массовых операций).
+
+        changes — пары состояний (было, стало) в виде state(); {} — записи нет.
+        Число запросов не зависит от числа записей и ключей: строки
+        агрегатов читаются с блокировкой одним запросом, пересчитываются
+        в памяти и записываются через bulk_update/bulk_create.
+        """
+        if not maintained():
+            return
+        removed, added = {}, {}
+        for old_state, new_state in changes:
+            for dimension in old_state.keys() | new_state.keys():
+                old, new = old_state.get(dimension), new_state.get(dimension)
+                if old == new:
+                    continue
+                if old is not None:
+                    self._group(removed, dimension, *old)
+                if new is not None:
+                    self._group(added, dimension, *new)
+        # Новые ключи создаются в порядке появления: read() возвращает их в этом порядке
+        keys = list(dict.fromkeys([*removed, *added]))
+        if not keys:
+            return
+
+        with transaction.atomic():
+            by_dimension = {}
+            for dimension, key in keys:
+                by_dimension.setdefault(dimension, []).append(key)
+            condition = Q()
+            for dimension, dimension_keys in by_dimension.items():
+                condition |= Q(dimension=dimension, key__in=dimension_keys)
+            stored = {
+                (aggregate.dimension, aggregate.key): aggregate
+                for aggregate in AnalyticsAggregate.objects.select_for_update().filter(condition)
+            }
+            updated, created, deleted, refresh = [], [], [], []
+            for dimension, key in keys:
+                aggregate = stored.get((dimension, key))
+                removed_total, removed_count, removed_min, removed_max = removed.get(
+                    (dimension, key), (0, 0, None, None))
+                added_total, added_count, added_min, added_max = added.get((dimension, key), (0, 0, None, None))
+                if aggregate is None:
+                    if added_count:
+                        created.append(AnalyticsAggregate(
+                            dimension=dimension, key=key, total=added_total, count=added_count,
+                            minimum=added_min, maximum=added_max))
+                    continue
+                aggregate.total += added_total - removed_total
+                aggregate.count += added_count - removed_count
+                if aggregate.count <= 0:
+                    deleted.append(aggregate.pk)
+                    continue
+                if removed_count and (removed_min <= aggregate.minimum or removed_max >= aggregate.maximum):
+                    # Удалено крайнее значение: границы пересчитываются по исходной таблице
+                    refresh.append(aggregate)
+                elif added_count:
+                    aggregate.minimum = added_min if aggregate.minimum is None else min(aggregate.minimum, added_min)
+                    aggregate.maximum = added_max if aggregate.maximum is None else max(aggregate.maximum, added_max)
+                updated.append(aggregate)
+
+            self._refresh_many_bounds(refresh)
+            if updated:
+                AnalyticsAggregate.objects.bulk_update(updated, ['total', 'count', 'minimum', 'maximum'])
+            if deleted:
+                AnalyticsAggregate.objects.filter(pk__in=deleted).delete()
+            if created:
+                try:
+                    with transaction.atomic():
+                        AnalyticsAggregate.objects.bulk_create(created)
+                except IntegrityError:
+                    # Часть строк успели создать параллельные запросы
+                    for aggregate in created:
+                        self.add(aggregate.dimension, aggregate.key, aggregate.total, aggregate.count,
+                                 aggregate.minimum, aggregate.maximum)
+
+    def _refresh_many_bounds(self, aggregates) -> None:
+        by_dimension = {}
+        for aggregate in aggregates:
+            by_dimension.setdefault(aggregate.dimension, {})[aggregate.key] = aggregate
+        for name, group in by_dimension.items():
+            dimension = DIMENSIONS[name]
+            if not dimension.value_field:
+                continue
+            rows = (
+                dimension.model.objects.order_by()
+                .filter(**{f'{dimension.key_field}__in': [dimension.key_type(key) for key in group]})
+                .values(dimension.key_field)
+                .annotate(minimum=Min(dimension.value_field), maximum=Max(dimension.value_field))
+            )
+            for row in rows:
+                aggregate = group[str(row[dimension.key_field])]
+                aggregate.minimum, aggregate.maximum = row['minimum'], row['maximum']
+
+    def add_many(self, instances: Iterable) -> None:
+        """Добавляет вклад многих новых записей."""
+        self.apply_many(({}, self.state(instance)) for instance in instances)
+
+    def _refresh_bounds(self, aggregate: AnalyticsAggregate) -> None:
+        dimension = DIMENSIONS[aggregate.dimension]
+        if not dimension.value_field:
+            return
+        bounds = dimension.model.objects.filter(
+            **{dimension.key_field: dimension.key_type(aggregate.key)}
+        ).aggregate(minimum=Min(dimension.value_field), maximum=Max(dimension.value_field))
+        AnalyticsAggregate.objects.filter(pk=aggregate.pk).update(**bounds)
+
+    def apply_change(self, dimension: str, old, new) -> None:
+        """Переносит вклад записи: old и new — пары (ключ, значение) или None."""
+        if old == new or not maintained():
+            return
+        if old is not None and new is not None and old[0] == new[0]:
+            # Ключ тот же: строка обновляется на месте и сохраняет свой порядок в read()
+            self.shift(dimension, old[0], old[1], new[1])
+            return
+        if old is not None:
+            self.remove(dimension, *old)
+        if new is not None:
+            self.add(dimension, *new)
+
+    def shift(self, dimension: str, key, old_value: float, new_value: float) -> None:
+        """Заменяет значение old_value на new_value под ключом одним UPDATE суммы и границ."""
+        key = str(key)
+        updated = AnalyticsAggregate.objects.filter(dimension=dimension, key=key).update(
+            total=F('total') + (new_value - old_value),
+            minimum=Least(F('minimum'), Value(float(new_value))),
+            maximum=Greatest(F('maximum'), Value(float(new_value))),
+        )
+        if not updated:
+            self.add(dimension, key, new_value)
+            return
+        aggregate = AnalyticsAggregate.objects.get(dimension=dimension, key=key)
+        if old_value <= aggregate.minimum or old_value >= aggregate.maximum:
+            # Прежнее значение было крайним: границы пересчитываются по исходной таблице
+            self._refresh_bounds(aggregate)
+
+    def read(self, dimension: str) -> Dict:
+        """Возвращает ключ -> (сумма, количество) в порядке появления ключей."""
+        key_type = DIMENSIONS[dimension].key_type
+        rows = (
+            AnalyticsAggregate.objects.filter(dimension=dimension, count__gt=0)
+            .order_by('id')
+            .values_list('key', 'total', 'count')
+        )
+        return {key_type(key): (total, count) for key, total, count in rows}
+
+    def compute(self, dimension: str) -> Dict:
+        """Считает агрегаты заново по исходным таблицам."""
+        dimension = DIMENSIONS[dimension]
+        if dimension.value_field:
+            measures = {
+                'total': Sum(dimension.value_field),
+                'minimum': Min(dimension.value_field),
+                'maximum': Max(dimension.value_field),
+            }
+        else:
+            measures = {'total': Count('id'), 'minimum': Value(1.0), 'maximum': Value(1.0)}
+        rows = (
+            dimension.model.objects.order_by()
+            .values(dimension.key_field)
+            .annotate(count=Count('id'), first_id=Min('id'), **measures)
+            .order_by('first_id')
+        )
+        return {
+            row[dimension.key_field]: {field: row[field] for field in ('total', 'count', 'minimum', 'maximum')}
+            for row in rows
+        }
+
+    def state(self, instance) -> Dict:
+        """Вклад записи в агрегаты: измерение -> (ключ, значение)."""
+        return {
+            name: (getattr(instance, dimension.key_field), dimension.value(instance))
+            for name, dimension in DIMENSIONS.items()
+            if isinstance(instance, dimension.model)
+        }
+
+    def original_state(self, instance) -> Dict:
+        """Вклад записи в агрегаты по значениям, сохранённым в базе; {} — записи там нет.
+
+        Значения берутся из снимка, сделанного при загрузке записи
+        (from_db) или после её сохранения (remember); если снимка нет
+        или часть полей не была загружена, они читаются одним запросом.
+        """
+        if instance.pk is None:
+            return {}
+        model = type(instance)
+        fields = self.fields(model)
+        values = getattr(instance, '_loaded_values', None)
+        if values is None or not fields <= values.keys():
+            values = model.objects.filter(pk=instance.pk).values(*fields).first()
+            if values is None:
+                return {}
+        return {
+            name: (values[dimension.key_field], values[dimension.value_field] if dimension.value_field else 1)
+            for name, dimension in DIMENSIONS.items()
+            if isinstance(instance, dimension.model)
+        }
+
+    def remember(self, instance) -> None:
+        """Запоминает текущие значения записи как сохранённые в базе."""
+        values = getattr(instance, '_loaded_values', None) or {}
+        values.update((field, getattr(instance, field)) for field in self.fields(type(instance)))
+        instance._loaded_values = values
+
+    def fields(self, model) -> set:
+        return {
+            field
+            for dimension in DIMENSIONS.values() if dimension.model is model
+            for field in (dimension.key_field, dimension.value_field) if field
+        }
+
+    def rebuild(self) -> None:
+        """Полностью пересобирает таблицу агрегатов."""
+        with transaction.atomic():
+            AnalyticsAggregate.objects.all().delete()
+            AnalyticsAggregate.objects.bulk_create(
+                AnalyticsAggregate(dimension=name, key=str(key), **values)
+                for name in DIMENSIONS
+                for key, values in self.compute(name).items()
+            )
+
+    def drift(self, tolerance: float = 1e-6) -> Dict:
+        """Сравнивает накопленные агрегаты с пересчитанными: ключ -> (накоплено, должно быть)."""
+        differences = {}
+        for name in DIMENSIONS:
+            expected = {str(key): values for key, values in self.compute(name).items()}
+            stored = {
+                row.key: {'total': row.total, 'count': row.count, 'minimum': row.minimum, 'maximum': row.maximum}
+                for row in AnalyticsAggregate.objects.filter(dimension=name)
+                if row.count > 0
+            }
+            for key in expected.keys() | stored.keys():
+                actual, wanted = stored.get(key), expected.get(key)
+                if actual is None or wanted is None or any(
+                    abs(actual[field] - wanted[field]) > tolerance for field in wanted
+                ):
+                    differences[(name, key)] = (actual, wanted)
+        return differences
@@ -1,44 +1,157 @@
 # analytics.py
 
 from abc import ABC, abstractmethod
-from typing import List, Dict, Type
-from .models import Student, StudentGrade
-import matplotlib.pyplot as plt
+from typing import List, Dict, Optional, Tuple, Type, Union
+from django.conf import settings
+from django.db.models import QuerySet
+from .models import Student
 import io
 import base64
+import logging
+import math
+import threading
 from threading import Lock
-from .analytics_service import AnalyticsService
+from .aggregates import AggregateStore
+from .cache import AnalysisCache
+from .cube import CubeBuilder, CubeStore, OlapCube
+from .executors import run_tasks
+from .plot_store import PlotStore
+from .profiling import timed
+from .sketches import ColumnSketch
+from .streaming import ColumnStatistics, GroupedMoments, StudentStream
+from .student_data import StudentColumns, StudentDataLoader
+
+# matplotlib и NumPy (vectorized, analytics_service) импортируются при первом
+# анализе или построении графика: воркер, который обслуживает только список
+# студентов, не тратит на них время запуска и память (см. бенчмарк startup)
+
+logger = logging.getLogger(__name__)
 
 
 # Базовый интерфейс для построения графиков
 class PlotStrategy(ABC):
+    # Формат результата plot(): 'png' — base64 строка, 'url' — адрес сохранённого изображения,
+    # 'json' — описание графика для браузера
+    output_format = 'png'
+
     @abstractmethod
-    def plot(self, data: Dict) -> str:
-        """Создаёт график и возвращает его в виде base64 строки."""
+    def plot(self, data: Dict) -> Union[str, Dict]:
+        """Создаёт график и возвращает его в виде base64 строки или описания графика."""
         pass
 
 
 # Стратегия для построения столбчатых диаграмм
 class BarPlotStrategy(PlotStrategy):
+    figsize = (10, 5)
+
     def __init__(self, xlabel: str, ylabel: str, title: str):
         self.xlabel = xlabel
         self.ylabel = ylabel
         self.title = title
+        # Фигура создаётся один раз на поток и переиспользуется между вызовами
+        self._local = threading.local()
+
+    def __getstate__(self):
+        # Кэш фигур не передаётся в другие процессы
+        state = self.__dict__.copy()
+        del state['_local']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    def _figure(self):
+        figure = getattr(self._local, 'figure', None)
+        if figure is None:
+            # Рендеринг через Agg без графического интерфейса
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+            from matplotlib.figure import Figure
+
+            # Объектный API без pyplot: фигура не попадает в глобальный реестр и не утекает
+            figure = Figure(figsize=self.figsize)
+            FigureCanvasAgg(figure)
+            figure.add_subplot()
+            self._local.figure = figure
+        return figure
+
+    def close(self) -> None:
+        """Освобождает фигуру текущего потока."""
+        figure = getattr(self._local, 'figure', None)
+        if figure is not None:
+            figure.clear()
+            self._local.figure = None
 
     def plot(self, data: Dict) -> str:
-        plt.figure(figsize=(10, 5))
-        plt.bar(data.keys(), data.values())
-        plt.xlabel(self.xlabel)
-        plt.ylabel(self.ylabel)
-        plt.title(self.title)
+        return base64.b64encode(self.render_png(data)).decode('utf-8')
+
+    def render_png(self, data: Dict) -> bytes:
+        figure = self._figure()
+        axes = figure.axes[0]
+        axes.clear()
+        axes.bar(list(data.keys()), list(data.values()))
+        axes.set_xlabel(self.xlabel)
+        axes.set_ylabel(self.ylabel)
+        axes.set_title(self.title)
 
         buf = io.BytesIO()
-        plt.savefig(buf, format='png')
-        buf.seek(0)
-        image_png = buf.getvalue()
-        buf.close()
+        try:
+            figure.savefig(buf, format='png')
+            image_png = buf.getvalue()
+        finally:
+            buf.close()
+            # Данные графика не держатся в памяти до следующего вызова
+            axes.clear()
+
+        return image_png
+
+
+# Стратегия, которая сохраняет PNG на диск и возвращает постоянный URL изображения
+class StoredBarPlotStrategy(BarPlotStrategy):
+    output_format = 'url'
+
+    def plot(self, data: Dict) -> str:
+        store = PlotStore()
+        digest = store.digest(data, [self.xlabel, self.ylabel, self.title])
+        store.get_or_render(digest, lambda: self.render_png(data))
+        return store.url(digest)
+
+
+# Стратегия, которая передаёт данные графика браузеру вместо готового изображения
+class ChartSpecPlotStrategy(PlotStrategy):
+    output_format = 'json'
+
+    def __init__(self, xlabel: str, ylabel: str, title: str, chart_type: str = 'bar'):
+        self.xlabel = xlabel
+        self.ylabel = ylabel
+        self.title = title
+        self.chart_type = chart_type
 
-        return base64.b64encode(image_png).decode('utf-8')
+    def plot(self, data: Dict) -> Dict:
+        return {
+            'type': self.chart_type,
+            'title': self.title,
+            'xlabel': self.xlabel,
+            'ylabel': self.ylabel,
+            'labels': [str(key) for key in data],
+            'values': list(data.values()),
+        }
+
+
+PLOT_STRATEGIES = {
+    'png': BarPlotStrategy,
+    'url': StoredBarPlotStrategy,
+    'json': ChartSpecPlotStrategy,
+}
+
+
+def make_plot_strategy(xlabel: str, ylabel: str, title: str) -> PlotStrategy:
+    """Создаёт стратегию построения графиков, выбранную настройкой EOS_PLOT_RENDERER."""
+    renderer = getattr(settings, 'EOS_PLOT_RENDERER', 'png')
+    if renderer not in PLOT_STRATEGIES:
+        raise ValueError(f"Неизвестный способ построения графиков '{renderer}', "
+                         f"допустимы: {', '.join(PLOT_STRATEGIES)}.")
+    return PLOT_STRATEGIES[renderer](xlabel=xlabel, ylabel=ylabel, title=title)
 
 
 # Базовый интерфейс для всех аналитических модулей
@@ -48,20 +161,102 @@ class AnalyticsModule(ABC):
     def __init__(self, plot_strategy: PlotStrategy):
         self.plot_strategy = plot_strategy
 
-    @abstractmethod
-    def analyze(self, data: List[Dict]) -> Dict:
+    def analyze(self, data: Union[List[Dict], StudentColumns, QuerySet, AggregateStore, StudentStream]) -> Dict:
         """Выполняет анализ данных."""
+        if isinstance(data, StudentStream):
+            return self.analyze_stream(data)
+        if isinstance(data, AggregateStore):
+            return self.analyze_aggregates(data)
+        if isinstance(data, QuerySet):
+            return self.analyze_queryset(data)
+        if isinstance(data, StudentColumns):
+            return self.analyze_columns(data)
+        return self.analyze_records(data)
+
+    @abstractmethod
+    def analyze_records(self, data: List[Dict]) -> Dict:
+        """Выполняет анализ списка словарей по студентам."""
         pass
 
-    def plot_graph(self, data: Dict) -> str:
+    def analyze_columns(self, data: StudentColumns) -> Dict:
+        """Выполняет векторизованный анализ колоночных данных."""
+        return self.analyze_records(data.to_records())
+
+    def analyze_queryset(self, students: QuerySet) -> Dict:
+        """Выполняет анализ агрегатными запросами к базе данных."""
+        return self.analyze_columns(StudentDataLoader().load(students))
+
+    def analyze_aggregates(self, store: AggregateStore) -> Dict:
+        """Строит результат по накопленным агрегатам, не обращаясь к исходным таблицам."""
+        raise NotImplementedError(f"Модуль '{self.name}' не поддерживает накопленные агрегаты.")
+
+    def analyze_stream(self, stream: StudentStream) -> Dict:
+        """Выполняет анализ по порциям, объединяя частичные агрегаты."""
+        result, error = stream.reduce([self])[0]
+        if error is not None:
+            raise error
+        return result
+
+    def partial(self, chunk: StudentColumns) -> GroupedMoments:
+        """Частичный агрегат одной порции данных."""
+        raise NotImplementedError(f"Модуль '{self.name}' не поддерживает анализ по порциям.")
+
+    def merge(self, partial: GroupedMoments, other: GroupedMoments) -> GroupedMoments:
+        return partial.merge(other)
+
+    def finalize(self, partial: GroupedMoments) -> Dict:
+        """Результат модуля по объединённому частичному агрегату."""
+        raise NotImplementedError(f"Модуль '{self.name}' не поддерживает анализ по порциям.")
+
+    @property
+    def cache_name(self) -> str:
+        """Имя для кэша результатов: графики разных форматов хранятся раздельно."""
+        return f'{self.name}:{self.plot_strategy.output_format}'
+
+    def plot_graph(self, data: Dict) -> Union[str, Dict]:
         return self.plot_strategy.plot(data)
 
 
+# Модуль-срез куба (специальность, курс, дисциплина)
+class CubeAnalyticsModule(AnalyticsModule):
+    """Модуль, результат которого — свёртка куба OlapCube (см. eos/cube.py).
+
+    Движок строит куб один раз для всех таких модулей; при вызове analyze
+    с исходными данными модуль строит куб сам. analyze_records остаётся
+    построчной эталонной реализацией.
+    """
+
+    def analyze(self, data: Union[List[Dict], StudentColumns, QuerySet, AggregateStore, StudentStream, OlapCube]) -> Dict:
+        if isinstance(data, OlapCube):
+            return self.analyze_cube(data)
+        return super().analyze(data)
+
+    @abstractmethod
+    def analyze_cube(self, cube: OlapCube) -> Dict:
+        """Строит результат по кубу."""
+        pass
+
+    def analyze_columns(self, data: StudentColumns) -> Dict:
+        return self.analyze_cube(OlapCube.from_columns(data))
+
+    def analyze_queryset(self, students: QuerySet) -> Dict:
+        return self.analyze_cube(OlapCube.from_queryset(students))
+
+    def partial(self, chunk: StudentColumns) -> OlapCube:
+        return OlapCube.from_columns(chunk)
+
+    def merge(self, partial: OlapCube, other: OlapCube) -> OlapCube:
+        return partial.merge(other)
+
+    def finalize(self, partial: OlapCube) -> Dict:
+        return self.analyze_cube(partial)
+
+
 # Модуль аналитики успеваемости
-class PerformanceAnalytics(AnalyticsModule):
+class PerformanceAnalytics(CubeAnalyticsModule):
     name = "Анализ успеваемости"
 
-    def analyze(self, data: List[Dict]) -> Dict:
+    def analyze_records(self, data: List[Dict]) -> Dict:
         subject_averages = {}
         for student_data in data:
             for grade in student_data['grades']:
@@ -71,14 +266,21 @@ class PerformanceAnalytics(AnalyticsModule):
                     subject_averages[subject] = []
                 subject_averages[subject].append(score)
 
-        return {subject: sum(scores) / len(scores) for subject, scores in subject_averages.items()}
+        # math.fsum не зависит от порядка слагаемых, поэтому совпадает со свёрткой куба
+        return {subject: math.fsum(scores) / len(scores) for subject, scores in subject_averages.items()}
+
+    def analyze_cube(self, cube: OlapCube) -> Dict:
+        return cube.rollup('score', by=['subject'])
+
+    def analyze_aggregates(self, store: AggregateStore) -> Dict:
+        return {subject: total / count for subject, (total, count) in store.read('subject').items()}
 
 
 # Модуль аналитики направлений
-class MajorAnalytics(AnalyticsModule):
+class MajorAnalytics(CubeAnalyticsModule):
     name = "Анализ направлений"
 
-    def analyze(self, data: List[Dict]) -> Dict:
+    def analyze_records(self, data: List[Dict]) -> Dict:
         major_counts = {}
         for student_data in data:
             major = student_data['major']
@@ -87,12 +289,18 @@ class MajorAnalytics(AnalyticsModule):
             major_counts[major] += 1
         return major_counts
 
+    def analyze_cube(self, cube: OlapCube) -> Dict:
+        return cube.rollup('students', by=['major'])
+
+    def analyze_aggregates(self, store: AggregateStore) -> Dict:
+        return {major: count for major, (total, count) in store.read('major').items()}
+
 
 # Модуль аналитики посещаемости по годам обучения
-class YearAttendanceAnalytics(AnalyticsModule):
+class YearAttendanceAnalytics(CubeAnalyticsModule):
     name = "Анализ посещаемости"
 
-    def analyze(self, data: List[Dict]) -> Dict:
+    def analyze_records(self, data: List[Dict]) -> Dict:
         """Выполняет анализ данных и возвращает средние пропущенные часы по годам."""
         year_attendance = {}
         for student_data in data:
@@ -105,6 +313,22 @@ class YearAttendanceAnalytics(AnalyticsModule):
         # Средние пропущенные часы по годам
         return {year: sum(hours) / len(hours) for year, hours in year_attendance.items()}
 
+    def analyze_cube(self, cube: OlapCube) -> Dict:
+        return cube.rollup('missed_hours', by=['year'])
+
+    def analyze_aggregates(self, store: AggregateStore) -> Dict:
+        return {year: total / count for year, (total, count) in store.read('year').items()}
+
+
+def _analyze_module(module: AnalyticsModule, data) -> Dict:
+    with timed(f'analyze.{type(module).__name__}'):
+        return module.analyze(data)
+
+
+def _plot_module(module: AnalyticsModule, result: Dict) -> str:
+    with timed(f'plot.{type(module).__name__}'):
+        return module.plot_graph(result)
+
 
 class AnalyticsEngine:
     _instance = None
@@ -112,53 +336,237 @@ class AnalyticsEngine:
 
     def __new__(cls):
         if cls._instance is None:
-            cls._instance = super(AnalyticsEngine, cls).__new__(cls)
-            cls._instance.modules = []
+            with cls._lock:
+                if cls._instance is None:
+                    instance = super(AnalyticsEngine, cls).__new__(cls)
+                    instance.modules = []
+                    cls._instance = instance
         return cls._instance
 
     def register_module(self, module: AnalyticsModule):
-        self.modules.append(module)
-
-    def generate_student_data(self, students: List[Student]) -> List[Dict]:
-        return [
-            {
-                "id": student.id,
-                "name": student.name,
-                "age": student.age,
-                "grades": list(student.grades.values('subject', 'score')),
-                "email": student.email,
-                "major": student.major,
-                "year": student.year,
-                "missed_hours": student.missed_hours
-            }
-            for student in students
-        ]
-
-    def calculate_statistics(self, data: List[Dict], column_name: str) -> Dict:
+        """Регистрирует модуль; модуль с тем же именем заменяется, а не дублируется."""
+        with self._lock:
+            # Список заменяется целиком, поэтому параллельные запросы обходят неизменный снимок
+            modules = [registered for registered in self.modules if registered.name != module.name]
+            positions = [index for index, registered in enumerate(self.modules) if registered.name == module.name]
+            modules.insert(positions[0] if positions else len(modules), module)
+            self.modules = modules
+
+    def generate_student_data(self, students: List[Student]) -> StudentColumns:
+        # Студенты и оценки загружаются двумя запросами, без запроса на каждого студента
+        return StudentDataLoader().load(students)
+
+    def calculate_statistics(self, data: Union[List[Dict], StudentColumns, QuerySet], column_name: str) -> Dict:
+        from .analytics_service import AnalyticsService
         analytics_service = AnalyticsService(data)
-        return analytics_service.calculate_statistics(column_name)
+        with timed('statistics'):
+            return analytics_service.calculate_statistics(column_name)
+
+    @property
+    def executor(self) -> str:
+        """Исполнитель модулей: 'serial', 'thread' или 'process'."""
+        return getattr(settings, 'EOS_ANALYTICS_EXECUTOR', 'serial')
+
+    def analyze_modules(self, data: Union[List[Dict], StudentColumns, QuerySet, AggregateStore, StudentStream],
+                        modules: List[AnalyticsModule] = None, use_cache: bool = True) -> Dict:
+        modules = self.modules if modules is None else modules
+        if isinstance(data, StudentStream):
+            # Все модули получают порции за один проход по данным
+            return self.plot_modules(modules, self._reduce_stream(data, modules)[0])
+
+        # Модули-срезы получают один общий куб вместо исходных данных
+        cube, cube_error = None, None
+        if any(isinstance(module, CubeAnalyticsModule) for module in modules):
+            try:
+                with timed('cube'):
+                    cube = self.build_cube(data, use_cache)
+            except Exception as exc:
+                # Ошибка куба — ошибка каждого модуля-среза, остальные модули выполняются
+                cube_error = exc
+        failed = [cube_error is not None and isinstance(module, CubeAnalyticsModule) for module in modules]
+        tasks = [
+            (module, cube if cube is not None and isinstance(module, CubeAnalyticsModule) else data)
+            for module, module_failed in zip(modules, failed) if not module_failed
+        ]
+        # Данные в памяти анализируются в выбранном пуле; запросы к базе
+        # (QuerySet, накопленные агрегаты) выполняются в потоке запроса
+        in_memory = isinstance(data, (list, StudentColumns))
+        outcomes = iter(run_tasks(self.executor if in_memory else 'serial', _analyze_module, tasks))
+        analyses = [(None, cube_error) if module_failed else next(outcomes) for module_failed in failed]
+        return self.plot_modules(modules, analyses)
+
+    def build_cube(self, data: Union[List[Dict], StudentColumns, QuerySet, AggregateStore],
+                   use_cache: bool = True) -> Optional[OlapCube]:
+        """Куб по данным одним проходом; для QuerySet — из кэша до изменения данных.
+
+        Для накопленных агрегатов куб не строится: модули отвечают по AggregateStore.
+        """
+        if isinstance(data, QuerySet):
+            if use_cache and getattr(settings, 'EOS_ANALYSIS_CACHE_ENABLED', True):
+                return CubeStore(data).cube()
+            return OlapCube.from_queryset(data)
+        if isinstance(data, StudentColumns):
+            return OlapCube.from_columns(data)
+        if isinstance(data, list):
+            return OlapCube.from_records(data)
+        return None
+
+    def _reduce_stream(self, stream: StudentStream, modules: List[AnalyticsModule],
+                       reducers: List = ()) -> Tuple[List[Tuple], List[Tuple]]:
+        """Один проход по порциям: общий куб для модулей-срезов, частичные агрегаты остальных модулей и reducers.
+
+        Возвращает пары (результат, исключение) модулей и пары reducers.
+        """
+        uses_cube = [isinstance(module, CubeAnalyticsModule) for module in modules]
+        other_modules = [module for module, sliced in zip(modules, uses_cube) if not sliced]
+        builders = [CubeBuilder()] if any(uses_cube) else []
+        with timed('analyze.stream'):
+            outcomes = stream.reduce(builders + other_modules + list(reducers))
+        cube, cube_error = outcomes.pop(0) if builders else (None, None)
+
+        analyses = []
+        for module, sliced in zip(modules, uses_cube):
+            if not sliced:
+                analyses.append(outcomes.pop(0))
+            elif cube_error is not None:
+                analyses.append((None, cube_error))
+            else:
+                try:
+                    analyses.append((module.analyze_cube(cube), None))
+                except Exception as exc:
+                    analyses.append((None, exc))
+        return analyses, outcomes
+
+    def analyze_stream(self, stream: StudentStream, modules: List[AnalyticsModule],
+                       column_name: str = None) -> Tuple[Dict, Dict]:
+        """Модули и статистика колонки column_name за один проход по потоку порций."""
+        statistics_class = ColumnSketch if self.approximate else ColumnStatistics
+        analyses, outcomes = self._reduce_stream(
+            stream, modules, [statistics_class(column_name)] if column_name else [])
+        statistics = None
+        if column_name:
+            statistics, error = outcomes.pop()
+            if error is not None:
+                raise error
+        return self.plot_modules(modules, analyses), statistics
+
+    def plot_modules(self, modules: List[AnalyticsModule], analyses: List[Tuple[Dict, Exception]]) -> Dict:
+        """Строит графики по результатам модулей; analyses — пары (результат, исключение)."""
+        executor = self.executor
+        # Растеризация занимает процессор и удерживает GIL, поэтому графики строятся в отдельных процессах
+        plot_tasks = [(module, result) for module, (result, error) in zip(modules, analyses) if error is None]
+        plots = iter(run_tasks('serial' if executor == 'serial' else 'process', _plot_module, plot_tasks))
 
-    def analyze_modules(self, data: List[Dict]) -> Dict:
         results = {}
-        for module in self.modules:
-            module_result = module.analyze(data)
+        for module, (module_result, error) in zip(modules, analyses):
+            plot = None
+            if error is None:
+                plot, error = next(plots)
+            if error is not None:
+                logger.error('Ошибка модуля аналитики "%s"', module.name, exc_info=error)
+                results[module.name] = {'result': None, 'plot': None, 'name': module.name, 'error': str(error)}
+                continue
             results[module.name] = {
                 'result': module_result,
-                'plot': module.plot_graph(module_result),
+                'plot': plot,
+                'plot_format': module.plot_strategy.output_format,
                 'name': module.name
             }
         return results
-    def run_analysis(self, students: List[Student], column_name: str) -> Dict:
-        # Генерация данных студентов
-        data = self.generate_student_data(students)
 
-        # Вычисление статистики
-        statistics = self.calculate_statistics(data, column_name)
-
-        # Анализ с использованием модулей
-        module_results = self.analyze_modules(data)
+    @property
+    def backend(self) -> str:
+        """Режим выполнения: 'python' (данные загружаются в память), 'sql', 'aggregates' или 'stream'."""
+        return getattr(settings, 'EOS_ANALYTICS_BACKEND', 'python')
+
+    @property
+    def approximate(self) -> bool:
+        """Приближённая статистика по скетчам (см. eos/sketches.py)."""
+        return getattr(settings, 'EOS_ANALYTICS_APPROXIMATE', False)
+
+    def prepare_data(self, students: List[Student]) -> Union[StudentColumns, QuerySet, AggregateStore, StudentStream]:
+        if self.backend == 'stream':
+            # Данные читаются порциями, в памяти находится одна порция и частичные агрегаты
+            return StudentStream(students, chunk_size=getattr(settings, 'EOS_ANALYTICS_CHUNK_SIZE', 5000))
+        if self.backend == 'aggregates' and self._is_whole_table(students):
+            # Накопленные агрегаты описывают всю таблицу студентов целиком
+            return AggregateStore()
+        if self.backend in ('sql', 'aggregates') and isinstance(students, QuerySet):
+            # Агрегация выполняется в базе данных, загружаются только итоговые строки
+            return students
+        # Генерация данных студентов
+        return self.generate_student_data(students)
+
+    def _is_whole_table(self, students) -> bool:
+        return (
+            isinstance(students, QuerySet) and students.model is Student
+            and not students.query.where and not students.query.is_sliced
+        )
+
+    def run_analysis(self, students: List[Student], column_name: str, use_cache: bool = True) -> Dict:
+        # Повторный запрос при неизменных данных обходится чтением из кэша (если use_cache)
+        modules = self.modules
+        analysis_cache = AnalysisCache.for_students(students) if use_cache else None
+        cache_names = {module.name: module.cache_name for module in modules}
+        # Точная и приближённая статистика одной колонки кэшируются раздельно
+        statistics_name = f'{column_name}~approximate' if self.approximate else column_name
+        cached = analysis_cache.get(cache_names.values(), statistics_name) if analysis_cache else {}
+
+        missing_modules = [module for module in modules if module.cache_name not in cached]
+        statistics = cached.get(AnalysisCache.statistics_key)
+        computed = {}
+        if missing_modules or statistics is None:
+            data = self.prepare_data(students)
+
+            if isinstance(data, StudentStream):
+                # Модули и статистика считаются за один проход по порциям
+                computed, streamed = self.analyze_stream(
+                    data, missing_modules, column_name if statistics is None else None)
+                statistics = streamed if statistics is None else statistics
+            else:
+                # Вычисление статистики
+                if statistics is None:
+                    # Медиану нельзя поддерживать инкрементально: статистика считается запросом к базе
+                    statistics_source = students if isinstance(data, AggregateStore) else data
+                    statistics = self.calculate_statistics(statistics_source, column_name)
+
+                # Анализ с использованием модулей
+                computed = self.analyze_modules(data, missing_modules, use_cache)
+
+            if analysis_cache:
+                # Ошибки модулей не кэшируются: при следующем запросе модуль будет выполнен снова
+                analysis_cache.set(
+                    {cache_names[name]: result for name, result in computed.items() if 'error' not in result},
+                    statistics_name, statistics)
+
+        module_results = {
+            module.name: cached[module.cache_name] if module.cache_name in cached else computed[module.name]
+            for module in modules
+        }
 
         # Добавление статистики в результаты
         module_results['statistics'] = statistics
 
         return module_results
+
+
+def preload_dependencies() -> None:
+    """Импортирует matplotlib и NumPy заранее.
+
+    Вызывается в мастер-процессе gunicorn при preload_app (см. gunicorn.conf.py):
+    воркеры получают загруженные модули от мастера через copy-on-write.
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg  # noqa: F401
+    from matplotlib.figure import Figure  # noqa: F401
+
+    from . import analytics_service, vectorized  # noqa: F401
+
+
+def register_default_modules(engine: AnalyticsEngine) -> None:
+    """Регистрирует стандартные модули аналитики (вызывается один раз при запуске приложения)."""
+    engine.register_module(PerformanceAnalytics(plot_strategy=make_plot_strategy(
+            xlabel='Дисциплина', ylabel='Средний балл', title='Средний балл по дисциплинам')))
+    engine.register_module(MajorAnalytics(plot_strategy=make_plot_strategy(
+            xlabel="Направления", ylabel="Количество студентов", title="Распределение студентов по направлениям")))
+    engine.register_module(YearAttendanceAnalytics(plot_strategy=make_plot_strategy(
+            xlabel='Курс обучения', ylabel='Пропущенные часы', title='Анализ посещаемости по годам обучения (среднее значение)')))
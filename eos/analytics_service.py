@@ -1,22 +1,163 @@
 # analytics_service.py
 
-import pandas as pd
-from typing import List, Dict
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Union
+
+import numpy as np
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections
+from django.db.models import Count, QuerySet, Sum, Avg, Max, Min
+from .db_functions import PercentileCont
+from .sketches import ColumnSketch
+from .streaming import ColumnStatistics, StudentStream
+from .student_data import StudentColumns
+
+STATISTICS = ('sum', 'mean', 'median', 'max', 'min')
+
+
+def typed_array(column_name: str, values: Iterable) -> np.ndarray:
+    """Числовые значения колонки без пропусков: int64 для целых, float64 для остальных."""
+    values = list(values)
+    array = np.array(values)
+    if array.dtype.kind == 'O':
+        # Пропуски (None) не участвуют в статистике, как в pandas
+        array = np.array([value for value in values if value is not None])
+    if array.size == 0:
+        return np.empty(0, dtype=np.int64)
+    if array.dtype.kind not in 'iuf':
+        raise ValueError(f"Колонка '{column_name}' не числовая.")
+    return array.astype(np.int64 if array.dtype.kind in 'iu' else np.float64, copy=False)
+
+
+def array_statistics(array: np.ndarray) -> Dict:
+    """Статистика массива в виде обычных чисел Python (не скаляров NumPy)."""
+    if array.size == 0:
+        return {'sum': 0, 'mean': None, 'median': None, 'max': None, 'min': None}
+    return {
+        'sum': array.sum().item(),
+        'mean': float(array.mean()),
+        'median': float(np.median(array)),
+        'max': array.max().item(),
+        'min': array.min().item(),
+    }
+
 
 class AnalyticsService:
-    def __init__(self, data: List[Dict]):
+    """Статистика колонок студентов: sum, mean, median, max, min.
+
+    Источник — список словарей по студентам, StudentColumns или готовые
+    колонки (колонка -> значения), QuerySet (статистика считается в базе)
+    или StudentStream (по порциям).
+    Для расчёта в памяти из данных извлекаются только запрошенные колонки
+    в виде типизированных массивов NumPy; результат содержит обычные
+    числа Python, пустая колонка даёт None вместо среднего и медианы.
+    """
+
+    def __init__(self, data: Union[List[Dict], StudentColumns, Mapping[str, Sequence], QuerySet, StudentStream]):
         self.data = data
-        self.df = pd.DataFrame(data)
+        self.queryset = data if isinstance(data, QuerySet) else None
+        self.stream = data if isinstance(data, StudentStream) else None
+
+    def calculate_statistics(self, column_name: str, approximate: Optional[bool] = None) -> Dict:
+        return self.calculate_many([column_name], approximate)[column_name]
+
+    def calculate_many(self, column_names: Sequence[str], approximate: Optional[bool] = None) -> Dict[str, Dict]:
+        """Статистика нескольких колонок за один проход по данным: колонка -> статистика."""
+        if approximate is None:
+            approximate = getattr(settings, 'EOS_ANALYTICS_APPROXIMATE', False)
+        column_names = list(dict.fromkeys(column_names))
+        if approximate:
+            return self.calculate_approximate(column_names)
+        if self.queryset is not None:
+            return self.calculate_sql(column_names)
+        if self.stream is not None:
+            return self._reduce_stream([ColumnStatistics(name) for name in column_names])
+        return {name: array_statistics(array) for name, array in self.column_arrays(column_names).items()}
+
+    def column_arrays(self, column_names: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Запрошенные колонки данных в памяти в виде массивов (см. typed_array)."""
+        if isinstance(self.data, StudentColumns):
+            return {name: typed_array(name, self.data.column(name)) for name in column_names}
+        if isinstance(self.data, Mapping):
+            missing = [name for name in column_names if name not in self.data]
+            if missing:
+                raise ValueError(f"Колонка '{missing[0]}' не обнаружена.")
+            return {name: typed_array(name, self.data[name]) for name in column_names}
+
+        records = self.data
+        for name in column_names:
+            if not any(name in record for record in records):
+                raise ValueError(f"Колонка '{name}' не обнаружена.")
+        return {name: typed_array(name, [record.get(name) for record in records]) for name in column_names}
+
+    def _reduce_stream(self, reducers: List) -> Dict[str, Dict]:
+        results = {}
+        for reducer, (statistics, error) in zip(reducers, self.stream.reduce(reducers)):
+            if error is not None:
+                raise error
+            results[reducer.column_name] = statistics
+        return results
+
+    def _check_fields(self, column_names: Sequence[str]) -> None:
+        for name in column_names:
+            try:
+                self.queryset.model._meta.get_field(name)
+            except FieldDoesNotExist:
+                raise ValueError(f"Колонка '{name}' не обнаружена.")
+
+    def calculate_approximate(self, column_names: Sequence[str]) -> Dict[str, Dict]:
+        """Статистика с числом различных значений (distinct) там, где точный расчёт дорог.
+
+        Скетчи (медиана с ошибкой ранга EOS_SKETCH_QUANTILE_ERROR и оценка
+        distinct) строятся только для StudentStream, который не держит
+        колонку в памяти целиком. Для QuerySet статистика (и точное distinct)
+        считается в базе, как в calculate_sql; для данных в памяти — точно,
+        через NumPy: наполнение скетчей в цикле Python в десятки раз медленнее.
+        """
+        if self.queryset is not None:
+            return self.calculate_sql(column_names, distinct=True)
+        if self.stream is not None:
+            return self._reduce_stream([ColumnSketch(name) for name in column_names])
+
+        results = {}
+        for name, array in self.column_arrays(column_names).items():
+            results[name] = array_statistics(array)
+            results[name]['distinct'] = int(np.unique(array).size)
+        return results
 
-    def calculate_statistics(self, column_name: str) -> Dict:
-        if column_name not in self.df.columns:
-            raise ValueError(f"Колонка '{column_name}' не обнаружена.")
+    def calculate_sql(self, column_names: Sequence[str], distinct: bool = False) -> Dict[str, Dict]:
+        """Считает статистику агрегатными запросами, не загружая строки."""
+        self._check_fields(column_names)
+        queryset = self.queryset.order_by()
+        aggregates = {}
+        for index, name in enumerate(column_names):
+            aggregates.update({
+                f'sum_{index}': Sum(name, default=0),
+                f'mean_{index}': Avg(name),
+                f'max_{index}': Max(name),
+                f'min_{index}': Min(name),
+            })
+            if distinct:
+                aggregates[f'distinct_{index}'] = Count(name, distinct=True)
+        # Суммы, средние и границы всех колонок — одним запросом
+        row = queryset.aggregate(**aggregates)
+        results = {}
+        for index, name in enumerate(column_names):
+            statistics = {key: row.get(f'{key}_{index}') for key in STATISTICS}
+            statistics['median'] = self._median_sql(queryset, name)
+            if distinct:
+                statistics['distinct'] = row[f'distinct_{index}']
+            results[name] = statistics
+        return results
 
-        statistics = {}
-        statistics['sum'] = self.df[column_name].sum()
-        statistics['mean'] = self.df[column_name].mean()
-        statistics['median'] = self.df[column_name].median()
-        statistics['max'] = self.df[column_name].max()
-        statistics['min'] = self.df[column_name].min()
+    def _median_sql(self, queryset: QuerySet, column_name: str):
+        if connections[queryset.db].vendor == 'postgresql':
+            return queryset.aggregate(median=PercentileCont(column_name))['median']
 
-        return statistics
\ No newline at end of file
+        # Запасной вариант (SQLite и др.): из базы читаются только одно-два средних значения
+        values = queryset.exclude(**{f'{column_name}__isnull': True})
+        count = values.count()
+        if count == 0:
+            return None
+        middle = list(values.order_by(column_name).values_list(column_name, flat=True)[(count - 1) // 2:count // 2 + 1])
+        return sum(middle) / len(middle)
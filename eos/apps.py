@@ -4,3 +4,14 @@ from django.apps import AppConfig
 class ShopConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'eos'
+
+    def ready(self):
+        # Подключение обработчиков сигналов моделей
+        from . import signals  # noqa: F401
+
+        # Проверки настроек (manage.py check, запуск analysis_worker)
+        from . import checks  # noqa: F401
+
+        # Модули аналитики регистрируются один раз на процесс, а не в каждом запросе
+        from .analytics import AnalyticsEngine, register_default_modules
+        register_default_modules(AnalyticsEngine())
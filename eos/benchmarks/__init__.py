@@ -0,0 +1,36 @@
+# benchmarks/__init__.py
+#
+# Бенчмарки запускаются командой: python manage.py eos_benchmark <имя> [--param ключ=значение ...]
+
+BENCHMARKS = {}
+
+
+def benchmark(name: str):
+    """Регистрирует функцию бенчмарка; функция возвращает словарь с результатами."""
+    def decorator(func):
+        BENCHMARKS[name] = func
+        return func
+    return decorator
+
+
+# Метрики, для которых меньшее значение лучше: время и память
+COST_SUFFIXES = ('_ms', '_mb')
+
+
+def compare(baseline: dict, result: dict, tolerance: int = 20, min_delta: float = 1.0) -> dict:
+    """Метрики result, выросшие больше чем на tolerance процентов относительно baseline.
+
+    Изменения меньше min_delta (мс или МБ) не считаются: это шум измерения.
+    Возвращает ключ -> (базовое значение, новое значение).
+    """
+    regressions = {}
+    for key, after in result.items():
+        before = baseline.get(key)
+        if not key.endswith(COST_SUFFIXES) or not isinstance(before, (int, float)) or not isinstance(after, (int, float)):
+            continue
+        if after - before >= min_delta and after > before * (1 + tolerance / 100):
+            regressions[key] = (before, after)
+    return regressions
+
+
+from . import analytics_service, bulk_import, chart_payload, engine_registry, export, pipeline, plot_memory, query_plans, startup, streaming_memory, student_list, student_search  # noqa: E402,F401
@@ -0,0 +1,73 @@
+# benchmarks/analytics_service.py
+
+import random
+import tracemalloc
+from time import perf_counter
+
+import pandas as pd
+
+from eos.analytics_service import AnalyticsService
+from eos.student_data import StudentColumns
+
+from . import benchmark
+
+COLUMNS = ('missed_hours', 'age', 'year')
+
+
+def make_records(count: int, seed: int = 0):
+    """Записи студентов в памяти (как generate_student_data), без базы данных."""
+    rng = random.Random(seed)
+    return [
+        {
+            'id': number, 'name': f'Студент {number}', 'age': rng.randint(17, 30),
+            'email': f'student{number}@example.com', 'major': 'Информатика', 'year': rng.randint(1, 5),
+            'missed_hours': rng.randint(0, 120),
+            'grades': [{'subject': 'Математика', 'score': rng.randint(0, 200) / 2}],
+        }
+        for number in range(count)
+    ]
+
+
+def pandas_statistics(records, column):
+    """Прежний способ: DataFrame из всех полей всех студентов."""
+    values = pd.DataFrame(records)[column]
+    return {'sum': values.sum(), 'mean': values.mean(), 'median': values.median(),
+            'max': values.max(), 'min': values.min()}
+
+
+def measure(func, repeat: int):
+    """Среднее время (мс) и пик выделенной памяти Python (МБ)."""
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    start = perf_counter()
+    for _ in range(repeat):
+        func()
+    return (perf_counter() - start) / repeat * 1000, peak / 2 ** 20
+
+
+@benchmark('analytics_service')
+def run(min_rows: int = 10000, max_rows: int = 1000000, repeat: int = 3):
+    """Статистика одной и нескольких колонок: DataFrame всех полей против колонок NumPy."""
+    results = []
+    rows = min_rows
+    while rows <= max_rows:
+        records = make_records(rows)
+        columns = StudentColumns.from_records(records)
+        cases = {
+            'pandas_dataframe': lambda: pandas_statistics(records, 'missed_hours'),
+            'records': lambda: AnalyticsService(records).calculate_statistics('missed_hours', approximate=False),
+            'columns': lambda: AnalyticsService(columns).calculate_statistics('missed_hours', approximate=False),
+            'records_3_columns': lambda: AnalyticsService(records).calculate_many(COLUMNS, approximate=False),
+            'pandas_3_columns': lambda: [pandas_statistics(records, column) for column in COLUMNS],
+        }
+        result = {'rows': rows}
+        for name, func in cases.items():
+            elapsed, peak = measure(func, repeat)
+            result[f'{name}_ms'] = elapsed
+            result[f'{name}_peak_mb'] = peak
+        results.append(result)
+        del records, columns
+        rows *= 10
+    return results
@@ -0,0 +1,55 @@
+# benchmarks/bulk_import.py
+
+import io
+import json
+import random
+from time import perf_counter
+
+from eos.importer import StudentImporter
+from eos.models import StudentImport
+
+from . import benchmark
+from .data import FIRST_NAMES, MAJORS, SUBJECTS, SURNAMES
+
+
+def make_jsonl(students: int, grades_per_student: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    lines = []
+    for number in range(students):
+        lines.append(json.dumps({
+            'name': f'{rng.choice(SURNAMES)} {rng.choice(FIRST_NAMES)}',
+            'age': rng.randint(17, 30),
+            'email': f'import{number}@example.com',
+            'major': rng.choice(MAJORS),
+            'year': rng.randint(1, 5),
+            'missed_hours': rng.randint(0, 120),
+            'grades': [
+                {'subject': subject, 'score': rng.randint(0, 200) / 2}
+                for subject in rng.sample(SUBJECTS, grades_per_student)
+            ],
+        }, ensure_ascii=False))
+    return '\n'.join(lines)
+
+
+@benchmark('bulk_import')
+def run(students: int = 20000, grades_per_student: int = 8, batch_size: int = 1000):
+    """Скорость массовой загрузки (строки = студенты + оценки) из JSONL.
+
+    Семестровая загрузка: --param students=20000 (по 15 оценок в требованиях,
+    но дисциплин в синтетических данных восемь).
+    """
+    grades_per_student = min(grades_per_student, len(SUBJECTS))
+    source = make_jsonl(students, grades_per_student)
+    job = StudentImport.objects.create(source='benchmark', digest='benchmark', format='jsonl')
+
+    start = perf_counter()
+    StudentImporter(batch_size=batch_size).run(io.StringIO(source), job)
+    elapsed = perf_counter() - start
+    rows = job.students + job.grades
+    return {
+        'students': job.students,
+        'grades': job.grades,
+        'failed': job.failed,
+        'seconds': elapsed,
+        'rows_per_second': rows / elapsed if elapsed else None,
+    }
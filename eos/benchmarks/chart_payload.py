@@ -0,0 +1,43 @@
+# benchmarks/chart_payload.py
+
+from statistics import mean
+from time import perf_counter
+
+from django.test import RequestFactory, override_settings
+
+from eos import views
+from eos.analytics import AnalyticsEngine, PLOT_STRATEGIES, register_default_modules
+
+from . import benchmark
+from .data import create_dataset
+
+
+@benchmark('chart_payload')
+def run(requests: int = 20, students: int = 1000):
+    """Размер HTML страницы /analysis/ и время ответа для графиков PNG и JSON (без кэша)."""
+    create_dataset(students)
+    engine = AnalyticsEngine()
+    factory = RequestFactory()
+
+    results = {}
+    for renderer in PLOT_STRATEGIES:
+        with override_settings(EOS_PLOT_RENDERER=renderer, EOS_ANALYSIS_CACHE_ENABLED=False):
+            register_default_modules(engine)
+            timings, sizes = [], []
+            for _ in range(requests):
+                start = perf_counter()
+                response = views.run_analysis(factory.get('/analysis/'))
+                timings.append(perf_counter() - start)
+                sizes.append(len(response.content))
+            api_response = views.analysis_api(factory.get('/analysis/api/'))
+        results[renderer] = {
+            'html_bytes': mean(sizes),
+            'api_bytes': len(api_response.content),
+            'latency_ms': mean(timings) * 1000,
+        }
+
+    # Возвращаем модули, соответствующие настройкам процесса
+    register_default_modules(engine)
+    results['html_size_ratio'] = results['json']['html_bytes'] / results['png']['html_bytes']
+    results['latency_ratio'] = results['json']['latency_ms'] / results['png']['latency_ms']
+    return results
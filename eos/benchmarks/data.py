@@ -0,0 +1,45 @@
+# benchmarks/data.py
+
+import random
+
+from eos.aggregates import AggregateStore
+from eos import search
+from eos.cache import bump_data_version
+from eos.models import Student, StudentGrade
+from eos.summaries import StudentSummaryStore
+
+SUBJECTS = ['Математика', 'Физика', 'История', 'Химия', 'Биология', 'Информатика', 'Экономика', 'Философия']
+SURNAMES = ['Иванов', 'Петров', 'Смирнов', 'Кузнецов', 'Попов', 'Соколов', 'Лебедев', 'Козлов',
+            'Новиков', 'Морозов', 'Волков', 'Соловьёв', 'Васильев', 'Зайцев', 'Павлов', 'Семёнов']
+FIRST_NAMES = ['Александр', 'Мария', 'Дмитрий', 'Анна', 'Иван', 'Елена', 'Сергей', 'Ольга',
+               'Андрей', 'Наталья', 'Михаил', 'Татьяна', 'Алексей', 'Юлия', 'Николай', 'Ксения']
+MAJORS = ['Информатика', 'Прикладная математика', 'Физика', 'Экономика', 'Юриспруденция']
+
+
+def create_dataset(students: int, grades_per_student: int = 5, seed: int = 0, batch_size: int = 5000) -> None:
+    """Создаёт синтетических студентов и оценки (у студента не больше одной оценки по дисциплине)."""
+    rng = random.Random(seed)
+    grades_per_student = min(grades_per_student, len(SUBJECTS))
+    for start in range(0, students, batch_size):
+        batch = Student.objects.bulk_create([
+            Student(
+                name=f'{SURNAMES[number % len(SURNAMES)]} {FIRST_NAMES[number // len(SURNAMES) % len(FIRST_NAMES)]}',
+                age=rng.randint(17, 30),
+                email=f'student{number}@example.com',
+                major=rng.choice(MAJORS),
+                year=rng.randint(1, 5),
+                missed_hours=rng.randint(0, 120),
+            )
+            for number in range(start, min(start + batch_size, students))
+        ])
+        StudentGrade.objects.bulk_create([
+            StudentGrade(student=student, subject=subject, score=rng.randint(0, 200) / 2)
+            for student in batch
+            for subject in rng.sample(SUBJECTS, grades_per_student)
+        ], batch_size=batch_size)
+
+    # bulk_create не отправляет сигналы моделей: агрегаты, сводки, версия кэша и индекс поиска обновляются явно
+    AggregateStore().rebuild()
+    StudentSummaryStore().rebuild()
+    bump_data_version()
+    search.invalidate()
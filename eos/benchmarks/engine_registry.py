@@ -0,0 +1,40 @@
+# benchmarks/engine_registry.py
+
+from statistics import mean
+from time import perf_counter
+
+from django.test import RequestFactory, override_settings
+
+from eos import views
+from eos.analytics import AnalyticsEngine, register_default_modules
+
+from . import benchmark
+from .data import create_dataset
+
+
+@benchmark('engine_registry')
+def run(requests: int = 10000, window: int = 500, students: int = 50):
+    """Стоимость запроса /analysis/ не должна расти с числом обработанных запросов."""
+    create_dataset(students)
+    engine = AnalyticsEngine()
+    factory = RequestFactory()
+
+    timings = []
+    # Без кэша результатов каждый запрос проходит по всем зарегистрированным модулям
+    with override_settings(EOS_ANALYSIS_CACHE_ENABLED=False):
+        for _ in range(requests):
+            # Повторная регистрация (как раньше делал каждый запрос) не должна добавлять модули
+            register_default_modules(engine)
+            start = perf_counter()
+            views.run_analysis(factory.get('/analysis/'))
+            timings.append(perf_counter() - start)
+
+    window = min(window, requests)
+    first, last = mean(timings[:window]), mean(timings[-window:])
+    return {
+        'requests': requests,
+        'modules': len(engine.modules),
+        'first_window_ms': first * 1000,
+        'last_window_ms': last * 1000,
+        'last_to_first_ratio': last / first,
+    }
@@ -0,0 +1,32 @@
+# benchmarks/export.py
+
+from time import perf_counter
+
+from eos.export import StudentExporter
+
+from . import benchmark
+from .data import create_dataset
+from .plot_memory import current_rss_mb
+
+
+@benchmark('export')
+def run(students: int = 100000, chunk_size: int = 2000, gzip: int = 0):
+    """Скорость потоковой выгрузки и рост RSS: он не должен зависеть от числа студентов."""
+    create_dataset(students)
+    results = {'students': students}
+    for export_format in ('csv', 'jsonl'):
+        rss_before = current_rss_mb()
+        peak = rss_before
+        size = 0
+        start = perf_counter()
+        for chunk in StudentExporter(chunk_size=chunk_size).stream(export_format, compress=bool(gzip)):
+            size += len(chunk)
+            peak = max(peak, current_rss_mb())
+        elapsed = perf_counter() - start
+        results[export_format] = {
+            'seconds': elapsed,
+            'students_per_second': students / elapsed if elapsed else None,
+            'megabytes': size / 2 ** 20,
+            'rss_growth_mb': peak - rss_before,
+        }
+    return results
@@ -0,0 +1,73 @@
+# benchmarks/pipeline.py
+
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from eos.analytics import AnalyticsEngine
+from eos.analytics_service import AnalyticsService
+from eos.cache import bump_data_version
+from eos.cube import OlapCube
+from eos.models import Student
+
+from . import benchmark
+from .data import create_dataset
+from .student_list import _timed
+
+
+@benchmark('pipeline')
+def run(students: int = 10000, grades_per_student: int = 5, repeat: int = 3):
+    """Время каждого этапа анализа и каждой страницы целиком (мс).
+
+    Этапы: загрузка данных (generate_student_data), анализ каждым модулем
+    в памяти и запросами к базе, статистика колонки, построение графика
+    каждого модуля; страницы — через тестовый клиент со всеми middleware.
+    Результат удобно сохранять (--output) и сравнивать с базовым (--baseline).
+    """
+    create_dataset(students, grades_per_student=grades_per_student)
+    engine = AnalyticsEngine()
+    queryset = Student.objects.all()
+    result = {'students': students, 'grades_per_student': grades_per_student}
+
+    result['generate_student_data_ms'] = _timed(lambda: engine.generate_student_data(queryset), repeat)
+    data = engine.generate_student_data(queryset)
+    for module in engine.modules:
+        name = type(module).__name__
+        result[f'analyze_{name}_ms'] = _timed(lambda: module.analyze(data), repeat)
+        result[f'analyze_sql_{name}_ms'] = _timed(lambda: module.analyze(queryset), repeat)
+        analysis = module.analyze(data)
+        result[f'plot_{name}_ms'] = _timed(lambda: module.plot_graph(analysis), repeat)
+    # Куб строится один раз на анализ; модули-срезы только сворачивают его ячейки
+    result['cube_build_ms'] = _timed(lambda: OlapCube.from_columns(data), repeat)
+    result['cube_build_sql_ms'] = _timed(lambda: OlapCube.from_queryset(queryset), repeat)
+    cube = OlapCube.from_queryset(queryset)
+    result['cube_rollup_ms'] = _timed(lambda: cube.rollup('score', by=['major', 'subject']), repeat)
+    result['calculate_statistics_ms'] = _timed(
+        lambda: AnalyticsService(data).calculate_statistics('missed_hours'), repeat)
+    result['calculate_statistics_sql_ms'] = _timed(
+        lambda: AnalyticsService(queryset).calculate_statistics('missed_hours'), repeat)
+
+    client = Client()
+    student_id = queryset.order_by('id').values_list('id', flat=True)[students // 2]
+    pages = {
+        'student_list': (reverse('student_list'), {}),
+        'student_list_by_gpa': (reverse('student_list'), {'sort': '-gpa'}),
+        'student_search': (reverse('student_list'), {'q': 'Иванов'}),
+        'view_student': (reverse('view_student', args=[student_id]), {}),
+        'edit_student': (reverse('edit_student', args=[student_id]), {}),
+        'analysis_cached': (reverse('run_analysis'), {}),
+        'analysis_api_cached': (reverse('analysis_api'), {}),
+    }
+    with override_settings(ALLOWED_HOSTS=['*']):
+        def cold_analysis():
+            # Новая версия данных: результаты анализа не берутся из кэша
+            bump_data_version()
+            client.get(reverse('run_analysis'))
+
+        result['page_analysis_cold_ms'] = _timed(cold_analysis, repeat)
+        client.get(reverse('run_analysis'))
+        for name, (url, params) in pages.items():
+            result[f'page_{name}_ms'] = _timed(lambda: client.get(url, params), repeat)
+        result['page_export_csv_ms'] = _timed(
+            lambda: b''.join(client.get(reverse('export_students'), {'format': 'csv'}).streaming_content), repeat)
+    return result
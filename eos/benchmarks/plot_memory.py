@@ -0,0 +1,45 @@
+# benchmarks/plot_memory.py
+
+import resource
+from time import perf_counter
+
+from eos.analytics import BarPlotStrategy
+
+from . import benchmark
+
+
+def current_rss_mb() -> float:
+    """Текущий RSS процесса в МБ (Linux), иначе пиковый RSS."""
+    try:
+        with open('/proc/self/statm') as statm:
+            pages = int(statm.read().split()[1])
+        return pages * resource.getpagesize() / 2 ** 20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+@benchmark('plot_memory')
+def run(plots: int = 10000, warmup: int = 50, keys: int = 8):
+    """Рендерит много графиков подряд; RSS после прогрева не должен расти."""
+    strategy = BarPlotStrategy(xlabel='Дисциплина', ylabel='Средний балл', title='Средний балл по дисциплинам')
+    data = {f'Дисциплина {index}': index * 7 % 100 for index in range(keys)}
+
+    for _ in range(warmup):
+        strategy.plot(data)
+    rss_before = current_rss_mb()
+
+    start = perf_counter()
+    for index in range(plots):
+        data['Дисциплина 0'] = index % 100
+        strategy.plot(data)
+    elapsed = perf_counter() - start
+    rss_after = current_rss_mb()
+    strategy.close()
+
+    return {
+        'plots': plots,
+        'ms_per_plot': elapsed / max(plots, 1) * 1000,
+        'rss_before_mb': rss_before,
+        'rss_after_mb': rss_after,
+        'rss_growth_mb': rss_after - rss_before,
+    }
@@ -0,0 +1,100 @@
+# benchmarks/query_plans.py
+
+from contextlib import contextmanager
+from time import perf_counter
+
+from django.db import connection
+from django.test import RequestFactory
+
+from eos import views
+from eos.analytics import AnalyticsEngine
+from eos.cube import OlapCube
+from eos.models import Student
+
+from . import benchmark
+from .data import MAJORS, create_dataset
+
+# Признаки чтения таблицы целиком в плане запроса
+FULL_SCANS = {'sqlite': 'SCAN ', 'postgresql': 'Seq Scan', 'mysql': 'Table scan'}
+
+
+@contextmanager
+def recorded_queries():
+    """Собирает выполненные запросы: SQL, параметры и время выполнения (мс)."""
+    queries = []
+
+    def record(execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            queries.append((sql, params, (perf_counter() - start) * 1000))
+
+    with connection.execute_wrapper(record):
+        yield queries
+
+
+def explain(sql: str, params) -> list:
+    """План запроса: на PostgreSQL и MySQL — EXPLAIN ANALYZE (запрос выполняется), на SQLite — EXPLAIN QUERY PLAN."""
+    options = {'analyze': True} if connection.vendor in ('postgresql', 'mysql') else {}
+    with connection.cursor() as cursor:
+        cursor.execute(f'{connection.ops.explain_query_prefix(**options)} {sql}', params)
+        return [str(row[-1]) for row in cursor.fetchall()]
+
+
+def scenarios():
+    """Запросы страниц и AnalyticsEngine: имя -> функция, выполняющая их."""
+    factory = RequestFactory()
+    student_id = Student.objects.order_by('id').values_list('id', flat=True)[Student.objects.count() // 2]
+    engine = AnalyticsEngine()
+    students = Student.objects.all()
+
+    def analysis_sql():
+        # Запросы режима EOS_ANALYTICS_BACKEND='sql' без кэша и построения графиков:
+        # куб для модулей-срезов и статистика колонки
+        OlapCube.from_queryset(students)
+        engine.calculate_statistics(students, 'missed_hours')
+
+    return {
+        'student_list': lambda: views.student_list(factory.get('/')),
+        'student_list_by_gpa': lambda: views.student_list(factory.get('/', {'sort': '-gpa', 'gpa_min': 50})),
+        'student_search': lambda: views.student_list(factory.get('/', {'q': 'Иванов'})),
+        'view_student': lambda: views.view_student(factory.get('/'), student_id),
+        'edit_student': lambda: views.edit_student(factory.get('/'), student_id),
+        'analysis_sql': analysis_sql,
+        'analysis_major': lambda: list(students.filter(major=MAJORS[0]).values_list('year', 'missed_hours')),
+        'analysis_python': lambda: engine.generate_student_data(students.filter(year=1)),
+    }
+
+
+@benchmark('query_plans')
+def run(students: int = 100000, grades_per_student: int = 5):
+    """План и время каждого запроса страниц и AnalyticsEngine (индексы — миграция 0010).
+
+    Для каждого запроса выводятся SQL, время выполнения, план и строки
+    плана с чтением таблицы целиком (full_scans).
+    """
+    create_dataset(students, grades_per_student=grades_per_student)
+    if connection.vendor in ('postgresql', 'sqlite'):
+        # Статистика таблиц для планировщика после массовой загрузки
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    result = {'students': students, 'vendor': connection.vendor}
+    marker = FULL_SCANS.get(connection.vendor)
+    for name, func in scenarios().items():
+        with recorded_queries() as queries:
+            func()
+        plans = []
+        for sql, params, elapsed in queries:
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            plan = explain(sql, params)
+            plans.append({
+                'sql': sql,
+                'ms': round(elapsed, 3),
+                'plan': plan,
+                'full_scans': [line for line in plan if marker and marker in line],
+            })
+        result[name] = plans
+    return result
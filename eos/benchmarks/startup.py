@@ -0,0 +1,51 @@
+# benchmarks/startup.py
+
+import json
+import os
+import subprocess
+import sys
+from statistics import median
+
+from . import benchmark
+
+# Запуск воркера: настройка Django и импорт представлений, затем (для сравнения)
+# импорт зависимостей анализа, который при ленивой загрузке происходит в первом запросе
+WORKER_SCRIPT = '''
+import json, resource, sys, time
+
+def rss():
+    return int(open('/proc/self/statm').read().split()[1]) * resource.getpagesize() / 2 ** 20
+
+started = time.perf_counter()
+import django
+django.setup()
+import eos.urls
+ready, rss_ready = time.perf_counter(), rss()
+heavy = [name for name in ('numpy', 'pandas', 'matplotlib') if name in sys.modules]
+
+from eos.analytics import preload_dependencies
+preload_dependencies()
+print(json.dumps({
+    'startup_ms': (ready - started) * 1000,
+    'rss_mb': rss_ready,
+    'analysis_import_ms': (time.perf_counter() - ready) * 1000,
+    'analysis_rss_mb': rss() - rss_ready,
+    'heavy_modules_at_startup': heavy,
+}))
+'''
+
+
+@benchmark('startup')
+def run(runs: int = 5):
+    """Время запуска и RSS воркера без анализа, и цена ленивого импорта matplotlib/NumPy."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(path for path in sys.path if path))
+    samples = [
+        json.loads(subprocess.run([sys.executable, '-c', WORKER_SCRIPT], env=env, check=True,
+                                  capture_output=True, text=True).stdout.splitlines()[-1])
+        for _ in range(runs)
+    ]
+    result = {key: median(sample[key] for sample in samples)
+              for key in ('startup_ms', 'rss_mb', 'analysis_import_ms', 'analysis_rss_mb')}
+    result['heavy_modules_at_startup'] = samples[0]['heavy_modules_at_startup']
+    result['runs'] = runs
+    return result
@@ -0,0 +1,55 @@
+# benchmarks/streaming_memory.py
+
+import tracemalloc
+from time import perf_counter
+
+from eos.analytics import AnalyticsEngine, register_default_modules
+from eos.analytics_service import AnalyticsService
+from eos.models import Student
+from eos.streaming import ColumnStatistics, StudentStream
+
+from . import benchmark
+from .data import create_dataset
+
+
+def measure(func):
+    """Время (мс) и пик выделенной памяти Python (МБ) при выполнении func."""
+    tracemalloc.start()
+    start = perf_counter()
+    func()
+    elapsed = perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed * 1000, peak / 2 ** 20
+
+
+@benchmark('streaming_memory')
+def run(students: int = 50000, chunk_size: int = 5000, column: str = 'missed_hours'):
+    """Пик памяти анализа без графиков: загрузка всех данных против потока порций."""
+    create_dataset(students)
+    engine = AnalyticsEngine()
+    register_default_modules(engine)
+    modules = engine.modules
+
+    def in_memory():
+        data = engine.generate_student_data(Student.objects.all())
+        AnalyticsService(data).calculate_statistics(column)
+        for module in modules:
+            module.analyze(data)
+
+    def streaming():
+        StudentStream(Student.objects.all(), chunk_size=chunk_size).reduce(
+            list(modules) + [ColumnStatistics(column)])
+
+    python_ms, python_mb = measure(in_memory)
+    stream_ms, stream_mb = measure(streaming)
+    return {
+        'students': students,
+        'chunk_size': chunk_size,
+        'python_ms': python_ms,
+        'python_peak_mb': python_mb,
+        'stream_ms': stream_ms,
+        'stream_peak_mb': stream_mb,
+        'peak_ratio': stream_mb / python_mb,
+    }
+
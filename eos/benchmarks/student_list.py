@@ -0,0 +1,49 @@
+# benchmarks/student_list.py
+
+from statistics import mean
+from time import perf_counter
+
+from django.db import connection
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+
+from eos import views
+from eos.models import Student
+from eos.pagination import KeysetPaginator
+
+from . import benchmark
+from .data import create_dataset
+
+
+def _timed(func, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = perf_counter()
+        func()
+        timings.append(perf_counter() - start)
+    return mean(timings) * 1000
+
+
+@benchmark('student_list')
+def run(students: int = 10000, repeat: int = 5, full_render_limit: int = 100000):
+    """Время страницы списка студентов: полный вывод (как раньше) против постраничного.
+
+    Запускать на разных объёмах: --param students=10000 / 100000 / 1000000.
+    Полный вывод выше full_render_limit не измеряется — страница занимает сотни МБ.
+    """
+    create_dataset(students, grades_per_student=0)
+    factory = RequestFactory()
+    middle_cursor = KeysetPaginator.encode_cursor(
+        [Student.objects.order_by('id').values_list('id', flat=True)[students // 2]])
+
+    result = {'students': students, 'vendor': connection.vendor}
+    if students <= full_render_limit:
+        result['full_list_ms'] = _timed(
+            lambda: render_to_string('eos/index.html', {'students': Student.objects.all()}), repeat)
+        result['full_search_ms'] = _timed(
+            lambda: render_to_string('eos/index.html', {'students': Student.objects.filter(name__icontains='7')}),
+            repeat)
+    result['first_page_ms'] = _timed(lambda: views.student_list(factory.get('/')), repeat)
+    result['middle_page_ms'] = _timed(lambda: views.student_list(factory.get('/', {'after': middle_cursor})), repeat)
+    result['search_page_ms'] = _timed(lambda: views.student_list(factory.get('/', {'q': '7'})), repeat)
+    return result
@@ -0,0 +1,43 @@
+# benchmarks/student_search.py
+
+from time import perf_counter
+
+from django.db import connection
+from django.test import RequestFactory
+
+from eos import search, views
+
+from . import benchmark
+from .data import create_dataset
+from .student_list import _timed
+
+QUERIES = {
+    'prefix': 'Иван',
+    'two_words': 'петров анна',
+    'typo': 'Кузнецв',
+    'email': 'student12345',
+    'major': 'юриспруденция',
+}
+
+
+@benchmark('student_search')
+def run(students: int = 100000, repeat: int = 5):
+    """Задержка ранжированного поиска студентов (на PostgreSQL — tsvector + GIN, иначе индекс в памяти).
+
+    Цель — меньше 20 мс на запрос при --param students=1000000.
+    """
+    create_dataset(students, grades_per_student=0)
+    engine = search.StudentSearch()
+    result = {'students': students, 'vendor': connection.vendor}
+
+    if connection.vendor != 'postgresql':
+        start = perf_counter()
+        search.memory_index()
+        result['index_build_ms'] = (perf_counter() - start) * 1000
+
+    for name, query in QUERIES.items():
+        result[f'{name}_ms'] = _timed(lambda: engine.search_ids(query), repeat)
+        result[f'{name}_results'] = len(engine.search_ids(query))
+    factory = RequestFactory()
+    result['search_page_ms'] = _timed(lambda: views.student_list(factory.get('/', {'q': QUERIES['prefix']})), repeat)
+    return result
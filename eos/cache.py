@@ -0,0 +1,95 @@
+# cache.py
+
+import hashlib
+import time
+from typing import Dict, Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.exceptions import EmptyResultSet
+from django.db.models import QuerySet
+
+from .models import DataVersion
+
+# Строка DataVersion с версией данных: меняется при каждом изменении Student или StudentGrade
+DATA_VERSION_ROW = 1
+
+
+def get_cache():
+    return caches[getattr(settings, 'EOS_ANALYSIS_CACHE_ALIAS', 'default')]
+
+
+def _new_version() -> int:
+    # Версия не должна повториться, даже если изменение откатили, а затем сделали другое
+    return time.time_ns()
+
+
+def get_data_version() -> int:
+    """Версия данных из базы: одна для всех процессов, даже с кэшем в памяти процесса."""
+    return DataVersion.objects.filter(pk=DATA_VERSION_ROW).values_list('value', flat=True).first() or 0
+
+
+def bump_data_version() -> None:
+    """Делает недействительными все сохранённые результаты анализа.
+
+    Версия меняется в той же транзакции, что и данные: другие процессы
+    видят новую версию вместе с зафиксированными изменениями.
+    """
+    version = _new_version()
+    if not DataVersion.objects.filter(pk=DATA_VERSION_ROW).update(value=version):
+        DataVersion.objects.update_or_create(pk=DATA_VERSION_ROW, defaults={'value': version})
+
+
+def _digest(value: str) -> str:
+    return hashlib.md5(value.encode('utf-8')).hexdigest()
+
+
+class AnalysisCache:
+    """Кэш результатов анализа по имени модуля, колонке статистики и версии данных.
+
+    scope отличает разные выборки студентов (например, с фильтром),
+    чтобы их результаты не смешивались.
+    """
+
+    prefix = 'eos:analysis'
+    statistics_key = 'statistics'
+
+    def __init__(self, scope: str):
+        self.scope = _digest(scope)
+        self.cache = get_cache()
+        self.timeout = getattr(settings, 'EOS_ANALYSIS_CACHE_TIMEOUT', DEFAULT_TIMEOUT)
+        self.version = None
+
+    @classmethod
+    def for_students(cls, students) -> Optional['AnalysisCache']:
+        """Кэш для выборки студентов или None, если выборку нельзя однозначно описать."""
+        if not getattr(settings, 'EOS_ANALYSIS_CACHE_ENABLED', True) or not isinstance(students, QuerySet):
+            return None
+        try:
+            scope = str(students.query)
+        except EmptyResultSet:
+            return None
+        return cls(scope)
+
+    def module_key(self, module_name: str) -> str:
+        return f'{self.prefix}:{self.version}:{self.scope}:module:{_digest(module_name)}'
+
+    def column_key(self, column_name: str) -> str:
+        return f'{self.prefix}:{self.version}:{self.scope}:{self.statistics_key}:{_digest(column_name)}'
+
+    def get(self, module_names: Iterable[str], column_name: str) -> Dict:
+        """Возвращает найденные результаты: имя модуля -> результат, 'statistics' -> статистика."""
+        self.version = get_data_version()
+        keys = {self.module_key(name): name for name in module_names}
+        keys[self.column_key(column_name)] = self.statistics_key
+        found = self.cache.get_many(list(keys))
+        return {keys[key]: value for key, value in found.items()}
+
+    def set(self, module_results: Dict, column_name: str, statistics=None) -> None:
+        if self.version is None:
+            self.version = get_data_version()
+        values = {self.module_key(name): result for name, result in module_results.items()}
+        if statistics is not None:
+            values[self.column_key(column_name)] = statistics
+        self.cache.set_many(values, timeout=self.timeout)
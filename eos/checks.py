@@ -0,0 +1,26 @@
+# checks.py
+
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# Кэши, которые хранят данные в памяти одного процесса (или не хранят вовсе)
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches)
+def check_analysis_queue_cache(app_configs, **kwargs):
+    """Режим очереди заданий требует кэша, общего для веб-процессов и analysis_worker."""
+    if getattr(settings, 'EOS_ANALYSIS_MODE', 'sync') != 'queue':
+        return []
+    alias = getattr(settings, 'EOS_ANALYSIS_CACHE_ALIAS', 'default')
+    backend = settings.CACHES.get(alias, {}).get('BACKEND')
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Error(
+        f"EOS_ANALYSIS_MODE='queue' требует общего кэша, а кэш '{alias}' хранится в памяти процесса ({backend}).",
+        hint='Укажите EOS_CACHE_BACKEND и EOS_CACHE_LOCATION, например RedisCache.',
+        id='eos.E001',
+    )]
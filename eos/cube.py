@@ -0,0 +1,219 @@
+# cube.py
+
+from typing import Dict, Optional, Sequence
+
+from django.conf import settings
+from django.db.models import Count, Max, Min, QuerySet, Sum
+
+from .cache import _digest, get_cache, get_data_version
+from .models import Student, StudentGrade
+from .streaming import GroupedMoments, add_sums
+from .student_data import StudentColumns
+
+DIMENSIONS = ('major', 'year', 'subject')
+
+# Таблицы фактов куба и их измерения: студенты (пропущенные часы) и оценки (баллы)
+FACTS = {
+    'students': ('major', 'year'),
+    'grades': ('major', 'year', 'subject'),
+}
+
+# Меры: имя -> (таблица фактов, агрегат)
+MEASURES = {
+    'students': ('students', 'count'),
+    'missed_hours': ('students', 'mean'),
+    'missed_hours_total': ('students', 'sum'),
+    'missed_hours_min': ('students', 'min'),
+    'missed_hours_max': ('students', 'max'),
+    'grades': ('grades', 'count'),
+    'score': ('grades', 'mean'),
+    'score_min': ('grades', 'min'),
+    'score_max': ('grades', 'max'),
+}
+
+
+def _aggregate(moments, aggregate: str):
+    count, total, minimum, maximum, error = moments
+    if aggregate == 'count':
+        return count
+    if aggregate == 'sum':
+        return total
+    if aggregate == 'mean':
+        return total / count
+    return minimum if aggregate == 'min' else maximum
+
+
+class OlapCube:
+    """Куб (специальность, курс, дисциплина): количество, сумма, минимум и максимум в каждой ячейке.
+
+    Ячейки хранятся на самом подробном уровне в порядке первого появления,
+    поэтому любой срез и свёртка (rollup) считаются по ячейкам без чтения
+    исходных строк и дают ключи в том же порядке, что и анализ всех данных.
+    Суммы ячеек хранятся с ошибкой округления (см. GroupedMoments), так что
+    свёртка даёт ту же сумму, что math.fsum по исходным значениям.
+    Кубы порций данных объединяются (merge), как частичные агрегаты.
+    """
+
+    def __init__(self, students: Optional[GroupedMoments] = None, grades: Optional[GroupedMoments] = None):
+        self.facts = {
+            'students': students or GroupedMoments(),
+            'grades': grades or GroupedMoments(),
+        }
+
+    @classmethod
+    def from_columns(cls, data: StudentColumns) -> 'OlapCube':
+        """Куб по колоночным данным за один векторизованный проход."""
+        import numpy as np
+
+        from .vectorized import factorize, grouped_moments
+
+        major_codes, majors = factorize(data.column('major'))
+        year_codes, years = factorize(data.column('year'))
+        subject_codes, subjects = factorize(data.grades['subject'])
+        # Код ячейки — номер в декартовом произведении значений измерений
+        student_cells = major_codes * len(years) + year_codes
+        students = grouped_moments(student_cells, data.column('missed_hours'))
+
+        positions = np.asarray(data.grades['student_index'], dtype=np.intp)
+        grade_cells = student_cells[positions] * len(subjects) + subject_codes
+        grades = grouped_moments(grade_cells, data.grades['score'])
+
+        def student_key(cell):
+            return majors[cell // len(years)], years[cell % len(years)]
+
+        return cls(
+            GroupedMoments({student_key(cell): moments for cell, moments in students.items()}),
+            GroupedMoments({
+                student_key(cell // len(subjects)) + (subjects[cell % len(subjects)],): moments
+                for cell, moments in grades.items()
+            }),
+        )
+
+    @classmethod
+    def from_records(cls, data: Sequence[Dict]) -> 'OlapCube':
+        return cls.from_columns(StudentColumns.from_records(data))
+
+    @classmethod
+    def from_queryset(cls, students: QuerySet) -> 'OlapCube':
+        """Куб двумя агрегатными запросами: по студентам и по оценкам с измерениями студента.
+
+        Группировка идёт по всем измерениям сразу; свёртки (аналог
+        GROUPING SETS) считаются из ячеек в памяти и не требуют запросов.
+        """
+        grades = StudentGrade.objects.all()
+        if students.query.where or students.query.is_sliced:
+            grades = grades.filter(student__in=students.values('id'))
+
+        def moments(queryset, dimensions, value_field):
+            rows = (
+                queryset.order_by().values(*dimensions)
+                .annotate(count=Count('id'), total=Sum(value_field), minimum=Min(value_field),
+                          maximum=Max(value_field), first_id=Min('id'))
+                .order_by('first_id')
+                .values_list(*dimensions, 'count', 'total', 'minimum', 'maximum')
+            )
+            size = len(dimensions)
+            # Суммы считает база; их ошибка округления неизвестна и принимается равной нулю
+            return GroupedMoments({tuple(row[:size]): [*row[size:], 0.0] for row in rows})
+
+        return cls(
+            moments(students, ['major', 'year'], 'missed_hours'),
+            moments(grades, ['student__major', 'student__year', 'subject'], 'score'),
+        )
+
+    def merge(self, other: 'OlapCube') -> 'OlapCube':
+        for name, moments in other.facts.items():
+            self.facts[name].merge(moments)
+        return self
+
+    def rollup(self, measure: str, by: Sequence[str] = (), where: Optional[Dict] = None) -> Dict:
+        """Мера measure по значениям измерений by для ячеек, отобранных where.
+
+        where: измерение -> значение или список значений. Ключи результата —
+        значения измерения (одно измерение в by) или кортежи значений;
+        без by результат — {(): значение}.
+        """
+        if measure not in MEASURES:
+            raise ValueError(f"Неизвестная мера '{measure}', допустимы: {', '.join(MEASURES)}.")
+        fact, aggregate = MEASURES[measure]
+        dimensions = FACTS[fact]
+        where = where or {}
+        for dimension in list(by) + list(where):
+            if dimension not in dimensions:
+                raise ValueError(f"Измерение '{dimension}' недоступно для меры '{measure}'.")
+        positions = [dimensions.index(dimension) for dimension in by]
+        filters = [
+            (dimensions.index(dimension), set(values) if isinstance(values, (list, tuple, set)) else {values})
+            for dimension, values in where.items()
+        ]
+
+        groups, sums = {}, {}
+        for key, (count, total, minimum, maximum, error) in self.cells(fact).items():
+            if any(key[index] not in allowed for index, allowed in filters):
+                continue
+            group = key[positions[0]] if len(positions) == 1 else tuple(key[index] for index in positions)
+            current = groups.get(group)
+            if current is None:
+                groups[group] = [count, total, minimum, maximum, 0]
+                sums[group] = [total, error]
+            else:
+                current[0] += count
+                current[2] = min(current[2], minimum)
+                current[3] = max(current[3], maximum)
+                sums[group] += (total, error)
+        # Суммы ячеек складываются одним math.fsum на группу, независимо от порядка ячеек
+        for group, parts in sums.items():
+            groups[group][1] = add_sums(*parts)[0]
+        return {group: _aggregate(moments, aggregate) for group, moments in groups.items()}
+
+    def cells(self, fact: str) -> Dict:
+        """Ячейки таблицы фактов: кортеж значений измерений -> [count, total, minimum, maximum, error]."""
+        return self.facts[fact].groups
+
+    def to_dict(self) -> Dict:
+        """Представление для JSON и кэша: ячейки в порядке первого появления."""
+        return {name: [list(key) + list(moments) for key, moments in self.cells(name).items()] for name in FACTS}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'OlapCube':
+        facts = {}
+        for name, dimensions in FACTS.items():
+            size = len(dimensions)
+            facts[name] = GroupedMoments({tuple(row[:size]): list(row[size:]) for row in data[name]})
+        return cls(**facts)
+
+
+class CubeBuilder:
+    """Куб по порциям (см. StudentStream.reduce)."""
+
+    def partial(self, chunk: StudentColumns) -> OlapCube:
+        return OlapCube.from_columns(chunk)
+
+    @staticmethod
+    def merge(partial: OlapCube, other: OlapCube) -> OlapCube:
+        return partial.merge(other)
+
+    def finalize(self, partial: OlapCube) -> OlapCube:
+        return partial
+
+
+class CubeStore:
+    """Куб выборки студентов, сохраняемый в кэше до изменения данных."""
+
+    # Версия формата ячеек (count, total, minimum, maximum, error) в ключе кэша
+    prefix = 'eos:cube:2'
+
+    def __init__(self, students: Optional[QuerySet] = None):
+        self.students = Student.objects.all() if students is None else students
+        self.cache = get_cache()
+
+    def key(self) -> str:
+        return f'{self.prefix}:{get_data_version()}:{_digest(str(self.students.query))}'
+
+    def cube(self) -> OlapCube:
+        key = self.key()
+        stored = self.cache.get(key)
+        if stored is None:
+            stored = OlapCube.from_queryset(self.students).to_dict()
+            self.cache.set(key, stored, timeout=getattr(settings, 'EOS_ANALYSIS_CACHE_TIMEOUT', None))
+        return OlapCube.from_dict(stored)
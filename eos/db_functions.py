@@ -0,0 +1,15 @@
+# db_functions.py
+
+from django.db.models import Aggregate, FloatField
+
+
+class PercentileCont(Aggregate):
+    """PERCENTILE_CONT(p) WITHIN GROUP (ORDER BY ...) — только для PostgreSQL."""
+
+    function = 'PERCENTILE_CONT'
+    name = 'PercentileCont'
+    template = '%(function)s(%(percentile)s) WITHIN GROUP (ORDER BY %(expressions)s)'
+    output_field = FloatField()
+
+    def __init__(self, expression, percentile: float = 0.5, **extra):
+        super().__init__(expression, percentile=float(percentile), **extra)
@@ -0,0 +1,86 @@
+# executors.py
+
+import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from threading import Lock
+from typing import Callable, List, Sequence, Tuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+EXECUTOR_KINDS = ('serial', 'thread', 'process')
+
+_executors = {}
+_lock = Lock()
+
+
+def _setup_django():
+    # Процессы запускаются методом spawn: Django в них нужно инициализировать заново
+    import django
+    django.setup()
+
+
+def get_executor(kind: str):
+    """Общий для процесса пул заданного вида; для 'serial' возвращает None."""
+    if kind not in EXECUTOR_KINDS:
+        raise ValueError(f"Неизвестный исполнитель '{kind}', допустимы: {', '.join(EXECUTOR_KINDS)}.")
+    if kind == 'serial':
+        return None
+    with _lock:
+        executor = _executors.get(kind)
+        if executor is None:
+            workers = getattr(settings, 'EOS_ANALYTICS_WORKERS', None)
+            if kind == 'thread':
+                executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='eos-analytics')
+            else:
+                # spawn вместо fork: воркер gunicorn многопоточен, а fork копирует захваченные блокировки
+                executor = ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn'),
+                                               initializer=_setup_django)
+            _executors[kind] = executor
+    return executor
+
+
+def discard_executor(kind: str) -> None:
+    """Убирает сломанный пул, чтобы следующий вызов создал новый."""
+    with _lock:
+        executor = _executors.pop(kind, None)
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_executors() -> None:
+    for kind in list(_executors):
+        discard_executor(kind)
+
+
+def run_tasks(kind: str, func: Callable, tasks: Sequence[tuple]) -> List[Tuple[object, Exception]]:
+    """Выполняет func(*args) для каждого набора аргументов.
+
+    Возвращает пары (результат, исключение) в порядке задач; ошибка одной
+    задачи не мешает остальным.
+    """
+    executor = get_executor(kind)
+    if executor is None:
+        outcomes = []
+        for args in tasks:
+            try:
+                outcomes.append((func(*args), None))
+            except Exception as exc:
+                outcomes.append((None, exc))
+        return outcomes
+
+    futures = [executor.submit(func, *args) for args in tasks]
+    outcomes = []
+    for future in futures:
+        try:
+            outcomes.append((future.result(), None))
+        except BrokenProcessPool as exc:
+            logger.error('Пул процессов аналитики аварийно завершился, он будет создан заново.')
+            discard_executor(kind)
+            outcomes.append((None, exc))
+        except Exception as exc:
+            outcomes.append((None, exc))
+    return outcomes
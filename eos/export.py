@@ -0,0 +1,101 @@
+# export.py
+
+import csv
+import io
+import json
+import zlib
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.db.models import QuerySet
+
+from .models import Student, StudentGrade
+from .student_data import STUDENT_FIELDS
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+# Колонки CSV: по строке на оценку, студент без оценок даёт одну строку с пустыми subject и score
+CSV_COLUMNS = STUDENT_FIELDS + ('subject', 'score')
+
+
+def gzip_stream(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """Сжимает поток частей в формат gzip, не накапливая его в памяти."""
+    # wbits=31: заголовок и контрольная сумма gzip
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+class StudentExporter:
+    """Потоковая выгрузка студентов с оценками в CSV или JSONL.
+
+    Студенты читаются серверным курсором порциями по chunk_size; оценки
+    каждой порции загружаются одним запросом. В памяти одновременно
+    находится не больше одной порции, поэтому расход памяти не зависит
+    от размера таблицы.
+    """
+
+    def __init__(self, queryset: Optional[QuerySet] = None, chunk_size: int = 2000):
+        self.queryset = Student.objects.all() if queryset is None else queryset
+        self.chunk_size = chunk_size
+
+    def chunks(self) -> Iterator[List[Tuple[Dict, List[Tuple[str, float]]]]]:
+        """Порции пар (поля студента, [(дисциплина, балл), ...]) в порядке id."""
+        rows = self.queryset.order_by('id').values_list(*STUDENT_FIELDS).iterator(chunk_size=self.chunk_size)
+        chunk = []
+        for row in rows:
+            chunk.append(dict(zip(STUDENT_FIELDS, row)))
+            if len(chunk) == self.chunk_size:
+                yield self._with_grades(chunk)
+                chunk = []
+        if chunk:
+            yield self._with_grades(chunk)
+
+    def _with_grades(self, students: List[Dict]) -> List[Tuple[Dict, List[Tuple[str, float]]]]:
+        grades = {student['id']: [] for student in students}
+        rows = (
+            StudentGrade.objects.filter(student_id__in=list(grades))
+            .order_by('student_id', 'id')
+            .values_list('student_id', 'subject', 'score')
+        )
+        for student_id, subject, score in rows:
+            grades[student_id].append((subject, score))
+        return [(student, grades[student['id']]) for student in students]
+
+    def csv(self) -> Iterator[str]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(CSV_COLUMNS)
+        for chunk in self.chunks():
+            for student, grades in chunk:
+                values = [student[field] for field in STUDENT_FIELDS]
+                for subject, score in grades or [('', '')]:
+                    writer.writerow(values + [subject, score])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+
+    def jsonl(self) -> Iterator[str]:
+        for chunk in self.chunks():
+            yield ''.join(
+                json.dumps(
+                    dict(student, grades=[{'subject': subject, 'score': score} for subject, score in grades]),
+                    ensure_ascii=False,
+                ) + '\n'
+                for student, grades in chunk
+            )
+
+    def stream(self, export_format: str, compress: bool = False) -> Iterator[bytes]:
+        """Байтовый поток выгрузки; compress=True сжимает его в gzip."""
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(
+                f"Неизвестный формат '{export_format}', допустимы: {', '.join(EXPORT_FORMATS)}.")
+        chunks = (text.encode('utf-8') for text in getattr(self, export_format)())
+        return gzip_stream(chunks) if compress else chunks
@@ -1,6 +1,10 @@
 # eos/forms.py
 
 from django import forms
+from django.db import connection, transaction
+from . import summaries
+from .aggregates import AggregateStore
+from .cache import bump_data_version
 from .models import Student, StudentGrade
 
 class StudentForm(forms.ModelForm):
@@ -34,6 +38,72 @@ class StudentGradeForm(forms.ModelForm):
         model = StudentGrade
         fields = ['subject', 'score']
 
+class BaseStudentGradeFormSet(forms.BaseInlineFormSet):
+    """Формсет оценок, сохраняющий изменения пакетно.
+
+    Вместо запроса INSERT/UPDATE на каждую строку новые оценки
+    добавляются через bulk_create, изменённые — через bulk_update,
+    удалённые — одним DELETE по списку id. Неизменённые формы не дают
+    запросов. Все три операции проходят мимо сигналов моделей (удаление
+    через QuerySet.delete() отправило бы их для каждой строки), поэтому
+    агрегаты аналитики, сводка студента и версия кэша обновляются здесь же,
+    одним apply_many на все изменения.
+    """
+
+    def save(self, commit=True):
+        if not commit:
+            return super().save(commit=False)
+
+        self.new_objects, self.changed_objects, self.deleted_objects = [], [], []
+        changes = []
+        changed_fields = set()
+        for form in self.initial_forms:
+            grade = form.instance
+            if grade.pk is None:
+                continue
+            if self.can_delete and self._should_delete_form(form):
+                self.deleted_objects.append(grade)
+                changes.append((AggregateStore().original_state(grade), {}))
+            elif form.has_changed():
+                # Значения формы уже перенесены в объект при проверке (ModelForm._post_clean)
+                self.changed_objects.append((grade, form.changed_data))
+                changed_fields.update(field for field in form.changed_data if field in form._meta.fields)
+                changes.append((AggregateStore().original_state(grade), AggregateStore().state(grade)))
+        for form in self.extra_forms:
+            if not form.has_changed() or (self.can_delete and self._should_delete_form(form)):
+                continue
+            grade = form.instance
+            setattr(grade, self.fk.name, self.instance)
+            self.new_objects.append(grade)
+            changes.append(({}, AggregateStore().state(grade)))
+
+        if not changes:
+            return self.new_objects
+        with transaction.atomic():
+            if self.deleted_objects:
+                self.delete_grades([grade.pk for grade in self.deleted_objects])
+            if self.changed_objects and changed_fields:
+                StudentGrade.objects.bulk_update([grade for grade, fields in self.changed_objects],
+                                                 sorted(changed_fields))
+            if self.new_objects:
+                StudentGrade.objects.bulk_create(self.new_objects)
+            AggregateStore().apply_many(changes)
+            bump_data_version()
+            summaries.schedule(self.instance.pk)
+        for grade, fields in self.changed_objects:
+            AggregateStore().remember(grade)
+        return self.new_objects
+
+    @staticmethod
+    def delete_grades(ids):
+        # На оценки никто не ссылается, поэтому каскад не нужен и строки удаляются одним запросом
+        meta = StudentGrade._meta
+        placeholders = ', '.join(['%s'] * len(ids))
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {connection.ops.quote_name(meta.db_table)} '
+                           f'WHERE {connection.ops.quote_name(meta.pk.column)} IN ({placeholders})', ids)
+
+
 StudentGradeFormSet = forms.inlineformset_factory(
-    Student, StudentGrade, form=StudentGradeForm, extra=1, can_delete=True
+    Student, StudentGrade, form=StudentGradeForm, formset=BaseStudentGradeFormSet, extra=1, can_delete=True
 )
@@ -0,0 +1,241 @@
+# importer.py
+
+import csv
+import hashlib
+import json
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .summaries import StudentSummaryStore
+from .aggregates import AggregateStore
+from .cache import bump_data_version
+from .forms import StudentEditForm, StudentGradeForm
+from .models import Student, StudentGrade, StudentImport
+
+IMPORT_FORMATS = ('csv', 'jsonl')
+
+# Поля студента, которые принимает загрузка (правила проверки — из StudentEditForm)
+IMPORT_FIELDS = tuple(StudentEditForm._meta.fields)
+
+
+class InvalidImport(ValueError):
+    pass
+
+
+def file_digest(chunks: Iterable[bytes]) -> str:
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_jsonl(lines: Iterable[str]) -> Iterator[Dict]:
+    """Записи JSONL: по объекту студента с вложенным списком grades на строку."""
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = {'__error__': f'Строка {number}: некорректный JSON.'}
+        if not isinstance(record, dict):
+            record = {'__error__': f'Строка {number}: ожидался объект.'}
+        yield record
+
+
+def read_csv(lines: Iterable[str]) -> Iterator[Dict]:
+    """Записи CSV в формате выгрузки: строка на оценку.
+
+    Идущие подряд строки с одинаковым непустым id относятся к одному
+    студенту; id источника не сохраняется, студенту назначается новый.
+    """
+    record, record_id = None, None
+    for row in csv.DictReader(lines):
+        row_id = (row.get('id') or '').strip()
+        if record is None or not row_id or row_id != record_id:
+            if record is not None:
+                yield record
+            record = {field: row.get(field) for field in IMPORT_FIELDS}
+            record['grades'] = []
+            record_id = row_id
+        if row.get('subject') or row.get('score'):
+            record['grades'].append({'subject': row.get('subject'), 'score': row.get('score')})
+    if record is not None:
+        yield record
+
+
+class FormValidator:
+    """Проверяет записи правилами ModelForm, не создавая форму на каждую запись.
+
+    Создание формы копирует все её поля (deepcopy), и при массовой
+    загрузке это занимает больше времени, чем сама проверка. Здесь
+    значения проверяются полями класса формы (clean() не меняет их
+    состояние), а затем, как в ModelForm, проверяется объект модели
+    full_clean() по тем же полям.
+    """
+
+    def __init__(self, form_class):
+        self.fields = form_class.base_fields
+        self.model = form_class._meta.model
+        # Поля модели вне формы (например, внешний ключ оценки) проверяются при сохранении
+        self.exclude = [field.name for field in self.model._meta.fields if field.name not in self.fields]
+
+    def validate(self, data: Dict):
+        """Возвращает (несохранённый объект, None) или (None, ошибки по полям)."""
+        values, errors = {}, {}
+        for name, field in self.fields.items():
+            try:
+                values[name] = field.clean(field.widget.value_from_datadict(data, {}, name))
+            except ValidationError as exc:
+                errors[name] = list(exc.messages)
+        if errors:
+            return None, errors
+        instance = self.model(**values)
+        try:
+            instance.full_clean(exclude=self.exclude, validate_unique=False)
+        except ValidationError as exc:
+            return None, {field: list(messages) for field, messages in exc.message_dict.items()}
+        return instance, None
+
+
+class StudentImporter:
+    """Массовая загрузка студентов и оценок.
+
+    Каждая запись проверяется формами StudentEditForm и StudentGradeForm;
+    запись с ошибкой отклоняется целиком и попадает в отчёт, остальные
+    загружаются. Корректные записи сохраняются пачками по batch_size
+    студентов через bulk_create, каждая пачка — в отдельной транзакции
+    вместе с продвижением StudentImport.processed. После сбоя загрузку
+    того же файла можно продолжить с первой незафиксированной записи.
+
+    bulk_create не отправляет сигналы моделей, поэтому агрегаты, сводки
+    студентов, версия кэша анализа и индекс поиска обновляются явно после
+    каждой пачки. Места в специальностях пересчитываются один раз, в конце
+    загрузки.
+    """
+
+    def __init__(self, batch_size: int = 1000, max_errors: Optional[int] = None):
+        self.batch_size = batch_size
+        self.student_validator = FormValidator(StudentEditForm)
+        self.grade_validator = FormValidator(StudentGradeForm)
+        self.max_errors = max_errors if max_errors is not None else getattr(settings, 'EOS_IMPORT_MAX_ERRORS', 1000)
+        # Специальности загруженных студентов; места в них пересчитываются в конце загрузки
+        self.majors = set()
+
+    @staticmethod
+    def records(lines: Iterable[str], import_format: str) -> Iterator[Dict]:
+        if import_format not in IMPORT_FORMATS:
+            raise InvalidImport(f"Неизвестный формат '{import_format}', допустимы: {', '.join(IMPORT_FORMATS)}.")
+        return read_csv(lines) if import_format == 'csv' else read_jsonl(lines)
+
+    def validate(self, record: Dict) -> Tuple[Optional[Student], List[StudentGrade], Dict]:
+        """Проверяет запись; возвращает несохранённые объекты или ошибки по полям."""
+        if '__error__' in record:
+            return None, [], {'__all__': [record['__error__']]}
+
+        data = {field: record.get(field) for field in IMPORT_FIELDS}
+        # Пропущенные часы необязательны при загрузке, как и в модели
+        if data.get('missed_hours') in (None, ''):
+            data['missed_hours'] = 0
+        student, errors = self.student_validator.validate(data)
+        errors = errors or {}
+
+        grades, subjects = [], set()
+        raw_grades = record.get('grades') or []
+        if not isinstance(raw_grades, list):
+            errors['grades'] = ['Ожидался список оценок.']
+            raw_grades = []
+        for index, grade in enumerate(raw_grades):
+            instance, grade_errors = self.grade_validator.validate(grade if isinstance(grade, dict) else {})
+            if grade_errors:
+                for field, messages in grade_errors.items():
+                    errors[f'grades[{index}].{field}'] = messages
+                continue
+            if instance.subject in subjects:
+                errors[f'grades[{index}].subject'] = [f"Повторная оценка по дисциплине '{instance.subject}'."]
+                continue
+            subjects.add(instance.subject)
+            grades.append(instance)
+
+        if errors:
+            return None, [], errors
+        return student, grades, {}
+
+    def run(self, lines: Iterable[str], job: StudentImport) -> StudentImport:
+        """Загружает записи, пропуская уже обработанные в job (продолжение после сбоя)."""
+        batch, rejected = [], []
+        position = 0
+        # После продолжения загрузки специальности студентов прежних пачек неизвестны (None — все)
+        self.majors = set() if job.processed == 0 else None
+        for position, record in enumerate(self.records(lines, job.format), 1):
+            if position <= job.processed:
+                continue
+            student, grades, errors = self.validate(record)
+            if errors:
+                rejected.append({'record': position, 'errors': errors})
+            else:
+                batch.append((student, grades))
+            if len(batch) >= self.batch_size or len(rejected) >= self.batch_size:
+                self._save(job, batch, rejected, position)
+                batch, rejected = [], []
+        self._save(job, batch, rejected, max(position, job.processed), finished=True)
+        return job
+
+    def _save(self, job: StudentImport, batch: List, rejected: List[Dict], position: int,
+              finished: bool = False) -> None:
+        students = [student for student, grades in batch]
+        with transaction.atomic():
+            Student.objects.bulk_create(students, batch_size=self.batch_size)
+            grades = []
+            for student, student_grades in batch:
+                for grade in student_grades:
+                    grade.student = student
+                    grades.append(grade)
+            StudentGrade.objects.bulk_create(grades, batch_size=self.batch_size)
+            AggregateStore().add_many(students + grades)
+            summaries = StudentSummaryStore()
+            summaries.refresh([student.pk for student in students], ranks=False)
+            if self.majors is not None:
+                self.majors.update(student.major for student in students)
+            if finished:
+                # Места по всем пачкам — одним пересчётом (все специальности, если загрузку продолжали)
+                summaries.refresh_ranks(self.majors)
+
+            job.processed = position
+            job.students += len(students)
+            job.grades += len(grades)
+            job.failed += len(rejected)
+            job.errors = (job.errors + rejected)[:self.max_errors]
+            job.finished = finished
+            job.save()
+        if batch:
+            # Новая версия данных заодно делает устаревшими индексы поиска в памяти (eos/search.py)
+            bump_data_version()
+
+    @staticmethod
+    def start(source: str, digest: str, import_format: str, resume: bool = False) -> StudentImport:
+        """Новая загрузка или, при resume, незавершённая загрузка того же файла."""
+        if resume:
+            job = StudentImport.objects.filter(digest=digest, finished=False).order_by('-id').first()
+            if job is not None:
+                return job
+        if StudentImport.objects.filter(digest=digest, finished=True).exists():
+            raise InvalidImport('Этот файл уже загружен.')
+        return StudentImport.objects.create(source=source[:255], digest=digest, format=import_format)
+
+
+def report(job: StudentImport) -> Dict:
+    return {
+        'import': job.id,
+        'source': job.source,
+        'format': job.format,
+        'processed': job.processed,
+        'students': job.students,
+        'grades': job.grades,
+        'failed': job.failed,
+        'errors': job.errors,
+        'finished': job.finished,
+    }
@@ -0,0 +1,232 @@
+# jobs.py
+
+import logging
+import math
+import os
+import socket
+import threading
+from datetime import timedelta
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .cache import _digest, get_data_version
+from .models import AnalysisJob, Student
+from .plot_store import PlotStore
+
+logger = logging.getLogger(__name__)
+
+
+def json_value(value):
+    # Значения numpy и NaN (пустая выборка) приводятся к типам, допустимым в JSON
+    if hasattr(value, 'item'):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def json_results(analysis_results: Dict) -> Dict:
+    """Результат run_analysis в виде, пригодном для JSON: ключи результатов модулей — строки."""
+    results = {}
+    for name, result in analysis_results.items():
+        if name == 'statistics':
+            results[name] = {key: json_value(value) for key, value in (result or {}).items()}
+            continue
+        results[name] = {
+            'name': result['name'],
+            'result': {str(key): json_value(value) for key, value in (result['result'] or {}).items()},
+            'plot_format': result.get('plot_format'),
+            'plot': result['plot'],
+            'error': result.get('error'),
+        }
+    return results
+
+
+def restore_plots(results: Optional[Dict]) -> Optional[Dict]:
+    """Заново строит сохранённые графики результата, вытесненные из PlotStore.
+
+    Результаты заданий живут дольше файлов графиков, поэтому ссылка в
+    готовом результате может вести на удалённое изображение. График
+    строится по тому же хэшу, так что ссылка остаётся прежней.
+    """
+    from .analytics import AnalyticsEngine
+
+    if not results:
+        return results
+    store = PlotStore()
+    modules = {module.name: module for module in AnalyticsEngine().modules}
+    for name, result in results.items():
+        if name == 'statistics' or result.get('plot_format') != 'url' or not result.get('plot'):
+            continue
+        module = modules.get(name)
+        if module is None or module.plot_strategy.output_format != 'url':
+            continue
+        data = result['result']
+        store.get_or_render(store.digest_from_url(result['plot']),
+                            lambda: module.plot_strategy.render_png(data))
+    return results
+
+
+class AnalysisQueue:
+    """Очередь заданий анализа в таблице AnalysisJob, без внешнего брокера.
+
+    submit() возвращает задание для текущей версии данных: готовое, уже
+    стоящее в очереди или новое, так что одновременные одинаковые запросы
+    выполняются один раз. Версия данных берётся из базы (DataVersion),
+    поэтому ключ одинаков во всех процессах. Воркеры (manage.py
+    analysis_worker) забирают задания условным UPDATE, который проходит
+    только у одного из них, и, пока выполняют задание, обновляют его
+    heartbeat_at. Задание без отметки дольше EOS_ANALYSIS_JOB_TIMEOUT
+    (воркер остановлен) возвращается в очередь; результат записывается,
+    только если задание всё ещё принадлежит выполнившему его воркеру.
+    """
+
+    def __init__(self, column_name: str = 'missed_hours'):
+        self.column_name = column_name
+
+    def key(self, data_version: int) -> str:
+        # Результат зависит от способа построения графиков и режима статистики
+        options = (
+            getattr(settings, 'EOS_PLOT_RENDERER', 'png'),
+            getattr(settings, 'EOS_ANALYTICS_APPROXIMATE', False),
+        )
+        return _digest(f'{self.column_name}:{data_version}:{options}')
+
+    def submit(self) -> AnalysisJob:
+        data_version = get_data_version()
+        key = self.key(data_version)
+        job = (
+            AnalysisJob.objects.filter(key=key)
+            .exclude(status=AnalysisJob.FAILED)
+            .order_by('-id').first()
+        )
+        if job is not None:
+            return job
+        try:
+            with transaction.atomic():
+                return AnalysisJob.objects.create(key=key, column_name=self.column_name, data_version=data_version)
+        except IntegrityError:
+            # Такое же задание только что поставил параллельный запрос
+            return AnalysisJob.objects.filter(
+                key=key, status__in=[AnalysisJob.PENDING, AnalysisJob.RUNNING]).order_by('-id').first()
+
+    def latest(self) -> Optional[AnalysisJob]:
+        """Последнее выполненное задание (результат для показа, пока считается новое)."""
+        return (
+            AnalysisJob.objects.filter(column_name=self.column_name, status=AnalysisJob.DONE)
+            .order_by('-id').first()
+        )
+
+    @staticmethod
+    def requeue_stale() -> int:
+        deadline = timezone.now() - timedelta(seconds=getattr(settings, 'EOS_ANALYSIS_JOB_TIMEOUT', 600))
+        return AnalysisJob.objects.filter(
+            Q(heartbeat_at__lt=deadline) | Q(heartbeat_at__isnull=True, started_at__lt=deadline),
+            status=AnalysisJob.RUNNING,
+        ).update(status=AnalysisJob.PENDING, worker='')
+
+    @staticmethod
+    def claim(worker: str) -> Optional[AnalysisJob]:
+        """Забирает первое задание из очереди или возвращает None."""
+        while True:
+            job = AnalysisJob.objects.filter(status=AnalysisJob.PENDING).order_by('id').first()
+            if job is None:
+                return None
+            now = timezone.now()
+            claimed = AnalysisJob.objects.filter(pk=job.pk, status=AnalysisJob.PENDING).update(
+                status=AnalysisJob.RUNNING, worker=worker[:100], started_at=now, heartbeat_at=now)
+            if claimed:
+                job.refresh_from_db()
+                return job
+            # Задание забрал другой воркер — берётся следующее
+
+    @staticmethod
+    def run(job: AnalysisJob) -> AnalysisJob:
+        from .analytics import AnalyticsEngine
+
+        try:
+            with Heartbeat(job):
+                # Кэш анализа не используется: версия в кэше процесса воркера может отставать от базы
+                results = AnalyticsEngine().run_analysis(Student.objects.all(), job.column_name, use_cache=False)
+            job.result, job.status = json_results(results), AnalysisJob.DONE
+        except Exception as exc:
+            logger.exception('Ошибка задания анализа #%s', job.id)
+            job.error, job.status = str(exc), AnalysisJob.FAILED
+        job.finished_at = timezone.now()
+        finished = AnalysisJob.objects.filter(pk=job.pk, worker=job.worker, status=AnalysisJob.RUNNING).update(
+            result=job.result, error=job.error, status=job.status, finished_at=job.finished_at)
+        if not finished:
+            # Задание вернули в очередь и выполнил другой воркер: его результат не перезаписывается
+            logger.warning('Задание анализа #%s больше не принадлежит воркеру %s', job.id, job.worker)
+        return job
+
+    @staticmethod
+    def prune() -> int:
+        """Удаляет завершённые задания старше EOS_ANALYSIS_JOB_RETENTION, кроме последнего выполненного."""
+        retention = timedelta(seconds=getattr(settings, 'EOS_ANALYSIS_JOB_RETENTION', 86400))
+        latest = AnalysisJob.objects.filter(status=AnalysisJob.DONE).order_by('-id').values_list('id', flat=True)[:1]
+        deleted, _ = (
+            AnalysisJob.objects.filter(
+                status__in=[AnalysisJob.DONE, AnalysisJob.FAILED], finished_at__lt=timezone.now() - retention)
+            .exclude(id__in=list(latest))
+            .delete()
+        )
+        return deleted
+
+    def work(self, worker: Optional[str] = None, limit: Optional[int] = None) -> int:
+        """Выполняет задания из очереди, пока она не опустеет (или limit заданий); возвращает их число."""
+        worker = worker or f'{socket.gethostname()}:{os.getpid()}'
+        self.requeue_stale()
+        done = 0
+        while limit is None or done < limit:
+            job = self.claim(worker)
+            if job is None:
+                break
+            self.run(job)
+            done += 1
+        return done
+
+
+class Heartbeat:
+    """Пока задание выполняется, отдельный поток обновляет его heartbeat_at.
+
+    Отметка ставится каждую треть EOS_ANALYSIS_JOB_TIMEOUT, так что
+    долгий анализ работающего воркера не возвращается в очередь.
+    """
+
+    def __init__(self, job: AnalysisJob):
+        self.job = job
+        self.interval = getattr(settings, 'EOS_ANALYSIS_JOB_TIMEOUT', 600) / 3
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target=self.beat, daemon=True)
+
+    def __enter__(self) -> 'Heartbeat':
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop.set()
+        self.thread.join()
+
+    def beat(self) -> None:
+        try:
+            while not self.stop.wait(self.interval):
+                AnalysisJob.objects.filter(
+                    pk=self.job.pk, worker=self.job.worker, status=AnalysisJob.RUNNING,
+                ).update(heartbeat_at=timezone.now())
+        finally:
+            # У потока своё соединение с базой
+            connection.close()
+
+
+def job_status(job: AnalysisJob) -> Dict:
+    status = {'job': job.id, 'status': job.status, 'data_version': job.data_version}
+    if job.status == AnalysisJob.DONE:
+        status['result'] = restore_plots(job.result)
+    if job.status == AnalysisJob.FAILED:
+        status['error'] = job.error
+    return status
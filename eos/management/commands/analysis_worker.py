@@ -0,0 +1,61 @@
+import os
+import socket
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+
+from eos.jobs import AnalysisQueue
+
+
+class Command(BaseCommand):
+    help = 'Выполняет задания анализа из очереди AnalysisJob (режим EOS_ANALYSIS_MODE=queue).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=1, help='Число потоков-воркеров.')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Пауза между проверками пустой очереди, в секундах.')
+        parser.add_argument('--once', action='store_true',
+                            help='Выполнить задания, которые есть в очереди, и завершиться.')
+
+    def handle(self, *args, **options):
+        concurrency = options['concurrency']
+        if concurrency < 1:
+            raise CommandError('--concurrency должен быть положительным.')
+        self.stop = threading.Event()
+        self.done = [0] * concurrency
+
+        # Первый воркер работает в основном потоке, остальные — в отдельных со своими соединениями
+        threads = [threading.Thread(target=self.thread_loop, args=(index, options), daemon=True)
+                   for index in range(1, concurrency)]
+        for thread in threads:
+            thread.start()
+        try:
+            self.loop(0, options)
+        except KeyboardInterrupt:
+            # Текущие задания дорабатываются, новые не берутся
+            self.stop.set()
+        for thread in threads:
+            thread.join()
+        self.stdout.write(self.style.SUCCESS(f'Выполнено заданий: {sum(self.done)}.'))
+
+    def thread_loop(self, index: int, options) -> None:
+        try:
+            self.loop(index, options)
+        finally:
+            connection.close()
+
+    def loop(self, index: int, options) -> None:
+        queue = AnalysisQueue()
+        worker = f'{socket.gethostname()}:{os.getpid()}:{index}'
+        while not self.stop.is_set():
+            done = queue.work(worker)
+            self.done[index] += done
+            if options['once']:
+                break
+            if index == 0:
+                queue.prune()
+            if not done:
+                self.stop.wait(options['poll_interval'])
+            # Соединение, закрытое базой за время ожидания, открывается заново
+            close_old_connections()
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from eos.plot_store import PlotStore
+
+
+class Command(BaseCommand):
+    help = 'Удаляет давно не использованные графики из дискового кэша.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-bytes', type=int, default=None,
+                            help='Допустимый объём кэша (по умолчанию EOS_PLOT_CACHE_MAX_BYTES).')
+        parser.add_argument('--all', action='store_true', help='Удалить все графики.')
+
+    def handle(self, *args, **options):
+        store = PlotStore()
+        if options['all']:
+            removed = store.clear()
+        else:
+            removed = store.evict(max_bytes=options['max_bytes'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено файлов: {removed}, объём кэша: {store.size()} байт.'))
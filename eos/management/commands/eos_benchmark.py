@@ -0,0 +1,61 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from eos.benchmarks import BENCHMARKS, compare
+
+
+class Command(BaseCommand):
+    help = 'Запускает бенчмарк eos; созданные им данные откатываются после завершения.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=sorted(BENCHMARKS), help='Имя бенчмарка.')
+        parser.add_argument(
+            '--param', action='append', default=[], metavar='KEY=VALUE',
+            help='Параметр бенчмарка (целое число), можно указать несколько раз.',
+        )
+        parser.add_argument('--output', metavar='PATH', help='Сохранить результат в JSON-файл.')
+        parser.add_argument(
+            '--baseline', metavar='PATH',
+            help='JSON-файл прежнего запуска (--output); при замедлении метрик команда завершается с ошибкой.',
+        )
+        parser.add_argument(
+            '--tolerance', type=int, default=20, metavar='PERCENT',
+            help='Допустимое замедление относительно базового результата, в процентах (по умолчанию 20).',
+        )
+
+    def handle(self, *args, **options):
+        params = {}
+        for param in options['param']:
+            key, separator, value = param.partition('=')
+            if not separator or not value.lstrip('-').isdigit():
+                raise CommandError(f"Параметр '{param}' должен иметь вид ключ=целое_число.")
+            params[key] = int(value)
+
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as file:
+                baseline = json.load(file)
+            if baseline.get('benchmark') != options['name'] or baseline.get('params') != params:
+                raise CommandError('Базовый результат получен для другого бенчмарка или других параметров.')
+
+        with transaction.atomic():
+            result = BENCHMARKS[options['name']](**params)
+            # Синтетические данные бенчмарка не сохраняются в базе
+            transaction.set_rollback(True)
+
+        report = {'benchmark': options['name'], 'params': params, 'result': result}
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        self.stdout.write(output)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output + '\n')
+
+        if baseline is not None:
+            regressions = compare(baseline['result'], result, options['tolerance'])
+            for key, (before, after) in regressions.items():
+                self.stderr.write(f'{key}: {before:.2f} -> {after:.2f}')
+            if regressions:
+                raise CommandError(f'Замедление относительно базового результата: {len(regressions)} метрик.')
+            self.stderr.write(self.style.SUCCESS('Замедлений относительно базового результата нет.'))
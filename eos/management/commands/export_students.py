@@ -0,0 +1,39 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from eos.export import EXPORT_FORMATS, StudentExporter
+
+
+class Command(BaseCommand):
+    help = 'Потоковая выгрузка студентов и оценок в CSV или JSONL.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='csv', help='Формат выгрузки.')
+        parser.add_argument('--gzip', action='store_true', help='Сжать выгрузку в gzip.')
+        parser.add_argument('--output', '-o', default='-', help='Файл для записи (по умолчанию stdout).')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Число студентов в порции.')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size должен быть положительным.')
+        chunks = StudentExporter(chunk_size=options['chunk_size']).stream(options['format'], compress=options['gzip'])
+        if options['output'] == '-':
+            if options['gzip']:
+                output = getattr(sys.stdout, 'buffer', None)
+                if output is None:
+                    raise CommandError('Для вывода gzip укажите файл в --output.')
+                for chunk in chunks:
+                    output.write(chunk)
+                output.flush()
+            else:
+                for chunk in chunks:
+                    self.stdout.write(chunk.decode('utf-8'), ending='')
+            return
+
+        written = 0
+        with open(options['output'], 'wb') as output:
+            for chunk in chunks:
+                output.write(chunk)
+                written += len(chunk)
+        self.stdout.write(self.style.SUCCESS(f"Выгрузка записана в {options['output']} ({written} байт)."))
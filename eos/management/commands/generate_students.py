@@ -0,0 +1,41 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+
+from eos.benchmarks.data import SUBJECTS, create_dataset
+from eos.models import Student, StudentGrade, StudentSummary
+
+
+class Command(BaseCommand):
+    help = ('Создаёт синтетических студентов и оценки (например, 1000 … 1000000 студентов) '
+            'для замеров производительности. При одинаковом --seed данные одинаковы.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=1000, help='Число студентов (по умолчанию 1000).')
+        parser.add_argument('--grades', type=int, default=5,
+                            help=f'Оценок у студента, не больше {len(SUBJECTS)} (по умолчанию 5).')
+        parser.add_argument('--seed', type=int, default=0, help='Начальное значение генератора (по умолчанию 0).')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Размер пакета вставки (по умолчанию 5000).')
+        parser.add_argument('--clear', action='store_true', help='Сначала удалить всех студентов и их оценки.')
+
+    def handle(self, *args, **options):
+        if options['students'] < 1 or options['batch_size'] < 1:
+            raise CommandError('Число студентов и размер пакета должны быть положительными.')
+        if not 0 <= options['grades'] <= len(SUBJECTS):
+            raise CommandError(f'Число оценок должно быть от 0 до {len(SUBJECTS)}.')
+
+        start = perf_counter()
+        with transaction.atomic():
+            if options['clear']:
+                # TRUNCATE (DELETE на SQLite) без загрузки объектов и сигналов; агрегаты и сводки
+                # create_dataset пересобирает
+                tables = [model._meta.db_table for model in (StudentSummary, StudentGrade, Student)]
+                connection.ops.execute_sql_flush(connection.ops.sql_flush(no_style(), tables))
+            create_dataset(options['students'], grades_per_student=options['grades'],
+                           seed=options['seed'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано студентов: {options["students"]}, оценок: {options["students"] * options["grades"]} '
+            f'за {perf_counter() - start:.1f} с; всего студентов: {Student.objects.count()}.'
+        ))
@@ -0,0 +1,54 @@
+import gzip
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from eos.importer import IMPORT_FORMATS, InvalidImport, StudentImporter, file_digest, report
+
+
+def _format_from_name(name: str) -> str:
+    suffixes = Path(name.removesuffix('.gz')).suffixes
+    return suffixes[-1].lstrip('.') if suffixes else ''
+
+
+class Command(BaseCommand):
+    help = 'Массовая загрузка студентов и оценок из CSV или JSONL (формат выгрузки export_students).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл загрузки; .gz распаковывается на лету.')
+        parser.add_argument('--format', choices=IMPORT_FORMATS, default=None,
+                            help='Формат файла (по умолчанию — по расширению).')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Число студентов в транзакции.')
+        parser.add_argument('--resume', action='store_true',
+                            help='Продолжить незавершённую загрузку этого же файла.')
+
+    def _open(self, path: str):
+        if path.endswith('.gz'):
+            return gzip.open(path, 'rt', encoding='utf-8', newline='')
+        return open(path, encoding='utf-8', newline='')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        import_format = options['format'] or _format_from_name(path)
+        if import_format not in IMPORT_FORMATS:
+            raise CommandError('Не удалось определить формат файла, укажите --format.')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть положительным.')
+
+        try:
+            with open(path, 'rb') as file:
+                digest = file_digest(iter(lambda: file.read(1 << 20), b''))
+            job = StudentImporter.start(path, digest, import_format, resume=options['resume'])
+            if job.processed:
+                self.stdout.write(f'Продолжение загрузки #{job.id} с записи {job.processed + 1}.')
+            with self._open(path) as lines:
+                StudentImporter(batch_size=options['batch_size']).run(lines, job)
+        except (OSError, InvalidImport) as exc:
+            raise CommandError(str(exc))
+
+        result = report(job)
+        for error in result['errors']:
+            self.stderr.write(f"Запись {error['record']}: {json.dumps(error['errors'], ensure_ascii=False)}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Загрузка #{job.id}: студентов {job.students}, оценок {job.grades}, отклонено записей {job.failed}."))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from eos.aggregates import AggregateStore
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает накопленные агрегаты аналитики или проверяет их расхождение с данными.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Только сравнить накопленные агрегаты с пересчитанными, ничего не изменяя.',
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=1e-6,
+            help='Допустимое отклонение сумм, минимумов и максимумов.',
+        )
+
+    def handle(self, *args, **options):
+        store = AggregateStore()
+        if options['check']:
+            differences = store.drift(tolerance=options['tolerance'])
+            for (dimension, key), (stored, expected) in sorted(differences.items()):
+                self.stdout.write(f'{dimension}={key}: накоплено {stored}, должно быть {expected}')
+            if differences:
+                raise CommandError(f'Найдено расхождений: {len(differences)}.')
+            self.stdout.write(self.style.SUCCESS('Накопленные агрегаты совпадают с данными.'))
+            return
+
+        store.rebuild()
+        self.stdout.write(self.style.SUCCESS('Накопленные агрегаты пересобраны.'))
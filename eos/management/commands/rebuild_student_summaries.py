@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from eos.models import StudentSummary
+from eos.summaries import StudentSummaryStore
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает сводки студентов: средний балл, лучшую и худшую дисциплины, место в специальности.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ranks-only', action='store_true',
+                            help='Только пересчитать места в специальностях.')
+
+    def handle(self, *args, **options):
+        store = StudentSummaryStore()
+        if options['ranks_only']:
+            changed = store.refresh_ranks()
+            self.stdout.write(self.style.SUCCESS(f'Изменено мест: {changed}.'))
+            return
+        store.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Сводки пересобраны: {StudentSummary.objects.count()}.'))
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:51
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Sum
+
+
+def fill_aggregates(apps, schema_editor):
+    Student = apps.get_model('eos', 'Student')
+    StudentGrade = apps.get_model('eos', 'StudentGrade')
+    AnalyticsAggregate = apps.get_model('eos', 'AnalyticsAggregate')
+
+    aggregates = []
+    for dimension, model, key_field, value_field in (
+        ('subject', StudentGrade, 'subject', 'score'),
+        ('major', Student, 'major', None),
+        ('year', Student, 'year', 'missed_hours'),
+    ):
+        rows = (
+            model.objects.order_by().values(key_field)
+            .annotate(count=Count('id'), first_id=Min('id'))
+            .order_by('first_id')
+        )
+        if value_field:
+            rows = rows.annotate(total=Sum(value_field), minimum=Min(value_field), maximum=Max(value_field))
+        for row in rows:
+            aggregates.append(AnalyticsAggregate(
+                dimension=dimension, key=str(row[key_field]), count=row['count'],
+                total=row['total'] if value_field else row['count'],
+                minimum=row['minimum'] if value_field else 1,
+                maximum=row['maximum'] if value_field else 1,
+            ))
+    AnalyticsAggregate.objects.bulk_create(aggregates)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eos', '0003_remove_student_student_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalyticsAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(max_length=20)),
+                ('key', models.CharField(max_length=100)),
+                ('total', models.FloatField(default=0)),
+                ('count', models.IntegerField(default=0)),
+                ('minimum', models.FloatField(blank=True, null=True)),
+                ('maximum', models.FloatField(blank=True, null=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('dimension', 'key'), name='eos_aggregate_dimension_key')],
+            },
+        ),
+        migrations.RunPython(fill_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations
+
+
+# Триграммный GIN-индекс ускоряет name__icontains, который Django на PostgreSQL
+# превращает в UPPER("name"::text) LIKE UPPER('%...%'). На других СУБД миграция ничего не делает.
+
+def create_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS eos_student_name_trgm '
+        'ON eos_student USING gin ((UPPER("name"::text)) gin_trgm_ops)'
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS eos_student_name_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eos', '0004_analyticsaggregate'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
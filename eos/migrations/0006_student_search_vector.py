@@ -0,0 +1,57 @@
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+# Поисковый вектор заполняется триггером, поэтому остаётся актуальным и при
+# bulk_create/update в обход сигналов Django. Словарь 'simple' не приводит
+# слова к основе: имена и email ищутся как есть. На других СУБД столбец
+# остаётся пустым, а поиск идёт по индексу в памяти (eos.search.TrigramIndex).
+
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('simple', coalesce({table}name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce({table}email, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce({table}major, '')), 'C')"
+)
+
+
+def create_search_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE OR REPLACE FUNCTION eos_student_search_vector_update() RETURNS trigger AS $$ '
+        'BEGIN NEW.search_vector := ' + SEARCH_VECTOR_SQL.format(table='NEW.') + '; RETURN NEW; END '
+        '$$ LANGUAGE plpgsql'
+    )
+    schema_editor.execute(
+        'CREATE TRIGGER eos_student_search_vector '
+        'BEFORE INSERT OR UPDATE OF name, email, major, search_vector ON eos_student '
+        'FOR EACH ROW EXECUTE FUNCTION eos_student_search_vector_update()'
+    )
+    schema_editor.execute('UPDATE eos_student SET search_vector = ' + SEARCH_VECTOR_SQL.format(table=''))
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS eos_student_search_vector ON eos_student USING gin (search_vector)'
+    )
+
+
+def drop_search_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS eos_student_search_vector')
+    schema_editor.execute('DROP TRIGGER IF EXISTS eos_student_search_vector ON eos_student')
+    schema_editor.execute('DROP FUNCTION IF EXISTS eos_student_search_vector_update()')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eos', '0005_student_name_trigram_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_trigger, drop_search_trigger),
+    ]
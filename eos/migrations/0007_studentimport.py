@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eos', '0006_student_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=255)),
+                ('digest', models.CharField(db_index=True, max_length=64)),
+                ('format', models.CharField(max_length=10)),
+                ('processed', models.IntegerField(default=0)),
+                ('students', models.IntegerField(default=0)),
+                ('grades', models.IntegerField(default=0)),
+                ('failed', models.IntegerField(default=0)),
+                ('errors', models.JSONField(default=list)),
+                ('finished', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F, Window
+from django.db.models.functions import Rank
+
+
+def fill_summaries(apps, schema_editor):
+    Student = apps.get_model('eos', 'Student')
+    StudentGrade = apps.get_model('eos', 'StudentGrade')
+    StudentSummary = apps.get_model('eos', 'StudentSummary')
+
+    summaries = {student_id: StudentSummary(student_id=student_id, grades=0)
+                 for student_id in Student.objects.values_list('id', flat=True)}
+    totals = {}
+    rows = StudentGrade.objects.order_by('student_id', 'id').values_list('student_id', 'subject', 'score')
+    for student_id, subject, score in rows.iterator(chunk_size=2000):
+        summary = summaries[student_id]
+        totals[student_id] = totals.get(student_id, 0) + score
+        summary.grades += 1
+        if summary.best_score is None or score > summary.best_score:
+            summary.best_subject, summary.best_score = subject, score
+        if summary.worst_score is None or score < summary.worst_score:
+            summary.worst_subject, summary.worst_score = subject, score
+    for student_id, total in totals.items():
+        summaries[student_id].gpa = total / summaries[student_id].grades
+    StudentSummary.objects.bulk_create(summaries.values(), batch_size=1000)
+
+    ranked = StudentSummary.objects.filter(gpa__isnull=False).annotate(
+        rank=Window(Rank(), partition_by=F('student__major'), order_by=F('gpa').desc()))
+    changed = []
+    for summary in ranked:
+        summary.major_rank = summary.rank
+        changed.append(summary)
+    StudentSummary.objects.bulk_update(changed, ['major_rank'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eos', '0008_analysisjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentSummary',
+            fields=[
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='eos.student')),
+                ('gpa', models.FloatField(blank=True, null=True)),
+                ('grades', models.IntegerField(default=0)),
+                ('best_subject', models.CharField(blank=True, default='', max_length=100)),
+                ('best_score', models.FloatField(blank=True, null=True)),
+                ('worst_subject', models.CharField(blank=True, default='', max_length=100)),
+                ('worst_score', models.FloatField(blank=True, null=True)),
+                ('major_rank', models.IntegerField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['gpa', 'student'], name='eos_summary_gpa')],
+            },
+        ),
+        migrations.RunPython(fill_summaries, migrations.RunPython.noop),
+    ]
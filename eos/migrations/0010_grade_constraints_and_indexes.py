@@ -0,0 +1,102 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Max, Min, Sum, Window
+from django.db.models.functions import Rank
+
+
+def remove_duplicate_grades(apps, schema_editor):
+    """Оставляет у студента одну оценку по дисциплине — добавленную последней.
+
+    Агрегаты по дисциплинам и сводки затронутых студентов пересчитываются.
+    """
+    Student = apps.get_model('eos', 'Student')
+    StudentGrade = apps.get_model('eos', 'StudentGrade')
+    AnalyticsAggregate = apps.get_model('eos', 'AnalyticsAggregate')
+    StudentSummary = apps.get_model('eos', 'StudentSummary')
+
+    duplicates = (
+        StudentGrade.objects.order_by().values('student_id', 'subject')
+        .annotate(count=Count('id'), last_id=Max('id')).filter(count__gt=1)
+    )
+    students = set()
+    for row in duplicates.iterator():
+        StudentGrade.objects.filter(student_id=row['student_id'], subject=row['subject'], id__lt=row['last_id']).delete()
+        students.add(row['student_id'])
+    if not students:
+        return
+
+    AnalyticsAggregate.objects.filter(dimension='subject').delete()
+    rows = (
+        StudentGrade.objects.order_by().values('subject')
+        .annotate(count=Count('id'), first_id=Min('id'), total=Sum('score'), minimum=Min('score'), maximum=Max('score'))
+        .order_by('first_id')
+    )
+    AnalyticsAggregate.objects.bulk_create([
+        AnalyticsAggregate(dimension='subject', key=row['subject'], count=row['count'], total=row['total'],
+                           minimum=row['minimum'], maximum=row['maximum'])
+        for row in rows
+    ])
+
+    summaries = StudentSummary.objects.in_bulk(list(students))
+    totals = {}
+    for summary in summaries.values():
+        summary.grades, summary.best_score, summary.worst_score = 0, None, None
+    rows = (
+        StudentGrade.objects.filter(student_id__in=list(summaries)).order_by('student_id', 'id')
+        .values_list('student_id', 'subject', 'score')
+    )
+    for student_id, subject, score in rows:
+        summary = summaries[student_id]
+        totals[student_id] = totals.get(student_id, 0) + score
+        summary.grades += 1
+        if summary.best_score is None or score > summary.best_score:
+            summary.best_subject, summary.best_score = subject, score
+        if summary.worst_score is None or score < summary.worst_score:
+            summary.worst_subject, summary.worst_score = subject, score
+    for student_id, summary in summaries.items():
+        summary.gpa = totals[student_id] / summary.grades
+    StudentSummary.objects.bulk_update(
+        summaries.values(), ['gpa', 'grades', 'best_subject', 'best_score', 'worst_subject', 'worst_score'])
+
+    majors = set(Student.objects.filter(id__in=list(summaries)).values_list('major', flat=True))
+    ranked = StudentSummary.objects.filter(student__major__in=majors, gpa__isnull=False).annotate(
+        rank=Window(Rank(), partition_by=F('student__major'), order_by=F('gpa').desc()))
+    changed = []
+    for summary in ranked:
+        summary.major_rank = summary.rank
+        changed.append(summary)
+    StudentSummary.objects.bulk_update(changed, ['major_rank'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eos', '0009_studentsummary'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_grades, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='studentgrade',
+            constraint=models.UniqueConstraint(fields=('student', 'subject'), name='eos_grade_student_subject'),
+        ),
+        migrations.AlterField(
+            model_name='studentgrade',
+            name='student',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='grades', to='eos.student'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['major'], name='eos_student_major'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['year', 'missed_hours'], name='eos_student_year'),
+        ),
+        migrations.AddIndex(
+            model_name='studentgrade',
+            index=models.Index(fields=['subject', 'score', 'student'], name='eos_grade_subject_score'),
+        ),
+    ]
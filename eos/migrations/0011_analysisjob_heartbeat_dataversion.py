@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:29
+
+from django.db import migrations, models
+
+
+def create_data_version(apps, schema_editor):
+    # Единственная строка версии данных; её значение увеличивают изменения студентов и оценок
+    apps.get_model('eos', 'DataVersion').objects.create(pk=1, value=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eos', '0010_grade_constraints_and_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='analysisjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(create_data_version, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,6 @@
 # eos/models.py
 
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 
 class Student(models.Model):
@@ -9,14 +10,161 @@ class Student(models.Model):
     major = models.CharField(max_length=100)
     year = models.IntegerField()
     missed_hours = models.IntegerField(default=0)
+    # Поисковый вектор по имени, email и специальности; на PostgreSQL заполняется триггером
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Группировка по специальности (аналитика, места в специальности)
+            models.Index(fields=['major'], name='eos_student_major'),
+            # Посещаемость по курсам читается из индекса, без таблицы
+            models.Index(fields=['year', 'missed_hours'], name='eos_student_year'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.student_id})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Исходные значения полей: по ним сигналы переносят вклад записи в агрегаты аналитики
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+
 class StudentGrade(models.Model):
-    student = models.ForeignKey(Student, related_name='grades', on_delete=models.CASCADE)
+    # Отдельный индекс внешнего ключа не нужен: выборки по студенту используют eos_grade_student_subject
+    student = models.ForeignKey(Student, related_name='grades', on_delete=models.CASCADE, db_index=False)
     subject = models.CharField(max_length=100)
     score = models.FloatField()
 
+    class Meta:
+        indexes = [
+            # Средний балл по дисциплинам (с фильтром по студентам) читается из индекса, без таблицы
+            models.Index(fields=['subject', 'score', 'student'], name='eos_grade_subject_score'),
+        ]
+        constraints = [
+            # У студента не больше одной оценки по дисциплине
+            models.UniqueConstraint(fields=['student', 'subject'], name='eos_grade_student_subject'),
+        ]
+
     def __str__(self):
         return f"{self.subject}: {self.score}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Исходные значения полей: по ним сигналы переносят вклад записи в агрегаты аналитики
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+
+
+class AnalyticsAggregate(models.Model):
+    """Накопленные агрегаты для аналитики: сумма, количество, минимум и максимум по ключу."""
+    dimension = models.CharField(max_length=20)
+    key = models.CharField(max_length=100)
+    total = models.FloatField(default=0)
+    count = models.IntegerField(default=0)
+    minimum = models.FloatField(blank=True, null=True)
+    maximum = models.FloatField(blank=True, null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['dimension', 'key'], name='eos_aggregate_dimension_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.dimension}={self.key}: {self.total}/{self.count}"
+
+
+class StudentImport(models.Model):
+    """Состояние массовой загрузки студентов; позволяет продолжить её после сбоя."""
+    source = models.CharField(max_length=255)
+    digest = models.CharField(max_length=64, db_index=True)
+    format = models.CharField(max_length=10)
+    # Число обработанных записей источника: загруженных и отклонённых
+    processed = models.IntegerField(default=0)
+    students = models.IntegerField(default=0)
+    grades = models.IntegerField(default=0)
+    failed = models.IntegerField(default=0)
+    errors = models.JSONField(default=list)
+    finished = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.source}: {self.processed} ({self.failed} с ошибками)"
+
+
+class AnalysisJob(models.Model):
+    """Задание анализа в очереди; выполняется командой analysis_worker."""
+    PENDING, RUNNING, DONE, FAILED = 'pending', 'running', 'done', 'failed'
+    STATUS_CHOICES = [(PENDING, 'В очереди'), (RUNNING, 'Выполняется'), (DONE, 'Готово'), (FAILED, 'Ошибка')]
+
+    # Одинаковые запросы (колонка, версия данных, параметры анализа) имеют один ключ
+    key = models.CharField(max_length=64)
+    column_name = models.CharField(max_length=50)
+    data_version = models.BigIntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    result = models.JSONField(blank=True, null=True)
+    error = models.TextField(blank=True, default='')
+    worker = models.CharField(max_length=100, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    # Обновляется воркером, пока задание выполняется; по нему находятся задания остановленных воркеров
+    heartbeat_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'id'], name='eos_analysisjob_status'),
+            models.Index(fields=['key', 'status'], name='eos_analysisjob_key'),
+        ]
+        constraints = [
+            # Не больше одного незавершённого задания на ключ: параллельные запросы получают его же
+            models.UniqueConstraint(fields=['key'], condition=models.Q(status__in=['pending', 'running']),
+                                    name='eos_analysisjob_active_key'),
+        ]
+
+    def __str__(self):
+        return f"#{self.id} {self.column_name}: {self.status}"
+
+
+class DataVersion(models.Model):
+    """Версия данных аналитики в базе (одна строка), общая для всех процессов.
+
+    Меняется в той же транзакции, что и Student/StudentGrade (см. eos/cache.py);
+    по ней кэш результатов анализа и задания анализа во всех процессах
+    получают одни ключи.
+    """
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return str(self.value)
+
+
+class StudentSummary(models.Model):
+    """Сводка по студенту: средний балл, лучшая и худшая дисциплины, место в специальности.
+
+    Поддерживается сигналами оценок и студентов (см. eos/summaries.py);
+    пересобирается командой rebuild_student_summaries.
+    """
+    student = models.OneToOneField(Student, primary_key=True, related_name='summary', on_delete=models.CASCADE)
+    # Средний балл; None — у студента нет оценок
+    gpa = models.FloatField(blank=True, null=True)
+    grades = models.IntegerField(default=0)
+    best_subject = models.CharField(max_length=100, blank=True, default='')
+    best_score = models.FloatField(blank=True, null=True)
+    worst_subject = models.CharField(max_length=100, blank=True, default='')
+    worst_score = models.FloatField(blank=True, null=True)
+    # Место по среднему баллу среди студентов той же специальности (1 — лучший)
+    major_rank = models.IntegerField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['gpa', 'student'], name='eos_summary_gpa'),
+        ]
+
+    def __str__(self):
+        return f"{self.student_id}: {self.gpa}"
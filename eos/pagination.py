@@ -0,0 +1,152 @@
+# pagination.py
+
+import base64
+import json
+from typing import List, Optional
+
+from django.db.models import Q, QuerySet
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPage:
+    """Страница выборки и курсоры для перехода к соседним страницам."""
+
+    def __init__(self, objects: List, next_cursor: Optional[str], previous_cursor: Optional[str]):
+        self.objects = objects
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self) -> bool:
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.objects)
+
+    def __len__(self) -> int:
+        return len(self.objects)
+
+
+class KeysetPaginator:
+    """Постраничный вывод по ключу (seek): WHERE (поле, id) > (курсор) ORDER BY поле, id LIMIT n.
+
+    В отличие от OFFSET стоимость страницы не зависит от её номера: база
+    сразу переходит по индексу к нужной позиции. Курсор — непрозрачная
+    строка со значениями поля сортировки и id последней записи.
+    """
+
+    def __init__(self, queryset: QuerySet, page_size: int, order_field: str = 'id', descending: bool = False):
+        self.queryset = queryset
+        self.page_size = page_size
+        self.order_field = order_field
+        self.descending = descending
+
+    @staticmethod
+    def encode_cursor(values: list) -> str:
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> list:
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        except (ValueError, TypeError):
+            raise InvalidCursor(f"Некорректный курсор '{cursor}'.")
+        if not isinstance(values, list) or not values:
+            raise InvalidCursor(f"Некорректный курсор '{cursor}'.")
+        return values
+
+    def _key(self, obj) -> list:
+        if self.order_field == 'id':
+            return [obj.id]
+        value = obj
+        for part in self.order_field.split('__'):
+            value = getattr(value, part)
+        return [value, obj.id]
+
+    def _seek(self, queryset: QuerySet, cursor: str, forward: bool) -> QuerySet:
+        values = self.decode_cursor(cursor)
+        # При обратной сортировке «следующие» записи имеют меньшие значения
+        lookup = 'gt' if forward != self.descending else 'lt'
+        if self.order_field == 'id':
+            return queryset.filter(**{f'id__{lookup}': values[0]})
+        if len(values) != 2:
+            raise InvalidCursor(f"Некорректный курсор '{cursor}'.")
+        value, last_id = values
+        return queryset.filter(
+            Q(**{f'{self.order_field}__{lookup}': value})
+            | Q(**{self.order_field: value, f'id__{lookup}': last_id})
+        )
+
+    def _ordering(self, forward: bool) -> list:
+        fields = ['id'] if self.order_field == 'id' else [self.order_field, 'id']
+        prefix = '-' if forward == self.descending else ''
+        return [prefix + field for field in fields]
+
+    def page(self, after: Optional[str] = None, before: Optional[str] = None) -> KeysetPage:
+        forward = before is None
+        queryset = self.queryset
+        if after is not None and forward:
+            queryset = self._seek(queryset, after, forward=True)
+        elif before is not None:
+            queryset = self._seek(queryset, before, forward=False)
+
+        # Одна лишняя запись показывает, есть ли страница дальше
+        rows = list(queryset.order_by(*self._ordering(forward))[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if not forward:
+            rows.reverse()
+
+        if not rows:
+            return KeysetPage([], None, None)
+
+        if forward:
+            has_next, has_previous = has_more, after is not None
+        else:
+            has_next, has_previous = True, has_more
+        return KeysetPage(
+            rows,
+            self.encode_cursor(self._key(rows[-1])) if has_next else None,
+            self.encode_cursor(self._key(rows[0])) if has_previous else None,
+        )
+
+
+class SequencePaginator:
+    """Постраничный вывод готового списка, например ранжированных результатов поиска.
+
+    Курсор хранит позицию в списке; список ограничен по длине, поэтому
+    смещение здесь ничего не стоит.
+    """
+
+    def __init__(self, items: List, page_size: int):
+        self.items = items
+        self.page_size = page_size
+
+    def _position(self, cursor: str) -> int:
+        values = KeysetPaginator.decode_cursor(cursor)
+        if len(values) != 1 or not isinstance(values[0], int) or values[0] < 0:
+            raise InvalidCursor(f"Некорректный курсор '{cursor}'.")
+        return values[0]
+
+    def page(self, after: Optional[str] = None, before: Optional[str] = None) -> KeysetPage:
+        if before is not None:
+            end = self._position(before)
+            start = max(end - self.page_size, 0)
+        else:
+            start = self._position(after) if after is not None else 0
+        end = min(start + self.page_size, len(self.items))
+        objects = self.items[start:end]
+        if not objects:
+            return KeysetPage([], None, None)
+        return KeysetPage(
+            objects,
+            KeysetPaginator.encode_cursor([end]) if end < len(self.items) else None,
+            KeysetPaginator.encode_cursor([start]) if start > 0 else None,
+        )
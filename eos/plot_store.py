@@ -0,0 +1,126 @@
+# plot_store.py
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+# Изображения адресуются хэшем содержимого, поэтому их можно кэшировать в браузере бессрочно
+IMMUTABLE_CACHE_CONTROL = 'max-age=315360000, public, immutable'
+
+PLOT_URL_PREFIX = 'plots/'
+
+
+class PlotStore:
+    """Хранилище PNG-графиков на диске с адресацией по хэшу входных данных.
+
+    Одинаковые графики строятся один раз для всех воркеров. Файлы лежат в
+    EOS_PLOT_CACHE_ROOT/plots/ и отдаются представлением plot_image с
+    бессрочным кэшированием в браузере (WhiteNoise индексирует файлы только
+    при запуске воркера и не знает о новых и удалённых графиках).
+    Объём ограничен EOS_PLOT_CACHE_MAX_BYTES: при превышении удаляются
+    давно не использованные файлы. Использованием считается и построение
+    (get_or_render), и отдача файла (touch из plot_image).
+    """
+
+    def __init__(self, root: Optional[Path] = None, max_bytes: Optional[int] = None,
+                 min_age: Optional[float] = None):
+        self.root = Path(root or settings.EOS_PLOT_CACHE_ROOT) / PLOT_URL_PREFIX
+        self.max_bytes = max_bytes if max_bytes is not None else settings.EOS_PLOT_CACHE_MAX_BYTES
+        # Файлы моложе min_age не удаляются: на них могут ссылаться закэшированные результаты анализа
+        if min_age is None:
+            min_age = getattr(settings, 'EOS_ANALYSIS_CACHE_TIMEOUT', 0) or 0
+        self.min_age = min_age
+
+    @staticmethod
+    def digest(data: Dict, labels: List[str]) -> str:
+        payload = json.dumps([labels, [[key, value] for key, value in data.items()]],
+                             ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def path(self, digest: str) -> Path:
+        return self.root / f'{digest}.png'
+
+    @staticmethod
+    def url(digest: str) -> str:
+        return f'{settings.EOS_PLOT_URL}{digest}.png'
+
+    def touch(self, digest: str) -> Path:
+        """Отмечает файл как недавно использованный; FileNotFoundError, если его нет."""
+        path = self.path(digest)
+        # Вытеснение упорядочено по времени изменения файла
+        os.utime(path)
+        return path
+
+    @staticmethod
+    def digest_from_url(url: str) -> str:
+        return url.rsplit('/', 1)[-1].removesuffix('.png')
+
+    def get_or_render(self, digest: str, render: Callable[[], bytes]) -> Path:
+        """Возвращает путь к изображению, при отсутствии строит его вызовом render()."""
+        try:
+            return self.touch(digest)
+        except FileNotFoundError:
+            pass
+        path = self.path(digest)
+
+        image = render()
+        self.root.mkdir(parents=True, exist_ok=True)
+        # Запись через временный файл: параллельные воркеры не увидят недописанное изображение
+        descriptor, temporary = tempfile.mkstemp(dir=self.root, suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                file.write(image)
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+        self.evict()
+        return path
+
+    def files(self) -> List[Tuple[str, os.stat_result]]:
+        if not self.root.is_dir():
+            return []
+        entries = []
+        for entry in os.scandir(self.root):
+            if entry.name.endswith('.png'):
+                try:
+                    entries.append((entry.path, entry.stat()))
+                except FileNotFoundError:
+                    continue
+        return entries
+
+    def size(self) -> int:
+        return sum(stat.st_size for path, stat in self.files())
+
+    def evict(self, max_bytes: Optional[int] = None, min_age: Optional[float] = None) -> int:
+        """Удаляет давно не использованные файлы, пока объём больше max_bytes. Возвращает число удалённых."""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        min_age = self.min_age if min_age is None else min_age
+        entries = self.files()
+        total = sum(stat.st_size for path, stat in entries)
+        if total <= max_bytes:
+            return 0
+
+        now = time.time()
+        removed = 0
+        for path, stat in sorted(entries, key=lambda entry: entry[1].st_mtime):
+            if total <= max_bytes:
+                break
+            if now - stat.st_mtime < min_age:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= stat.st_size
+            removed += 1
+        return removed
+
+    def clear(self) -> int:
+        return self.evict(max_bytes=0, min_age=0)
@@ -0,0 +1,226 @@
+# profiling.py
+
+import logging
+import random
+import threading
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+from time import perf_counter
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import DjangoTemplates
+
+logger = logging.getLogger(__name__)
+
+# Границы гистограммы длительности запросов, секунды
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestProfile:
+    """Затраты одного запроса: число и время SQL-запросов, время этапов (шаблон, модули аналитики)."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.timings: Dict[str, float] = defaultdict(float)
+
+    def execute(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += perf_counter() - start
+
+
+_current = threading.local()
+
+
+def current_profile() -> Optional[RequestProfile]:
+    return getattr(_current, 'profile', None)
+
+
+@contextmanager
+def timed(name: str):
+    """Добавляет время блока к этапу name профиля текущего запроса (если запрос профилируется).
+
+    Профиль привязан к потоку запроса: работа в пулах потоков и процессов
+    (EOS_ANALYTICS_EXECUTOR) учитывается только в этапах, которые её ждут.
+    """
+    profile = current_profile()
+    if profile is None:
+        yield
+        return
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        profile.timings[name] += perf_counter() - start
+
+
+class Metrics:
+    """Метрики процесса в текстовом формате Prometheus.
+
+    Каждый процесс (воркер gunicorn) хранит свои значения; Prometheus
+    собирает их с каждого воркера отдельно или через общий адрес, как
+    и обычные метрики без общего хранилища.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self.lock:
+            self.requests = defaultdict(int)
+            self.durations = defaultdict(lambda: [0] * (len(BUCKETS) + 1))
+            self.duration_sums = defaultdict(float)
+            self.slow = defaultdict(int)
+            self.profiled = defaultdict(int)
+            self.queries = defaultdict(int)
+            self.db_time = defaultdict(float)
+            self.stages = defaultdict(float)
+
+    def observe(self, view: str, method: str, status: int, duration: float,
+                profile: Optional[RequestProfile], slow: bool) -> None:
+        with self.lock:
+            self.requests[(view, method, str(status))] += 1
+            buckets = self.durations[view]
+            for index, bound in enumerate(BUCKETS):
+                if duration <= bound:
+                    buckets[index] += 1
+            buckets[-1] += 1
+            self.duration_sums[view] += duration
+            if slow:
+                self.slow[view] += 1
+            if profile is not None:
+                self.profiled[view] += 1
+                self.queries[view] += profile.queries
+                self.db_time[view] += profile.db_time
+                for stage, seconds in profile.timings.items():
+                    self.stages[(view, stage)] += seconds
+
+    def render(self) -> str:
+        lines = []
+
+        def family(name, kind, help_text, samples):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in samples:
+                label_text = ','.join(f'{key}="{_escape(label)}"' for key, label in labels)
+                lines.append(f'{name}{{{label_text}}} {value}' if label_text else f'{name} {value}')
+
+        with self.lock:
+            family('eos_requests_total', 'counter', 'Запросы по представлениям.', [
+                ((('view', view), ('method', method), ('status', status)), count)
+                for (view, method, status), count in sorted(self.requests.items())
+            ])
+            histogram = []
+            for view, buckets in sorted(self.durations.items()):
+                for bound, count in zip(BUCKETS, buckets):
+                    histogram.append(((('view', view), ('le', repr(bound))), count))
+                histogram.append(((('view', view), ('le', '+Inf')), buckets[-1]))
+            lines.append('# HELP eos_request_duration_seconds Длительность обработки запроса.')
+            lines.append('# TYPE eos_request_duration_seconds histogram')
+            for labels, value in histogram:
+                label_text = ','.join(f'{key}="{_escape(label)}"' for key, label in labels)
+                lines.append(f'eos_request_duration_seconds_bucket{{{label_text}}} {value}')
+            for view, buckets in sorted(self.durations.items()):
+                lines.append(f'eos_request_duration_seconds_sum{{view="{_escape(view)}"}} {self.duration_sums[view]}')
+                lines.append(f'eos_request_duration_seconds_count{{view="{_escape(view)}"}} {buckets[-1]}')
+            family('eos_slow_requests_total', 'counter', 'Запросы дольше EOS_SLOW_REQUEST_MS.',
+                   [((('view', view),), count) for view, count in sorted(self.slow.items())])
+            family('eos_profiled_requests_total', 'counter', 'Запросы, попавшие в выборку профилирования.',
+                   [((('view', view),), count) for view, count in sorted(self.profiled.items())])
+            family('eos_db_queries_total', 'counter', 'SQL-запросы профилированных запросов.',
+                   [((('view', view),), count) for view, count in sorted(self.queries.items())])
+            family('eos_db_duration_seconds_total', 'counter', 'Время SQL-запросов профилированных запросов.',
+                   [((('view', view),), seconds) for view, seconds in sorted(self.db_time.items())])
+            family('eos_stage_duration_seconds_total', 'counter',
+                   'Время этапов профилированных запросов: шаблон, модули аналитики, графики.',
+                   [((('view', view), ('stage', stage)), seconds)
+                    for (view, stage), seconds in sorted(self.stages.items())])
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+METRICS = Metrics()
+
+
+def server_timing(duration: float, profile: Optional[RequestProfile]) -> str:
+    """Значение заголовка Server-Timing (длительности в миллисекундах)."""
+    entries = []
+    if profile is not None:
+        entries.append(f'db;dur={profile.db_time * 1000:.1f};desc="{profile.queries} queries"')
+        entries.extend(f'{stage};dur={seconds * 1000:.1f}' for stage, seconds in sorted(profile.timings.items()))
+    entries.append(f'total;dur={duration * 1000:.1f}')
+    return ', '.join(entries)
+
+
+class ProfilingMiddleware:
+    """Время обработки каждого запроса и подробный профиль для выборки запросов.
+
+    Длительность и число запросов по представлениям учитываются всегда.
+    Доля EOS_PROFILING_SAMPLE_RATE запросов профилируется подробно: число и
+    время SQL-запросов, время шаблона, модулей аналитики и графиков
+    (см. timed). Результат — заголовок Server-Timing и метрики /metrics;
+    запросы дольше EOS_SLOW_REQUEST_MS записываются в журнал.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'EOS_PROFILING_ENABLED', True):
+            return self.get_response(request)
+
+        sampled = random.random() < getattr(settings, 'EOS_PROFILING_SAMPLE_RATE', 0.1)
+        profile = RequestProfile() if sampled else None
+        start = perf_counter()
+        with ExitStack() as stack:
+            if profile is not None:
+                _current.profile = profile
+                stack.callback(delattr, _current, 'profile')
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile.execute))
+            response = self.get_response(request)
+        duration = perf_counter() - start
+
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name if match else '') or 'unmatched'
+        slow = duration * 1000 >= getattr(settings, 'EOS_SLOW_REQUEST_MS', 1000)
+        if slow:
+            logger.warning('Медленный запрос %s %s (%s): %.0f мс; %s', request.method, request.path, view,
+                           duration * 1000, server_timing(duration, profile))
+        METRICS.observe(view, request.method, response.status_code, duration, profile, slow)
+        response['Server-Timing'] = server_timing(duration, profile)
+        return response
+
+
+class ProfiledTemplate:
+    """Шаблон, время отрисовки которого учитывается в этапе template профиля запроса."""
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        with timed('template'):
+            return self.template.render(context, request)
+
+
+class ProfiledDjangoTemplates(DjangoTemplates):
+    """Шаблонизатор Django, замеряющий время отрисовки шаблонов (TEMPLATES['BACKEND'])."""
+
+    def from_string(self, template_code):
+        return ProfiledTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return ProfiledTemplate(super().get_template(template_name))
@@ -0,0 +1,231 @@
+# search.py
+
+import re
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from threading import Lock
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.contrib.postgres.lookups import TrigramSimilar
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db import connections
+from django.db.models import F, Q, QuerySet
+from django.db.models.functions import Upper
+
+from .cache import bump_data_version, get_data_version
+from .models import Student
+
+# Поля поиска и их вес в ранжировании (A/B/C в tsvector, см. миграцию 0006)
+SEARCH_FIELDS = {'name': 1.0, 'email': 0.6, 'major': 0.4}
+
+_TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return _TOKEN_RE.findall(text.lower()) if text else []
+
+
+def trigrams(token: str) -> set:
+    # Как в pg_trgm: два пробела в начале слова и один в конце
+    padded = f'  {token} '
+    return {padded[index:index + 3] for index in range(len(padded) - 2)}
+
+
+def _similarity_threshold() -> float:
+    return getattr(settings, 'EOS_SEARCH_SIMILARITY', 0.3)
+
+
+class TrigramIndex:
+    """Триграммный индекс студентов в памяти процесса — замена tsvector для SQLite.
+
+    Слово запроса совпадает со словами записи, которые с него начинаются;
+    если таких нет — со словами, похожими на него по доле общих триграмм
+    не меньше порога (опечатки).
+    Запись подходит, если совпали все слова запроса; оценка — сумма весов
+    полей с учётом сходства. Кроме того, подходят записи, имя которых
+    содержит запрос как подстроку (как name__icontains), — после
+    ранжированных. Индекс помнит версию данных, на которой построен
+    (см. memory_index).
+    """
+
+    def __init__(self):
+        self.documents: Dict[int, Dict[str, List[str]]] = {}
+        # триграмма -> слова, слово -> число его триграмм, слово -> id -> лучший вес поля
+        self.postings = defaultdict(set)
+        self.sizes: Dict[str, int] = {}
+        self.tokens = defaultdict(dict)
+        # id -> имя в нижнем регистре для поиска подстроки
+        self.names: Dict[int, str] = {}
+        # Отсортированный список слов для поиска по префиксу, пересобирается после изменений
+        self.sorted_tokens: Optional[List[str]] = None
+        self.lock = Lock()
+        self.version = 0
+
+    def build(self, queryset: Optional[QuerySet] = None, version: int = 0) -> 'TrigramIndex':
+        queryset = Student.objects.all() if queryset is None else queryset
+        with self.lock:
+            self.version = version
+            self.documents.clear()
+            self.names.clear()
+            self.postings.clear()
+            self.sizes.clear()
+            self.tokens.clear()
+            self.sorted_tokens = None
+            for row in queryset.values_list('id', *SEARCH_FIELDS).iterator(chunk_size=2000):
+                self._add(row[0], dict(zip(SEARCH_FIELDS, row[1:])))
+        return self
+
+    def _add(self, student_id: int, values: Dict) -> None:
+        fields = {field: tokenize(values.get(field)) for field in SEARCH_FIELDS}
+        self.documents[student_id] = fields
+        self.names[student_id] = (values.get('name') or '').lower()
+        for field, tokens in fields.items():
+            for token in tokens:
+                documents = self.tokens[token]
+                if not documents:
+                    token_trigrams = trigrams(token)
+                    self.sizes[token] = len(token_trigrams)
+                    self.sorted_tokens = None
+                    for trigram in token_trigrams:
+                        self.postings[trigram].add(token)
+                documents[student_id] = max(documents.get(student_id, 0), SEARCH_FIELDS[field])
+
+    def _prefix_matches(self, term: str) -> Dict[str, float]:
+        if self.sorted_tokens is None:
+            self.sorted_tokens = sorted(self.tokens)
+        matches = {}
+        for index in range(bisect_left(self.sorted_tokens, term), len(self.sorted_tokens)):
+            token = self.sorted_tokens[index]
+            if not token.startswith(term):
+                break
+            matches[token] = 1.0
+        return matches
+
+    def _matches(self, term: str, threshold: float) -> Dict[str, float]:
+        """Слова индекса, совпадающие со словом запроса: слово -> сходство."""
+        matches = self._prefix_matches(term)
+        if matches:
+            return matches
+        term_trigrams = trigrams(term)
+        shared = Counter()
+        for trigram in term_trigrams:
+            shared.update(self.postings.get(trigram, ()))
+        # Сходство не меньше порога требует хотя бы threshold * len(term_trigrams) общих триграмм
+        minimum = threshold * len(term_trigrams)
+        for token, common in shared.items():
+            if common >= minimum:
+                similarity = common / (len(term_trigrams) + self.sizes[token] - common)
+                if similarity >= threshold:
+                    matches[token] = similarity
+        return matches
+
+    def _scores(self, terms: List[str], threshold: float) -> Dict[int, float]:
+        scores = None
+        for term in terms:
+            term_scores = {}
+            for token, similarity in self._matches(term, threshold).items():
+                for student_id, weight in self.tokens[token].items():
+                    score = weight * similarity
+                    if score > term_scores.get(student_id, 0):
+                        term_scores[student_id] = score
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {
+                    student_id: score + term_scores[student_id]
+                    for student_id, score in scores.items() if student_id in term_scores
+                }
+            if not scores:
+                return {}
+        return scores
+
+    def search(self, query: str, limit: int) -> List[int]:
+        terms = tokenize(query)
+        if not terms:
+            return []
+        needle = query.strip().lower()
+        with self.lock:
+            scores = self._scores(terms, _similarity_threshold())
+            # Подстрока имени ("ohn" в "John") не похожа на слово по триграммам, но подходит, как в icontains
+            for student_id, name in self.names.items():
+                if needle in name:
+                    scores.setdefault(student_id, 0.0)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [student_id for student_id, score in ranked[:limit]]
+
+
+_memory_index: Optional[TrigramIndex] = None
+_memory_index_lock = Lock()
+
+
+def memory_index() -> TrigramIndex:
+    """Индекс процесса; пересобирается, когда меняется версия данных в базе.
+
+    Версию (DataVersion) меняет любая запись студентов в любом процессе,
+    поэтому индексы всех процессов устаревают одновременно.
+    """
+    global _memory_index
+    version = get_data_version()
+    index = _memory_index
+    if index is None or index.version != version:
+        with _memory_index_lock:
+            if _memory_index is None or _memory_index.version != version:
+                _memory_index = TrigramIndex().build(version=version)
+            index = _memory_index
+    return index
+
+
+def invalidate() -> None:
+    """Делает устаревшими индексы всех процессов после изменений в обход сигналов (bulk_create, update)."""
+    global _memory_index
+    bump_data_version()
+    with _memory_index_lock:
+        _memory_index = None
+
+
+class StudentSearch:
+    """Ранжированный поиск студентов по имени, email и специальности.
+
+    На PostgreSQL — полнотекстовый поиск с префиксами по столбцу search_vector
+    (GIN-индекс, поддерживается триггером), поиск с опечатками и поиск
+    подстроки имени по триграммному индексу имени. На других СУБД —
+    TrigramIndex в памяти.
+    """
+
+    def __init__(self, using: str = 'default'):
+        self.using = using
+
+    @staticmethod
+    def prefix_query(query: str) -> str:
+        # Слова содержат только буквы и цифры, поэтому их можно подставить в to_tsquery как есть
+        return ' & '.join(f'{term}:*' for term in tokenize(query))
+
+    def queryset(self, query: str) -> QuerySet:
+        """Запрос PostgreSQL с полями rank и similarity, отсортированный по релевантности."""
+        text_query = SearchQuery(self.prefix_query(query), search_type='raw', config='simple')
+        return (
+            Student.objects.using(self.using)
+            .annotate(
+                rank=SearchRank(F('search_vector'), text_query),
+                similarity=TrigramWordSimilarity(query, 'name'),
+            )
+            # Условия по UPPER(name) (сходство и icontains) используют триграммный индекс из миграции 0005
+            .filter(Q(search_vector=text_query) | TrigramSimilar(Upper('name'), query.upper())
+                    | Q(name__icontains=query.strip()))
+            .order_by('-rank', '-similarity', 'id')
+        )
+
+    def search_ids(self, query: str, limit: Optional[int] = None) -> List[int]:
+        """id найденных студентов по убыванию релевантности."""
+        limit = limit or getattr(settings, 'EOS_SEARCH_MAX_RESULTS', 500)
+        if not tokenize(query):
+            return []
+        if connections[self.using].vendor == 'postgresql':
+            return list(self.queryset(query).values_list('id', flat=True)[:limit])
+        return memory_index().search(query, limit)
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[Student]:
+        ids = self.search_ids(query, limit)
+        students = Student.objects.using(self.using).in_bulk(ids)
+        return [students[student_id] for student_id in ids if student_id in students]
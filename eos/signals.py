@@ -0,0 +1,77 @@
+# signals.py
+
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import summaries
+from .aggregates import AggregateStore, maintained
+from .cache import bump_data_version
+from .models import Student, StudentGrade
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+@receiver(post_save, sender=StudentGrade)
+@receiver(post_delete, sender=StudentGrade)
+def invalidate_analysis_cache(sender, **kwargs):
+    # Версия в базе меняется вместе с данными, поэтому кэш других процессов тоже устаревает
+    bump_data_version()
+
+
+# Накопленные агрегаты аналитики (только в режиме EOS_ANALYTICS_BACKEND='aggregates').
+# Исходные значения полей запоминаются при загрузке записи (from_db); вклад в агрегаты
+# по ним строится только при сохранении или удалении, чтобы перенести его без лишних запросов.
+
+@receiver(pre_save, sender=Student)
+@receiver(pre_save, sender=StudentGrade)
+@receiver(pre_delete, sender=Student)
+@receiver(pre_delete, sender=StudentGrade)
+def load_aggregate_state(sender, instance, **kwargs):
+    instance._aggregate_state = AggregateStore().original_state(instance) if maintained() else {}
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_save, sender=StudentGrade)
+def update_aggregates_on_save(sender, instance, **kwargs):
+    store = AggregateStore()
+    if maintained():
+        for dimension, new in store.state(instance).items():
+            store.apply_change(dimension, instance._aggregate_state.get(dimension), new)
+    # Снимок нужен и без агрегатов: по нему сводки узнают прежнюю специальность
+    store.remember(instance)
+
+
+@receiver(post_delete, sender=Student)
+@receiver(post_delete, sender=StudentGrade)
+def update_aggregates_on_delete(sender, instance, **kwargs):
+    store = AggregateStore()
+    for dimension, old in instance._aggregate_state.items():
+        store.apply_change(dimension, old, None)
+    instance._loaded_values = None
+
+
+# Сводки студентов (средний балл и место в специальности) обновляются после фиксации транзакции
+
+@receiver(post_save, sender=StudentGrade)
+@receiver(post_delete, sender=StudentGrade)
+def update_student_summary(sender, instance, **kwargs):
+    summaries.schedule(instance.student_id)
+
+
+@receiver(pre_save, sender=Student)
+def remember_student_major(sender, instance, **kwargs):
+    # Исходная специальность — из снимка загрузки (запросом, если его нет)
+    old = AggregateStore().original_state(instance).get('major')
+    instance._summary_major = old[0] if old else None
+
+
+@receiver(post_save, sender=Student)
+def update_student_summary_on_save(sender, instance, created, **kwargs):
+    if created or instance._summary_major != instance.major:
+        # Студент переходит в рейтинг новой специальности и выбывает из прежней
+        summaries.schedule(instance.pk, instance._summary_major)
+
+
+@receiver(post_delete, sender=Student)
+def update_major_ranks_on_delete(sender, instance, **kwargs):
+    summaries.schedule(None, instance.major)
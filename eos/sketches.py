@@ -0,0 +1,352 @@
+# sketches.py
+
+import base64
+import hashlib
+import math
+import random
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from django.conf import settings
+from django.db.models import QuerySet
+
+from .cache import _digest, get_cache, get_data_version
+from .models import Student
+from .streaming import StudentStream
+from .student_data import StudentColumns
+
+
+class KLLSketch:
+    """Приближённые квантили (KLL): объединяемый скетч фиксированного размера.
+
+    Значения хранятся в компакторах; элемент уровня h представляет 2**h
+    исходных значений. Переполненный компактор сортируется, и на уровень
+    выше переходит каждый второй элемент со случайным сдвигом. Ошибка
+    ранга квантиля — около 2 / k от числа значений, память — O(k).
+    """
+
+    c = 2 / 3
+
+    def __init__(self, k: int = 200, seed: Optional[int] = None):
+        self.k = k
+        self.count = 0
+        self.size = 0
+        self.compactors: List[list] = []
+        self.rng = random.Random(seed)
+        self._grow()
+
+    @classmethod
+    def for_error(cls, error: float, seed: Optional[int] = None) -> 'KLLSketch':
+        """Скетч с ошибкой ранга около error (доля от числа значений)."""
+        return cls(k=max(8, math.ceil(2 / error)), seed=seed)
+
+    def _capacity(self, height: int) -> int:
+        depth = len(self.compactors) - height - 1
+        return int(math.ceil(self.c ** depth * self.k)) + 1
+
+    def _grow(self) -> None:
+        self.compactors.append([])
+        self.max_size = sum(self._capacity(height) for height in range(len(self.compactors)))
+
+    def update(self, value) -> None:
+        self.compactors[0].append(value)
+        self.count += 1
+        self.size += 1
+        if self.size >= self.max_size:
+            self._compress()
+
+    def update_many(self, values: Iterable) -> 'KLLSketch':
+        for value in values:
+            self.update(value)
+        return self
+
+    def _compress(self) -> None:
+        for height in range(len(self.compactors)):
+            compactor = self.compactors[height]
+            if len(compactor) < self._capacity(height):
+                continue
+            if height + 1 == len(self.compactors):
+                self._grow()
+            compactor.sort()
+            # При нечётной длине последний элемент остаётся на своём уровне
+            keep = [compactor.pop()] if len(compactor) % 2 else []
+            offset = int(self.rng.random() < 0.5)
+            promoted = compactor[offset::2]
+            self.compactors[height + 1].extend(promoted)
+            self.compactors[height] = keep
+            self.size -= len(promoted)
+            if self.size < self.max_size:
+                break
+
+    def merge(self, other: 'KLLSketch') -> 'KLLSketch':
+        while len(self.compactors) < len(other.compactors):
+            self._grow()
+        for height, compactor in enumerate(other.compactors):
+            self.compactors[height].extend(compactor)
+        self.count += other.count
+        self.size += other.size
+        while self.size >= self.max_size:
+            self._compress()
+        return self
+
+    def _weighted(self) -> List[tuple]:
+        return sorted(
+            (value, 2 ** height)
+            for height, compactor in enumerate(self.compactors)
+            for value in compactor
+        )
+
+    def quantiles(self, fractions: Sequence[float]) -> List:
+        """Значения, ранг которых приближённо равен fraction * count."""
+        if not self.count:
+            return [None] * len(fractions)
+        items = self._weighted()
+        total = sum(weight for value, weight in items)
+        answers = []
+        for fraction in fractions:
+            target, seen = fraction * total, 0
+            answer = items[-1][0]
+            for value, weight in items:
+                seen += weight
+                if seen > target:
+                    answer = value
+                    break
+            answers.append(answer)
+        return answers
+
+    def quantile(self, fraction: float):
+        return self.quantiles([fraction])[0]
+
+    def rank(self, value) -> float:
+        """Приближённая доля значений не больше value."""
+        if not self.count:
+            return 0.0
+        items = self._weighted()
+        total = sum(weight for item, weight in items)
+        return sum(weight for item, weight in items if item <= value) / total
+
+    def to_dict(self) -> Dict:
+        return {'k': self.k, 'count': self.count, 'compactors': [list(compactor) for compactor in self.compactors]}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'KLLSketch':
+        sketch = cls(k=data['k'])
+        while len(sketch.compactors) < len(data['compactors']):
+            sketch._grow()
+        sketch.compactors = [list(compactor) for compactor in data['compactors']]
+        sketch.count = data['count']
+        sketch.size = sum(len(compactor) for compactor in sketch.compactors)
+        return sketch
+
+
+class HyperLogLog:
+    """Приближённое число различных значений (HyperLogLog).
+
+    2**precision регистров по байту; стандартная ошибка 1.04 / sqrt(2**precision).
+    Хэш значений не зависит от процесса (blake2b), поэтому скетчи,
+    построенные в разных процессах, можно объединять.
+    """
+
+    def __init__(self, precision: int = 12):
+        if not 4 <= precision <= 18:
+            raise ValueError('Точность HyperLogLog должна быть от 4 до 18.')
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    @classmethod
+    def for_error(cls, error: float) -> 'HyperLogLog':
+        """Скетч со стандартной относительной ошибкой не больше error."""
+        precision = math.ceil(math.log2((1.04 / error) ** 2))
+        return cls(precision=min(max(precision, 4), 18))
+
+    @staticmethod
+    def _hash(value) -> int:
+        # 1 и 1.0 — одно значение, как в pandas
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        digest = hashlib.blake2b(repr(value).encode('utf-8'), digest_size=8).digest()
+        return int.from_bytes(digest, 'big')
+
+    def update(self, value) -> None:
+        hashed = self._hash(value)
+        bits = 64 - self.precision
+        index = hashed >> bits
+        rank = bits - (hashed & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update_many(self, values: Iterable) -> 'HyperLogLog':
+        for value in values:
+            self.update(value)
+        return self
+
+    def merge(self, other: 'HyperLogLog') -> 'HyperLogLog':
+        if other.precision != self.precision:
+            raise ValueError('Нельзя объединить HyperLogLog разной точности.')
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self) -> int:
+        size = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / size)
+        estimate = alpha * size * size / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * size and zeros:
+            # Поправка для малых множеств: подсчёт пустых регистров
+            estimate = size * math.log(size / zeros)
+        return round(estimate)
+
+    def to_dict(self) -> Dict:
+        return {'precision': self.precision, 'registers': base64.b64encode(bytes(self.registers)).decode('ascii')}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'HyperLogLog':
+        sketch = cls(precision=data['precision'])
+        sketch.registers = bytearray(base64.b64decode(data['registers']))
+        return sketch
+
+
+def quantile_error() -> float:
+    return getattr(settings, 'EOS_SKETCH_QUANTILE_ERROR', 0.01)
+
+
+def distinct_error() -> float:
+    return getattr(settings, 'EOS_SKETCH_DISTINCT_ERROR', 0.02)
+
+
+class ColumnSummary:
+    """Сводка колонки: точные сумма, количество и границы, скетчи медианы и различных значений."""
+
+    def __init__(self, quantiles: Optional[KLLSketch] = None, distinct: Optional[HyperLogLog] = None):
+        self.count, self.total, self.minimum, self.maximum = 0, 0, None, None
+        self.integral = True
+        self.quantiles = quantiles or KLLSketch.for_error(quantile_error())
+        self.distinct = distinct or HyperLogLog.for_error(distinct_error())
+
+    def update_many(self, values: Iterable) -> 'ColumnSummary':
+        values = [value for value in values if value is not None]
+        if not values:
+            return self
+        self.count += len(values)
+        self.total += sum(values)
+        self.minimum = min(values) if self.minimum is None else min(self.minimum, min(values))
+        self.maximum = max(values) if self.maximum is None else max(self.maximum, max(values))
+        self.integral = self.integral and all(isinstance(value, int) for value in values)
+        self.quantiles.update_many(values)
+        self.distinct.update_many(values)
+        return self
+
+    def merge(self, other: 'ColumnSummary') -> 'ColumnSummary':
+        self.count += other.count
+        self.total += other.total
+        for bound, pick in (('minimum', min), ('maximum', max)):
+            values = [value for value in (getattr(self, bound), getattr(other, bound)) if value is not None]
+            setattr(self, bound, pick(values) if values else None)
+        self.integral = self.integral and other.integral
+        self.quantiles.merge(other.quantiles)
+        self.distinct.merge(other.distinct)
+        return self
+
+    def statistics(self) -> Dict:
+        """Статистика как у calculate_statistics; median — приближённая, distinct — оценка."""
+        return {
+            'sum': self.total,
+            'mean': self.total / self.count if self.count else None,
+            'median': self.quantiles.quantile(0.5),
+            'max': self.maximum,
+            'min': self.minimum,
+            'distinct': self.distinct.count() if self.count else 0,
+        }
+
+    def to_dict(self) -> Dict:
+        """Представление для JSON и кэша."""
+        return {
+            'count': self.count,
+            'total': self.total,
+            'minimum': self.minimum,
+            'maximum': self.maximum,
+            'integral': self.integral,
+            'quantiles': self.quantiles.to_dict(),
+            'distinct': self.distinct.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'ColumnSummary':
+        summary = cls(KLLSketch.from_dict(data['quantiles']), HyperLogLog.from_dict(data['distinct']))
+        summary.count, summary.total = data['count'], data['total']
+        summary.minimum, summary.maximum = data['minimum'], data['maximum']
+        summary.integral = data['integral']
+        return summary
+
+
+class ColumnSketch:
+    """Сводки колонки по порциям (см. StudentStream.reduce), при group_by — по группам."""
+
+    def __init__(self, column_name: str, group_by: Optional[str] = None):
+        self.column_name = column_name
+        self.group_by = group_by
+
+    def partial(self, chunk: StudentColumns) -> Dict:
+        values = chunk.column(self.column_name)
+        if self.group_by is None:
+            return {None: ColumnSummary().update_many(values)}
+        groups = {}
+        for key, value in zip(chunk.column(self.group_by), values):
+            groups.setdefault(key, []).append(value)
+        return {key: ColumnSummary().update_many(group) for key, group in groups.items()}
+
+    @staticmethod
+    def merge(partial: Dict, other: Dict) -> Dict:
+        for key, summary in other.items():
+            if key in partial:
+                partial[key].merge(summary)
+            else:
+                partial[key] = summary
+        return partial
+
+    def finalize(self, partial: Dict):
+        if self.group_by is None:
+            return partial.get(None, ColumnSummary()).statistics()
+        return partial
+
+
+class SketchStore:
+    """Сводки колонки по группам (например, по специальности), сохраняемые в кэше.
+
+    Сводки строятся за один проход по студентам и хранятся в сериализованном
+    виде до изменения данных; статистика по любому набору групп получается
+    объединением их сводок без повторного чтения строк.
+    """
+
+    prefix = 'eos:sketches'
+
+    def __init__(self, column_name: str, group_by: str, students: Optional[QuerySet] = None):
+        self.column_name = column_name
+        self.group_by = group_by
+        self.students = Student.objects.all() if students is None else students
+        self.cache = get_cache()
+
+    def key(self) -> str:
+        scope = _digest(f'{self.column_name}:{self.group_by}:{self.students.query}')
+        return f'{self.prefix}:{get_data_version()}:{scope}'
+
+    def summaries(self) -> Dict:
+        """Группа -> ColumnSummary."""
+        key = self.key()
+        stored = self.cache.get(key)
+        if stored is None:
+            stream = StudentStream(self.students, chunk_size=getattr(settings, 'EOS_ANALYTICS_CHUNK_SIZE', 5000))
+            summaries, error = stream.reduce([ColumnSketch(self.column_name, self.group_by)])[0]
+            if error is not None:
+                raise error
+            stored = {group: summary.to_dict() for group, summary in summaries.items()}
+            self.cache.set(key, stored, timeout=getattr(settings, 'EOS_ANALYSIS_CACHE_TIMEOUT', None))
+        return {group: ColumnSummary.from_dict(data) for group, data in stored.items()}
+
+    def statistics(self, groups: Optional[Iterable] = None) -> Dict:
+        """Статистика по объединению групп groups (по умолчанию — всех)."""
+        summaries = self.summaries()
+        selected = summaries if groups is None else {group: summaries[group] for group in groups if group in summaries}
+        merged = ColumnSummary()
+        for summary in selected.values():
+            merged.merge(summary)
+        return merged.statistics()
@@ -0,0 +1,175 @@
+# streaming.py
+
+import math
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .student_data import StudentColumns, StudentDataLoader
+
+
+def add_sums(*parts: float) -> List[float]:
+    """Сумма частей, каждая из которых — сумма и её ошибка округления: [сумма, ошибка]."""
+    total = math.fsum(parts)
+    return [total, math.fsum((*parts, -total))]
+
+
+class GroupedMoments:
+    """Объединяемые частичные агрегаты по ключам: количество, сумма, минимум, максимум.
+
+    Ключи хранятся в порядке первого появления, поэтому объединение
+    порций по порядку даёт тот же порядок, что и анализ всех данных сразу.
+    Пятый элемент — ошибка округления суммы: суммы объединяются через
+    math.fsum и не зависят от того, как данные разбиты на порции.
+    """
+
+    def __init__(self, groups: Optional[Dict] = None):
+        self.groups = groups or {}
+
+    @classmethod
+    def of(cls, keys: Sequence, values: Optional[Sequence] = None) -> 'GroupedMoments':
+        # NumPy загружается при первом анализе, а не при запуске процесса
+        from .vectorized import grouped_moments
+        return cls(grouped_moments(keys, values))
+
+    def merge(self, other: 'GroupedMoments') -> 'GroupedMoments':
+        for key, (count, total, minimum, maximum, error) in other.groups.items():
+            current = self.groups.get(key)
+            if current is None:
+                self.groups[key] = [count, total, minimum, maximum, error]
+            else:
+                current[0] += count
+                current[1], current[4] = add_sums(current[1], current[4], total, error)
+                current[2] = min(current[2], minimum)
+                current[3] = max(current[3], maximum)
+        return self
+
+    def counts(self) -> Dict:
+        return {key: moments[0] for key, moments in self.groups.items()}
+
+    def means(self) -> Dict:
+        return {key: moments[1] / moments[0] for key, moments in self.groups.items()}
+
+
+class ValueHistogram:
+    """Точная медиана по потоку: количество вхождений каждого значения.
+
+    Память пропорциональна числу различных значений, а не числу строк,
+    что подходит для целочисленных колонок вроде пропущенных часов.
+    """
+
+    def __init__(self, counts: Optional[Counter] = None):
+        self.counts = counts if counts is not None else Counter()
+
+    @classmethod
+    def of(cls, values: Iterable) -> 'ValueHistogram':
+        return cls(Counter(value for value in values if value is not None))
+
+    def merge(self, other: 'ValueHistogram') -> 'ValueHistogram':
+        self.counts.update(other.counts)
+        return self
+
+    def __len__(self) -> int:
+        return sum(self.counts.values())
+
+    def quantile_values(self, positions: Sequence[int]) -> List:
+        """Значения на заданных позициях (с нуля) в отсортированной последовательности."""
+        wanted = sorted(set(positions))
+        found, seen = {}, 0
+        for value in sorted(self.counts):
+            seen += self.counts[value]
+            while wanted and wanted[0] < seen:
+                found[wanted.pop(0)] = value
+            if not wanted:
+                break
+        return [found[position] for position in positions]
+
+    def median(self):
+        total = len(self)
+        if total == 0:
+            return None
+        middle = self.quantile_values([(total - 1) // 2, total // 2])
+        return sum(middle) / 2
+
+
+class ColumnStatistics:
+    """Статистика колонки студентов по порциям: sum, mean, median, max, min."""
+
+    def __init__(self, column_name: str):
+        self.column_name = column_name
+
+    def partial(self, chunk: StudentColumns) -> Tuple[GroupedMoments, ValueHistogram]:
+        values = [value for value in chunk.column(self.column_name) if value is not None]
+        return GroupedMoments.of([self.column_name] * len(values), values), ValueHistogram.of(values)
+
+    @staticmethod
+    def merge(partial: Tuple, other: Tuple) -> Tuple:
+        return partial[0].merge(other[0]), partial[1].merge(other[1])
+
+    def finalize(self, partial: Tuple) -> Dict:
+        moments, histogram = partial
+        count, total, minimum, maximum, error = moments.groups.get(self.column_name, (0, 0, None, None, 0))
+        if count and all(isinstance(value, int) for value in histogram.counts):
+            # Для целочисленной колонки сумма и границы остаются целыми, как в SQL-режиме
+            total, minimum, maximum = int(total), int(minimum), int(maximum)
+        return {
+            'sum': total,
+            'mean': total / count if count else None,
+            'median': histogram.median(),
+            'max': maximum,
+            'min': minimum,
+        }
+
+
+class StudentStream:
+    """Студенты в виде потока порций StudentColumns для анализа в ограниченной памяти.
+
+    Каждый обход читает студентов серверным курсором и загружает оценки
+    отдельно для каждой порции. reduce() за один обход считает частичные
+    агрегаты всех переданных вычислителей и объединяет их.
+    """
+
+    def __init__(self, students, chunk_size: int = 5000):
+        self.students = students
+        self.chunk_size = chunk_size
+
+    def __iter__(self):
+        return StudentDataLoader(chunk_size=self.chunk_size).iter_chunks(self.students)
+
+    def reduce(self, reducers: Sequence) -> List[Tuple[object, Optional[Exception]]]:
+        """Выполняет reducers за один проход по данным.
+
+        Вычислитель предоставляет partial(порция), merge(частичный, частичный)
+        и finalize(частичный). Возвращает пары (результат, исключение) в
+        порядке вычислителей; ошибка одного не мешает остальным.
+        """
+        partials = [None] * len(reducers)
+        errors: List[Optional[Exception]] = [None] * len(reducers)
+
+        def accumulate(chunk):
+            for index, reducer in enumerate(reducers):
+                if errors[index] is not None:
+                    continue
+                try:
+                    chunk_partial = reducer.partial(chunk)
+                    partials[index] = (chunk_partial if partials[index] is None
+                                       else reducer.merge(partials[index], chunk_partial))
+                except Exception as exc:
+                    errors[index] = exc
+
+        empty = True
+        for chunk in self:
+            empty = False
+            accumulate(chunk)
+        if empty:
+            accumulate(StudentColumns.empty())
+
+        outcomes = []
+        for reducer, partial, error in zip(reducers, partials, errors):
+            if error is None:
+                try:
+                    outcomes.append((reducer.finalize(partial), None))
+                    continue
+                except Exception as exc:
+                    error = exc
+            outcomes.append((None, error))
+        return outcomes
@@ -0,0 +1,127 @@
+# student_data.py
+
+from typing import Callable, Dict, Iterable, Iterator, List
+
+from django.db.models import QuerySet
+
+from .models import Student, StudentGrade
+
+# Поля студента, которые попадают в аналитику
+STUDENT_FIELDS = ('id', 'name', 'age', 'email', 'major', 'year', 'missed_hours')
+
+# Поля оценки в колоночном представлении
+GRADE_FIELDS = ('student_index', 'subject', 'score')
+
+
+class StudentColumns:
+    """Данные студентов в колоночном виде: по одному списку на каждое поле.
+
+    students -- поле студента -> список значений (по одному на студента);
+    grades -- 'student_index' (позиция студента), 'subject', 'score'.
+    Оценки упорядочены так же, как при обходе студентов по порядку.
+    """
+
+    def __init__(self, students: Dict[str, list], grades: Dict[str, list]):
+        self.students = students
+        self.grades = grades
+
+    def __len__(self) -> int:
+        return len(self.students['id'])
+
+    @classmethod
+    def empty(cls) -> 'StudentColumns':
+        return cls({field: [] for field in STUDENT_FIELDS}, {field: [] for field in GRADE_FIELDS})
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self.students)
+
+    def column(self, name: str) -> list:
+        if name not in self.students:
+            raise ValueError(f"Колонка '{name}' не обнаружена.")
+        return self.students[name]
+
+    @classmethod
+    def from_records(cls, records: List[Dict]) -> 'StudentColumns':
+        """Строит колоночные данные из списка словарей по студентам."""
+        students = {field: [record.get(field) for record in records] for field in STUDENT_FIELDS}
+        grades = {field: [] for field in GRADE_FIELDS}
+        for index, record in enumerate(records):
+            for grade in record.get('grades', []):
+                grades['student_index'].append(index)
+                grades['subject'].append(grade['subject'])
+                grades['score'].append(grade['score'])
+        return cls(students, grades)
+
+    def to_records(self) -> List[Dict]:
+        """Возвращает данные в прежнем виде: список словарей по студентам."""
+        records = [
+            dict(zip(self.students, values), grades=[])
+            for values in zip(*self.students.values())
+        ]
+        for index, subject, score in zip(*(self.grades[field] for field in GRADE_FIELDS)):
+            records[index]['grades'].append({'subject': subject, 'score': score})
+        return records
+
+
+class StudentDataLoader:
+    """Загружает студентов и их оценки фиксированным числом запросов.
+
+    Вместо запроса оценок для каждого студента выполняется один запрос
+    к студентам и один к оценкам; строки читаются серверным курсором
+    порциями по chunk_size.
+    """
+
+    # Ограничение размера IN (...) для списка объектов Student
+    id_batch_size = 900
+
+    def __init__(self, chunk_size: int = 2000):
+        self.chunk_size = chunk_size
+
+    def load(self, students: Iterable[Student]) -> StudentColumns:
+        return self._build(self._student_rows(students), lambda ids: self._grade_rows(students, ids))
+
+    def iter_chunks(self, students: Iterable[Student]) -> Iterator[StudentColumns]:
+        """Студенты порциями по chunk_size; оценки загружаются отдельно для каждой порции."""
+        rows = []
+        for row in self._student_rows(students):
+            rows.append(row)
+            if len(rows) == self.chunk_size:
+                yield self._build(rows, lambda ids: self._grade_rows(ids, ids))
+                rows = []
+        if rows:
+            yield self._build(rows, lambda ids: self._grade_rows(ids, ids))
+
+    def _build(self, rows: Iterable, grade_rows: Callable[[List[int]], Iterable]) -> StudentColumns:
+        students_columns = {field: [] for field in STUDENT_FIELDS}
+        for row in rows:
+            for field, value in zip(STUDENT_FIELDS, row):
+                students_columns[field].append(value)
+
+        positions = {student_id: index for index, student_id in enumerate(students_columns['id'])}
+        per_student = [[] for _ in positions]
+        for student_id, subject, score in grade_rows(students_columns['id']):
+            per_student[positions[student_id]].append((subject, score))
+
+        grades_columns = {field: [] for field in GRADE_FIELDS}
+        for index, student_grades in enumerate(per_student):
+            for subject, score in student_grades:
+                grades_columns['student_index'].append(index)
+                grades_columns['subject'].append(subject)
+                grades_columns['score'].append(score)
+
+        return StudentColumns(students_columns, grades_columns)
+
+    def _student_rows(self, students):
+        if isinstance(students, QuerySet):
+            return students.values_list(*STUDENT_FIELDS).iterator(chunk_size=self.chunk_size)
+        return ([getattr(student, field) for field in STUDENT_FIELDS] for student in students)
+
+    def _grade_rows(self, students, student_ids: List[int]):
+        grades = StudentGrade.objects.order_by('id').values_list('student_id', 'subject', 'score')
+        if isinstance(students, QuerySet):
+            yield from grades.filter(student__in=students.values('id')).iterator(chunk_size=self.chunk_size)
+            return
+        for start in range(0, len(student_ids), self.id_batch_size):
+            batch = student_ids[start:start + self.id_batch_size]
+            yield from grades.filter(student_id__in=batch).iterator(chunk_size=self.chunk_size)
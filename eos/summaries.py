@@ -0,0 +1,143 @@
+# summaries.py
+
+import threading
+from typing import Dict, Iterable, Optional, Set
+
+from django.db import connection, transaction
+
+from .models import Student, StudentGrade, StudentSummary
+
+SUMMARY_FIELDS = ('gpa', 'grades', 'best_subject', 'best_score', 'worst_subject', 'worst_score')
+
+# Места в специальностях одним запросом: строки сводок не читаются в Python. Студенты без
+# оценок (gpa IS NULL) выделены в свою часть окна и получают NULL. UPDATE ... FROM есть
+# в PostgreSQL и в SQLite начиная с 3.33
+RANKS_SQL = '''
+    UPDATE {summary} SET major_rank = ranked.new_rank
+    FROM (
+        SELECT summary.student_id,
+               CASE WHEN summary.gpa IS NULL THEN NULL
+                    ELSE RANK() OVER (PARTITION BY student.major, summary.gpa IS NULL ORDER BY summary.gpa DESC)
+               END AS new_rank
+        FROM {summary} summary JOIN {student} student ON student.id = summary.student_id
+        {where}
+    ) ranked
+    WHERE {summary}.student_id = ranked.student_id
+      AND ({summary}.major_rank <> ranked.new_rank
+           OR ({summary}.major_rank IS NULL) <> (ranked.new_rank IS NULL))
+'''
+
+
+def summarize(rows: Iterable) -> Dict[int, Dict]:
+    """Сводки по строкам (student_id, subject, score) в порядке id оценок.
+
+    При равных баллах лучшей и худшей считается дисциплина, оценка по
+    которой добавлена раньше.
+    """
+    summaries = {}
+    for student_id, subject, score in rows:
+        summary = summaries.get(student_id)
+        if summary is None:
+            summaries[student_id] = {
+                'total': score, 'grades': 1,
+                'best_subject': subject, 'best_score': score,
+                'worst_subject': subject, 'worst_score': score,
+            }
+            continue
+        summary['total'] += score
+        summary['grades'] += 1
+        if score > summary['best_score']:
+            summary['best_subject'], summary['best_score'] = subject, score
+        if score < summary['worst_score']:
+            summary['worst_subject'], summary['worst_score'] = subject, score
+    for summary in summaries.values():
+        summary['gpa'] = summary.pop('total') / summary['grades']
+    return summaries
+
+
+class StudentSummaryStore:
+    """Таблица StudentSummary: сводки студентов для списка и карточки студента.
+
+    refresh() пересчитывает сводки указанных студентов по их оценкам
+    (один запрос чтения и одна вставка с обновлением при конфликте) и
+    места в специальностях, где они учатся. Место считается оконной
+    функцией RANK() OVER (PARTITION BY major ORDER BY gpa DESC) в том же
+    запросе UPDATE, который его записывает; меняются только строки с
+    изменившимся местом.
+    """
+
+    def refresh(self, student_ids: Iterable[int], majors: Iterable[str] = (), ranks: bool = True) -> None:
+        """Пересчитывает сводки студентов и, если ranks, места в их специальностях и в majors."""
+        student_ids = list(set(student_ids))
+        majors = set(majors)
+        for start in range(0, len(student_ids), 900):
+            majors |= self._refresh_summaries(student_ids[start:start + 900])
+        if majors and ranks:
+            self.refresh_ranks(majors)
+
+    def _refresh_summaries(self, student_ids) -> Set[str]:
+        students = dict(Student.objects.filter(id__in=student_ids).values_list('id', 'major'))
+        rows = (
+            StudentGrade.objects.filter(student_id__in=list(students))
+            .order_by('student_id', 'id')
+            .values_list('student_id', 'subject', 'score')
+        )
+        computed = summarize(rows)
+        empty = dict.fromkeys(SUMMARY_FIELDS)
+        empty.update(grades=0, best_subject='', worst_subject='')
+        StudentSummary.objects.bulk_create(
+            [StudentSummary(student_id=student_id, **computed.get(student_id, empty)) for student_id in students],
+            update_conflicts=True, unique_fields=['student'], update_fields=list(SUMMARY_FIELDS),
+        )
+        return set(students.values())
+
+    def refresh_ranks(self, majors: Optional[Iterable[str]] = None) -> int:
+        """Пересчитывает места в специальностях majors (по умолчанию — во всех); возвращает число изменённых."""
+        where, params = '', []
+        if majors is not None:
+            params = list(majors)
+            if not params:
+                return 0
+            where = f"WHERE student.major IN ({', '.join(['%s'] * len(params))})"
+        sql = RANKS_SQL.format(
+            summary=connection.ops.quote_name(StudentSummary._meta.db_table),
+            student=connection.ops.quote_name(Student._meta.db_table),
+            where=where,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.rowcount
+
+    def rebuild(self, chunk_size: int = 2000) -> None:
+        """Пересобирает сводки всех студентов."""
+        ids = list(Student.objects.order_by('id').values_list('id', flat=True))
+        with transaction.atomic():
+            for start in range(0, len(ids), chunk_size):
+                self._refresh_summaries(ids[start:start + chunk_size])
+            self.refresh_ranks()
+
+
+# Студенты и специальности, чьи сводки нужно обновить после фиксации транзакции
+_pending = threading.local()
+
+
+def schedule(student_id: Optional[int], *majors: str) -> None:
+    """Откладывает обновление сводки студента и мест в специальностях majors до фиксации транзакции.
+
+    Несколько изменений оценок одного студента в транзакции (например,
+    сохранение формы с оценками) дают одно обновление.
+    """
+    if not hasattr(_pending, 'students'):
+        _pending.students, _pending.majors = set(), set()
+    if student_id is not None:
+        _pending.students.add(student_id)
+    _pending.majors.update(major for major in majors if major is not None)
+    transaction.on_commit(flush)
+
+
+def flush() -> None:
+    students, majors = getattr(_pending, 'students', set()), getattr(_pending, 'majors', set())
+    if not students and not majors:
+        return
+    _pending.students, _pending.majors = set(), set()
+    StudentSummaryStore().refresh(students, majors)
@@ -0,0 +1,241 @@
+# eos/tests/test_analytics.py
+
+import json
+import math
+import random
+
+import pandas as pd
+from django.test import SimpleTestCase, override_settings
+
+from eos.analytics import PerformanceAnalytics, MajorAnalytics, YearAttendanceAnalytics, BarPlotStrategy
+from eos.analytics_service import AnalyticsService
+from eos.cube import OlapCube
+from eos.sketches import ColumnSketch, ColumnSummary, HyperLogLog, KLLSketch
+from eos.streaming import ColumnStatistics, ValueHistogram
+from eos.student_data import StudentColumns
+from eos.vectorized import factorize
+
+
+def make_records(count, seed=0):
+    """Синтетические данные студентов в прежнем формате (список словарей)."""
+    rng = random.Random(seed)
+    subjects = ['Math', 'Physics', 'History', 'Chemistry', 'Biology', 'Art']
+    majors = ['Computer Science', 'Mathematics', 'Physics', 'Economics']
+    records = []
+    for student_id in range(1, count + 1):
+        records.append({
+            "id": student_id,
+            "name": f"Student {student_id}",
+            "age": rng.randint(17, 30),
+            "grades": [
+                # Произвольные дробные баллы: суммы зависят от порядка сложения, если его не учитывать
+                {"subject": subject, "score": rng.uniform(0, 100)}
+                for subject in rng.sample(subjects, rng.randint(0, len(subjects)))
+            ],
+            "email": f"student{student_id}@example.com",
+            "major": rng.choice(majors),
+            "year": rng.randint(1, 5),
+            "missed_hours": rng.randint(0, 120),
+        })
+    return records
+
+
+class VectorizedParityTest(SimpleTestCase):
+    module_classes = (PerformanceAnalytics, MajorAnalytics, YearAttendanceAnalytics)
+
+    def assert_parity(self, records):
+        columns = StudentColumns.from_records(records)
+        for module_class in self.module_classes:
+            module = module_class(plot_strategy=BarPlotStrategy(xlabel='x', ylabel='y', title='t'))
+            expected = module.analyze_records(records)
+            result = module.analyze(columns)
+            with self.subTest(module=module_class.__name__):
+                # Совпадают значения, типы ключей и порядок ключей
+                self.assertEqual(list(result.items()), list(expected.items()))
+                self.assertEqual([type(key) for key in result], [type(key) for key in expected])
+
+    def test_parity_on_random_data(self):
+        for seed in range(5):
+            self.assert_parity(make_records(500, seed=seed))
+
+    def test_parity_on_empty_data(self):
+        self.assert_parity([])
+
+    def test_parity_without_grades(self):
+        records = make_records(10)
+        for record in records:
+            record['grades'] = []
+        self.assert_parity(records)
+
+    def test_parity_with_integer_scores(self):
+        records = make_records(50, seed=7)
+        for record in records:
+            for grade in record['grades']:
+                grade['score'] = int(grade['score'])
+        self.assert_parity(records)
+
+    def test_factorize_keeps_first_appearance_order(self):
+        codes, uniques = factorize(['b', 'a', 'b', 'c', 'a'])
+        self.assertEqual(uniques, ['b', 'a', 'c'])
+        self.assertEqual(codes.tolist(), [0, 1, 0, 2, 1])
+
+
+class StreamingPartialsTest(SimpleTestCase):
+    module_classes = VectorizedParityTest.module_classes
+
+    def reduce(self, reducer, records, chunk_size):
+        partial = None
+        for start in range(0, max(len(records), 1), chunk_size):
+            chunk_partial = reducer.partial(StudentColumns.from_records(records[start:start + chunk_size]))
+            partial = chunk_partial if partial is None else reducer.merge(partial, chunk_partial)
+        return reducer.finalize(partial)
+
+    def test_merged_partials_match_full_analysis(self):
+        records = make_records(300, seed=3)
+        for chunk_size in (1, 7, 300):
+            for module_class in self.module_classes:
+                module = module_class(plot_strategy=BarPlotStrategy(xlabel='x', ylabel='y', title='t'))
+                with self.subTest(module=module_class.__name__, chunk_size=chunk_size):
+                    self.assertEqual(list(self.reduce(module, records, chunk_size).items()),
+                                     list(module.analyze_records(records).items()))
+
+    def test_streaming_statistics_match_pandas(self):
+        for count in (0, 1, 2, 301):
+            records = make_records(count, seed=count)
+            column = pd.DataFrame(records, columns=['missed_hours'])['missed_hours']
+            statistics = self.reduce(ColumnStatistics('missed_hours'), records, chunk_size=50)
+            with self.subTest(count=count):
+                self.assertEqual(statistics['sum'], column.sum())
+                if count:
+                    self.assertEqual(statistics['median'], column.median())
+                    self.assertEqual(statistics['mean'], column.mean())
+                    self.assertEqual((statistics['min'], statistics['max']), (column.min(), column.max()))
+                else:
+                    self.assertIsNone(statistics['median'])
+
+    def test_histogram_median(self):
+        histogram = ValueHistogram.of([5, 1, 3]).merge(ValueHistogram.of([3, 9, None]))
+        self.assertEqual(histogram.median(), 3.0)
+        self.assertEqual(histogram.merge(ValueHistogram.of([10])).median(), 4.0)
+
+
+class OlapCubeTest(SimpleTestCase):
+
+    def test_slices_match_direct_computation(self):
+        records = make_records(400, seed=11)
+        cube = OlapCube.from_records(records)
+        scores = {}
+        for record in records:
+            if record['year'] != 2:
+                continue
+            for grade in record['grades']:
+                scores.setdefault((record['major'], grade['subject']), []).append(grade['score'])
+
+        result = cube.rollup('score', by=['major', 'subject'], where={'year': 2})
+        self.assertEqual(list(result), list(scores))
+        for key, values in scores.items():
+            self.assertEqual(result[key], math.fsum(values) / len(values))
+        self.assertEqual(cube.rollup('score_max', by=['major', 'subject'], where={'year': 2}),
+                         {key: max(values) for key, values in scores.items()})
+        self.assertEqual(cube.rollup('students', where={'year': [1, 2]}),
+                         {(): sum(record['year'] in (1, 2) for record in records)})
+
+    def test_merged_chunks_and_serialization_keep_cells(self):
+        records = make_records(200, seed=5)
+        cube = OlapCube.from_records(records)
+        merged = OlapCube.from_records(records[:70]).merge(OlapCube.from_records(records[70:]))
+        restored = OlapCube.from_dict(json.loads(json.dumps(cube.to_dict())))
+        for fact in ('students', 'grades'):
+            with self.subTest(fact=fact):
+                self.assertEqual(list(merged.cells(fact).items()), list(cube.cells(fact).items()))
+                self.assertEqual(list(restored.cells(fact).items()), list(cube.cells(fact).items()))
+
+    def test_unknown_measure_or_dimension(self):
+        cube = OlapCube.from_records(make_records(10))
+        with self.assertRaises(ValueError):
+            cube.rollup('height')
+        with self.assertRaises(ValueError):
+            cube.rollup('missed_hours', by=['subject'])
+        with self.assertRaises(ValueError):
+            cube.rollup('score', where={'city': 'Moscow'})
+
+
+class SketchAccuracyTest(SimpleTestCase):
+    """Оценки скетчей сравниваются с точными результатами pandas."""
+
+    def setUp(self):
+        rng = random.Random(7)
+        self.values = [round(rng.lognormvariate(3, 1), 1) for _ in range(20000)]
+        self.series = pd.Series(self.values)
+
+    def merged_sketch(self, error, parts=4, seed=0):
+        sketches = [KLLSketch.for_error(error, seed=seed + part).update_many(self.values[part::parts])
+                    for part in range(parts)]
+        for sketch in sketches[1:]:
+            sketches[0].merge(sketch)
+        return sketches[0]
+
+    def test_quantile_rank_error_within_bound(self):
+        for error in (0.05, 0.01):
+            sketch = self.merged_sketch(error)
+            self.assertEqual(sketch.count, len(self.values))
+            self.assertLess(sketch.size, len(self.values) // 10)
+            for fraction in (0.1, 0.5, 0.9):
+                with self.subTest(error=error, fraction=fraction):
+                    estimate = sketch.quantile(fraction)
+                    # Доля точных значений не больше оценки отличается от fraction не больше чем на error
+                    lower, upper = (self.series < estimate).mean(), (self.series <= estimate).mean()
+                    self.assertLessEqual(lower - error, fraction)
+                    self.assertGreaterEqual(upper + error, fraction)
+
+    def test_distinct_count_within_bound(self):
+        exact = self.series.nunique()
+        for error in (0.05, 0.02):
+            halves = [HyperLogLog.for_error(error).update_many(self.values[part::2]) for part in range(2)]
+            estimate = halves[0].merge(halves[1]).count()
+            with self.subTest(error=error):
+                # Три стандартные ошибки
+                self.assertLessEqual(abs(estimate - exact), 3 * error * exact)
+        self.assertEqual(HyperLogLog().update_many([1, 1.0, 2, 3, 3]).count(), 3)
+
+    def test_sketches_serialize_to_json(self):
+        summary = ColumnSummary().update_many(self.values)
+        restored = ColumnSummary.from_dict(json.loads(json.dumps(summary.to_dict())))
+        self.assertEqual(restored.statistics(), summary.statistics())
+        # Восстановленная сводка продолжает принимать значения и объединяться
+        restored.merge(ColumnSummary().update_many([1.0, 2.0]))
+        self.assertEqual(restored.quantiles.count, len(self.values) + 2)
+        with self.assertRaises(ValueError):
+            HyperLogLog(precision=10).merge(HyperLogLog(precision=12))
+
+    def test_approximate_statistics_match_pandas(self):
+        records = make_records(3000, seed=11)
+        column = pd.Series([record['missed_hours'] for record in records])
+        exact = AnalyticsService(records).calculate_statistics('missed_hours')
+        # Данные в памяти считаются точно, скетчи не строятся
+        approximate = AnalyticsService(records).calculate_statistics('missed_hours', approximate=True)
+        self.assertEqual(approximate, {**exact, 'distinct': column.nunique()})
+
+    @override_settings(EOS_SKETCH_QUANTILE_ERROR=0.01, EOS_SKETCH_DISTINCT_ERROR=0.02)
+    def test_sketch_statistics_match_pandas(self):
+        records = make_records(3000, seed=11)
+        column = pd.Series([record['missed_hours'] for record in records])
+        exact = AnalyticsService(records).calculate_statistics('missed_hours')
+        summary = ColumnSummary().update_many(column.tolist())
+        approximate = summary.statistics()
+        for key in ('sum', 'max', 'min'):
+            self.assertEqual(approximate[key], exact[key])
+        self.assertTrue(math.isclose(approximate['mean'], exact['mean']))
+        self.assertLessEqual(abs((column <= approximate['median']).mean() - 0.5), 0.01 + 1 / column.nunique())
+        self.assertLessEqual(abs(approximate['distinct'] - column.nunique()), 0.06 * column.nunique())
+
+    def test_grouped_partials_merge(self):
+        records = make_records(500, seed=5)
+        reducer = ColumnSketch('missed_hours', group_by='major')
+        partial = reducer.partial(StudentColumns.from_records(records[:200]))
+        partial = reducer.merge(partial, reducer.partial(StudentColumns.from_records(records[200:])))
+        groups = reducer.finalize(partial)
+        expected = pd.DataFrame(records).groupby('major')['missed_hours']
+        self.assertEqual({major: summary.count for major, summary in groups.items()}, expected.count().to_dict())
+        self.assertEqual({major: summary.total for major, summary in groups.items()}, expected.sum().to_dict())
+        self.assertIsNone(ColumnSketch('missed_hours').finalize({})['median'])
@@ -1,12 +1,49 @@
 # eos/tests.py
 
-from django.test import TestCase, Client
+import base64
+import csv
+import gzip
+import json
+import os
+import pickle
+import tempfile
+import time
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from threading import Thread
+from unittest import mock
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from eos.models import Student, StudentGrade
+from django.utils import timezone
+from eos.models import AnalysisJob, DataVersion, Student, StudentGrade, StudentImport, StudentSummary
 from eos.forms import StudentForm, StudentEditForm, StudentGradeForm, StudentGradeFormSet
-from eos.analytics import AnalyticsEngine, PerformanceAnalytics, MajorAnalytics, YearAttendanceAnalytics, \
-    BarPlotStrategy
+from eos.analytics import AnalyticsEngine, AnalyticsModule, PerformanceAnalytics, MajorAnalytics, YearAttendanceAnalytics, \
+    BarPlotStrategy, ChartSpecPlotStrategy, StoredBarPlotStrategy, make_plot_strategy, register_default_modules
+from eos.benchmarks import BENCHMARKS, compare
+from eos.cache import get_cache, get_data_version
+from eos.checks import check_analysis_queue_cache
+from eos.cube import CubeStore, OlapCube
+from eos.aggregates import AggregateStore
 from eos.analytics_service import AnalyticsService
+from eos import search
+from eos.export import StudentExporter
+from eos.importer import StudentImporter
+from eos.jobs import AnalysisQueue, job_status, json_results
+from eos.pagination import KeysetPaginator
+from eos.plot_store import PlotStore
+from eos.profiling import METRICS
+from eos.sketches import SketchStore
+from eos.streaming import StudentStream
+from eos.summaries import StudentSummaryStore
+from eos.student_data import StudentColumns, StudentDataLoader
 
 
 class StudentViewsTest(TestCase):
@@ -30,6 +67,8 @@ class StudentViewsTest(TestCase):
         module = PerformanceAnalytics(
             plot_strategy=BarPlotStrategy(xlabel='Subject', ylabel='Average Score', title='Average Scores'))
         engine = AnalyticsEngine()
+        # Движок общий для процесса: модуль по умолчанию возвращается после теста
+        self.addCleanup(setattr, engine, 'modules', list(engine.modules))
         engine.register_module(module)
         self.assertIn(module, engine.modules)
 
@@ -94,3 +133,1210 @@ class StudentViewsTest(TestCase):
             'min': 5
         }
         self.assertEqual(statistics, expected_statistics)
+
+    def test_analyze_service_returns_native_numbers(self):
+        data = [{"id": 1, "age": 19, "missed_hours": 5}, {"id": 2, "age": 20, "missed_hours": None}, {"id": 3}]
+        statistics = AnalyticsService(data).calculate_many(['missed_hours', 'age'])
+        self.assertEqual(statistics['missed_hours'], {'sum': 5, 'mean': 5.0, 'median': 5.0, 'max': 5, 'min': 5})
+        self.assertEqual(statistics['age']['median'], 19.5)
+        for value in (*statistics['missed_hours'].values(), *statistics['age'].values()):
+            self.assertIn(type(value), (int, float))
+        # Готовые колонки принимаются без преобразования в записи
+        columns = {'missed_hours': [5, None], 'age': [19, 20]}
+        self.assertEqual(AnalyticsService(columns).calculate_many(['missed_hours', 'age']), statistics)
+
+    def test_analyze_service_empty_and_invalid_columns(self):
+        self.assertEqual(AnalyticsService([{"missed_hours": None}]).calculate_statistics('missed_hours'),
+                         {'sum': 0, 'mean': None, 'median': None, 'max': None, 'min': None})
+        with self.assertRaises(ValueError):
+            AnalyticsService([{"name": "Ann"}]).calculate_statistics('name')
+        with self.assertRaises(ValueError):
+            AnalyticsService({'age': [1]}).calculate_statistics('missed_hours')
+
+
+class StudentDataLoaderTest(TestCase):
+
+    def setUp(self):
+        first = Student.objects.create(name='Ann', age=19, email='ann@example.com', major='Math', year=1,
+                                       missed_hours=4)
+        second = Student.objects.create(name='Bob', age=20, major='Physics', year=2, missed_hours=10)
+        third = Student.objects.create(name='Eve', age=21, major='Math', year=2, missed_hours=7)
+        StudentGrade.objects.create(student=second, subject='Science', score=70)
+        StudentGrade.objects.create(student=first, subject='Math', score=85)
+        StudentGrade.objects.create(student=first, subject='Science', score=90.5)
+        StudentGrade.objects.create(student=third, subject='Math', score=60)
+
+    def legacy_student_data(self, students):
+        return [
+            {
+                "id": student.id,
+                "name": student.name,
+                "age": student.age,
+                "grades": list(student.grades.values('subject', 'score')),
+                "email": student.email,
+                "major": student.major,
+                "year": student.year,
+                "missed_hours": student.missed_hours
+            }
+            for student in students
+        ]
+
+    def test_load_uses_fixed_number_of_queries(self):
+        with self.assertNumQueries(2):
+            StudentDataLoader().load(Student.objects.all())
+        for index in range(20):
+            Student.objects.create(name=f'Extra {index}', age=18, major='Math', year=1)
+        with self.assertNumQueries(2):
+            StudentDataLoader().load(Student.objects.all())
+
+    def test_load_matches_per_student_data(self):
+        students = Student.objects.order_by('-id')
+        columns = StudentDataLoader().load(students)
+        self.assertEqual(columns.to_records(), self.legacy_student_data(students))
+        self.assertEqual(StudentDataLoader().load(list(students)).to_records(),
+                         self.legacy_student_data(students))
+
+    def test_modules_and_service_results_unchanged(self):
+        students = Student.objects.all()
+        columns = AnalyticsEngine().generate_student_data(students)
+        records = self.legacy_student_data(students)
+        plot_strategy = BarPlotStrategy(xlabel='x', ylabel='y', title='t')
+        for module_class in (PerformanceAnalytics, MajorAnalytics, YearAttendanceAnalytics):
+            module = module_class(plot_strategy=plot_strategy)
+            self.assertEqual(list(module.analyze(columns).items()), list(module.analyze(records).items()))
+        self.assertEqual(AnalyticsService(columns).calculate_statistics('missed_hours'),
+                         AnalyticsService(records).calculate_statistics('missed_hours'))
+
+
+class SqlBackendTest(TestCase):
+
+    def setUp(self):
+        students = [
+            Student.objects.create(name='Ann', age=19, major='Math', year=1, missed_hours=4),
+            Student.objects.create(name='Bob', age=20, major='Physics', year=2, missed_hours=10),
+            Student.objects.create(name='Eve', age=21, major='Math', year=2, missed_hours=7),
+        ]
+        for student, scores in zip(students, ([('Math', 85), ('Science', 90.5)], [('Science', 70)], [('Math', 60)])):
+            for subject, score in scores:
+                StudentGrade.objects.create(student=student, subject=subject, score=score)
+
+    def test_modules_match_in_memory_results(self):
+        students = Student.objects.all()
+        columns = StudentDataLoader().load(students)
+        for module_class in (PerformanceAnalytics, MajorAnalytics, YearAttendanceAnalytics):
+            module = module_class(plot_strategy=BarPlotStrategy(xlabel='x', ylabel='y', title='t'))
+            self.assertEqual(module.analyze(students), module.analyze(columns))
+
+    def test_statistics_match_in_memory_results(self):
+        for extra in range(2):
+            students = Student.objects.all()
+            expected = AnalyticsService(StudentDataLoader().load(students)).calculate_statistics('missed_hours')
+            self.assertEqual(AnalyticsService(students).calculate_statistics('missed_hours'), expected)
+            Student.objects.create(name=f'Extra {extra}', age=18, major='Art', year=3, missed_hours=1)
+
+    def test_many_columns_match_in_memory_results(self):
+        students = Student.objects.all()
+        columns = ['missed_hours', 'age', 'year']
+        expected = AnalyticsService(StudentDataLoader().load(students)).calculate_many(columns)
+        # Один запрос агрегатов для всех колонок и по два на медиану каждой
+        with self.assertNumQueries(1 + 2 * len(columns)):
+            self.assertEqual(AnalyticsService(students).calculate_many(columns), expected)
+        self.assertEqual(AnalyticsService(StudentStream(students, chunk_size=2)).calculate_many(columns), expected)
+
+    def test_statistics_unknown_column(self):
+        with self.assertRaises(ValueError):
+            AnalyticsService(Student.objects.all()).calculate_statistics('unknown')
+
+    def test_statistics_loads_only_aggregates(self):
+        with self.assertNumQueries(3):
+            AnalyticsService(Student.objects.all()).calculate_statistics('missed_hours')
+
+    def test_stream_matches_in_memory_results(self):
+        students = Student.objects.all()
+        columns = StudentDataLoader().load(students)
+        for chunk_size in (1, 2, 10):
+            stream = StudentStream(students, chunk_size=chunk_size)
+            for module_class in (PerformanceAnalytics, MajorAnalytics, YearAttendanceAnalytics):
+                module = module_class(plot_strategy=BarPlotStrategy(xlabel='x', ylabel='y', title='t'))
+                self.assertEqual(module.analyze(stream), module.analyze(columns))
+            expected = AnalyticsService(columns).calculate_statistics('missed_hours')
+            self.assertEqual(AnalyticsService(stream).calculate_statistics('missed_hours'), expected)
+        with self.assertRaises(ValueError):
+            AnalyticsService(StudentStream(students)).calculate_statistics('unknown')
+
+    @override_settings(EOS_ANALYTICS_BACKEND='stream', EOS_ANALYTICS_CHUNK_SIZE=2, EOS_ANALYSIS_CACHE_ENABLED=False)
+    def test_stream_backend_reads_data_once(self):
+        engine = AnalyticsEngine()
+        modules = [module_class(plot_strategy=ChartSpecPlotStrategy(xlabel='x', ylabel='y', title='t'))
+                   for module_class in (PerformanceAnalytics, MajorAnalytics, YearAttendanceAnalytics)]
+        data = engine.prepare_data(Student.objects.all())
+        # Запрос студентов и по запросу оценок на каждую из двух порций
+        with self.assertNumQueries(3):
+            results, statistics = engine.analyze_stream(data, modules, 'missed_hours')
+        self.assertEqual(results[MajorAnalytics.name]['result'], {'Math': 2, 'Physics': 1})
+        self.assertEqual(results[PerformanceAnalytics.name]['result'], {'Math': 72.5, 'Science': 80.25})
+        self.assertEqual(statistics, {'sum': 21, 'mean': 7.0, 'median': 7.0, 'max': 10, 'min': 4})
+
+    def test_approximate_statistics_for_every_backend(self):
+        students = Student.objects.all()
+        expected = {'sum': 21, 'mean': 7.0, 'median': 7, 'max': 10, 'min': 4, 'distinct': 3}
+        for data in (students, StudentDataLoader().load(students), StudentStream(students, chunk_size=2)):
+            with self.subTest(data=type(data).__name__):
+                self.assertEqual(AnalyticsService(data).calculate_statistics('missed_hours', approximate=True),
+                                 expected)
+
+    def test_approximate_statistics_for_queryset_use_aggregates(self):
+        # Строки не читаются в Python: агрегатный запрос и запросы медианы (PERCENTILE_CONT на PostgreSQL)
+        with CaptureQueriesContext(connection) as queries:
+            statistics = AnalyticsService(Student.objects.all()).calculate_statistics('missed_hours', approximate=True)
+        self.assertLessEqual(len(queries), 3)
+        self.assertEqual(statistics['distinct'], 3)
+
+    @override_settings(EOS_ANALYTICS_BACKEND='stream', EOS_ANALYTICS_APPROXIMATE=True)
+    def test_approximate_backend_statistics(self):
+        results = AnalyticsEngine().run_analysis(Student.objects.all(), 'missed_hours')
+        self.assertEqual(results['statistics']['distinct'], 3)
+        with override_settings(EOS_ANALYTICS_APPROXIMATE=False):
+            # Точная статистика не берётся из кэша приближённой
+            results = AnalyticsEngine().run_analysis(Student.objects.all(), 'missed_hours')
+        self.assertNotIn('distinct', results['statistics'])
+
+    def test_sketch_store_merges_groups(self):
+        store = SketchStore('missed_hours', group_by='major')
+        self.assertEqual(store.statistics(['Math'])['sum'], 11)
+        with self.assertNumQueries(2):
+            # Сводки групп берутся из кэша и объединяются без чтения строк (запросы — версия данных)
+            self.assertEqual(store.statistics(['Math', 'Physics'])['sum'], 21)
+            self.assertEqual(store.statistics()['max'], 10)
+        Student.objects.create(name='Dan', age=22, major='Math', year=3, missed_hours=20)
+        self.assertEqual(store.statistics(['Math'])['max'], 20)
+
+
+class AnalysisCacheTest(TestCase):
+
+    def setUp(self):
+        self.student = Student.objects.create(name='Ann', age=19, major='Math', year=1, missed_hours=4)
+        StudentGrade.objects.create(student=self.student, subject='Math', score=80)
+        self.engine = AnalyticsEngine()
+
+    def test_repeat_analysis_is_served_from_cache(self):
+        first = self.engine.run_analysis(Student.objects.all(), 'missed_hours')
+        # Из базы читается только версия данных
+        with self.assertNumQueries(1):
+            second = self.engine.run_analysis(Student.objects.all(), 'missed_hours')
+        self.assertEqual(first, second)
+
+    def test_version_change_in_another_process_invalidates_cache(self):
+        first = self.engine.run_analysis(Student.objects.all(), 'missed_hours')
+        # Другой процесс меняет данные: его кэш в памяти недоступен, общая только версия в базе
+        Student.objects.filter(name='Ann').update(missed_hours=100)
+        DataVersion.objects.update(value=F('value') + 1)
+        second = self.engine.run_analysis(Student.objects.all(), 'missed_hours')
+        self.assertNotEqual(first['statistics'], second['statistics'])
+
+    def test_changes_invalidate_cache(self):
+        self.engine.run_analysis(Student.objects.all(), 'missed_hours')
+        bob = Student.objects.create(name='Bob', age=20, major='Physics', year=1, missed_hours=10)
+        StudentGrade.objects.create(student=bob, subject='Math', score=100)
+        results = self.engine.run_analysis(Student.objects.all(), 'missed_hours')
+        self.assertEqual(results[PerformanceAnalytics.name]['result'], {'Math': 90.0})
+        self.assertEqual(results['statistics']['sum'], 14)
+
+        StudentGrade.objects.all().delete()
+        results = self.engine.run_analysis(Student.objects.all(), 'missed_hours')
+        self.assertEqual(results[PerformanceAnalytics.name]['result'], {})
+
+    def test_filtered_querysets_are_cached_separately(self):
+        Student.objects.create(name='Bob', age=20, major='Physics', year=1, missed_hours=10)
+        everyone = self.engine.run_analysis(Student.objects.all(), 'missed_hours')
+        math_only = self.engine.run_analysis(Student.objects.filter(major='Math'), 'missed_hours')
+        self.assertEqual(everyone['statistics']['sum'], 14)
+        self.assertEqual(math_only['statistics']['sum'], 4)
+
+    def test_analysis_view(self):
+        response = self.client.get(reverse('run_analysis'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'eos/analysis_results.html')
+
+
+@override_settings(EOS_ANALYTICS_BACKEND='aggregates')
+class AggregateStoreTest(TestCase):
+
+    def setUp(self):
+        self.ann = Student.objects.create(name='Ann', age=19, major='Math', year=1, missed_hours=4)
+        self.bob = Student.objects.create(name='Bob', age=20, major='Physics', year=2, missed_hours=10)
+        StudentGrade.objects.create(student=self.ann, subject='Math', score=80)
+        StudentGrade.objects.create(student=self.bob, subject='Math', score=60)
+        StudentGrade.objects.create(student=self.bob, subject='Science', score=75)
+
+    def assert_matches_full_analysis(self):
+        store = AggregateStore()
+        columns = StudentDataLoader().load(Student.objects.all())
+        for module_class in (PerformanceAnalytics, MajorAnalytics, YearAttendanceAnalytics):
+            module = module_class(plot_strategy=BarPlotStrategy(xlabel='x', ylabel='y', title='t'))
+            self.assertEqual(module.analyze(store), module.analyze(columns))
+        self.assertEqual(store.drift(), {})
+
+    def test_create_edit_and_delete_keep_aggregates_current(self):
+        self.assert_matches_full_analysis()
+
+        self.ann.year = 2
+        self.ann.major = 'Physics'
+        self.ann.missed_hours = 20
+        self.ann.save()
+        self.assert_matches_full_analysis()
+
+        grade = StudentGrade.objects.get(student=self.bob, subject='Math')
+        grade.score = 100
+        grade.save()
+        self.assert_matches_full_analysis()
+
+        self.bob.delete()
+        self.assert_matches_full_analysis()
+
+    def test_deferred_and_unsaved_instances_keep_aggregates_current(self):
+        student = Student.objects.only('name').get(pk=self.bob.pk)
+        student.missed_hours = 30
+        student.save()
+        self.assert_matches_full_analysis()
+
+        StudentGrade(pk=StudentGrade.objects.get(student=self.ann).pk, student=self.ann,
+                     subject='Art', score=50).save()
+        self.assert_matches_full_analysis()
+
+        StudentGrade.objects.filter(subject='Science').delete()
+        self.assert_matches_full_analysis()
+
+    def test_edit_within_key_keeps_key_order(self):
+        order = list(AggregateStore().read('year'))
+        self.ann.missed_hours = 40
+        self.ann.save()
+        self.assertEqual(list(AggregateStore().read('year')), order)
+        self.assert_matches_full_analysis()
+
+    def test_aggregates_not_maintained_in_other_backends(self):
+        with override_settings(EOS_ANALYTICS_BACKEND='python'):
+            Student.objects.create(name='Kim', age=22, major='Biology', year=4)
+        self.assertNotIn('Biology', AggregateStore().read('major'))
+        call_command('rebuild_analytics_aggregates', stdout=StringIO())
+        self.assert_matches_full_analysis()
+
+    def test_edit_view_updates_aggregates(self):
+        grade = self.ann.grades.get()
+        response = self.client.post(reverse('edit_student', args=[self.ann.id]), {
+            'name': 'Ann', 'age': 19, 'email': '', 'major': 'Chemistry', 'year': 3, 'missed_hours': 8,
+            'grades-TOTAL_FORMS': 2, 'grades-INITIAL_FORMS': 1,
+            'grades-MIN_NUM_FORMS': 0, 'grades-MAX_NUM_FORMS': 1000,
+            'grades-0-id': grade.id, 'grades-0-subject': 'Math', 'grades-0-score': 90, 'grades-0-DELETE': 'on',
+            'grades-1-subject': 'Art', 'grades-1-score': 70,
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assert_matches_full_analysis()
+
+    def test_rebuild_command_fixes_drift(self):
+        StudentGrade.objects.filter(subject='Math').update(score=0)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_analytics_aggregates', '--check', stdout=StringIO())
+        call_command('rebuild_analytics_aggregates', stdout=StringIO())
+        call_command('rebuild_analytics_aggregates', '--check', stdout=StringIO())
+        self.assert_matches_full_analysis()
+
+    @override_settings(EOS_ANALYTICS_BACKEND='aggregates')
+    def test_engine_reads_aggregates(self):
+        results = AnalyticsEngine().run_analysis(Student.objects.all(), 'missed_hours')
+        self.assertEqual(results[MajorAnalytics.name]['result'], {'Math': 1, 'Physics': 1})
+        self.assertEqual(results['statistics']['sum'], 14)
+
+
+class AnalyticsEngineRegistryTest(TestCase):
+
+    def test_default_modules_registered_once_at_startup(self):
+        engine = AnalyticsEngine()
+        names = [module.name for module in engine.modules]
+        self.assertEqual(len(names), len(set(names)))
+        for module_class in (PerformanceAnalytics, MajorAnalytics, YearAttendanceAnalytics):
+            self.assertIn(module_class.name, names)
+
+    def test_repeated_registration_does_not_grow_modules(self):
+        engine = AnalyticsEngine()
+        count = len(engine.modules)
+        for _ in range(10000):
+            register_default_modules(engine)
+        self.assertEqual(len(engine.modules), count)
+
+    def test_requests_do_not_grow_modules(self):
+        engine = AnalyticsEngine()
+        count = len(engine.modules)
+        for _ in range(20):
+            self.client.get(reverse('run_analysis'))
+        self.assertEqual(len(engine.modules), count)
+
+    def test_concurrent_registration(self):
+        engine = AnalyticsEngine()
+        count = len(engine.modules)
+        threads = [Thread(target=register_default_modules, args=(engine,)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(engine.modules), count)
+
+    def test_engine_benchmark_does_not_grow_modules(self):
+        # Время запросов (last_to_first_ratio) проверяется запуском manage.py eos_benchmark, а не здесь
+        result = BENCHMARKS['engine_registry'](requests=20, window=5, students=5)
+        self.assertEqual(result['modules'], len(AnalyticsEngine().modules))
+        self.assertIn('last_to_first_ratio', result)
+
+
+class FailingAnalytics(AnalyticsModule):
+    name = "Ошибочный модуль"
+
+    def analyze_records(self, data):
+        raise RuntimeError('analysis failed')
+
+
+class ModuleExecutorTest(TestCase):
+
+    def setUp(self):
+        plot_strategy = BarPlotStrategy(xlabel='x', ylabel='y', title='t')
+        self.modules = [
+            PerformanceAnalytics(plot_strategy=plot_strategy),
+            FailingAnalytics(plot_strategy=plot_strategy),
+            MajorAnalytics(plot_strategy=plot_strategy),
+            YearAttendanceAnalytics(plot_strategy=plot_strategy),
+        ]
+        self.data = StudentColumns.from_records([
+            {"id": 1, "major": "Math", "year": 1, "missed_hours": 4,
+             "grades": [{"subject": "Math", "score": 85}, {"subject": "Science", "score": 90}]},
+            {"id": 2, "major": "Physics", "year": 2, "missed_hours": 10,
+             "grades": [{"subject": "Math", "score": 90}]},
+        ])
+
+    def analyze(self, executor):
+        with override_settings(EOS_ANALYTICS_EXECUTOR=executor):
+            return AnalyticsEngine().analyze_modules(self.data, self.modules)
+
+    def test_executors_keep_order_and_isolate_errors(self):
+        expected = self.analyze('serial')
+        self.assertEqual(list(expected), [module.name for module in self.modules])
+        self.assertIn('analysis failed', expected[FailingAnalytics.name]['error'])
+        self.assertEqual(expected[MajorAnalytics.name]['result'], {'Math': 1, 'Physics': 1})
+
+        for executor in ('thread', 'process'):
+            with self.subTest(executor=executor):
+                results = self.analyze(executor)
+                self.assertEqual(list(results), list(expected))
+                for name, result in results.items():
+                    self.assertEqual(result['result'], expected[name]['result'])
+                    self.assertEqual(bool(result['plot']), bool(expected[name]['plot']))
+                self.assertIn('analysis failed', results[FailingAnalytics.name]['error'])
+
+    def test_unknown_executor(self):
+        with self.assertRaises(ValueError):
+            self.analyze('gpu')
+
+
+class BarPlotStrategyTest(TestCase):
+
+    def test_plot_returns_png_without_leaking_figures(self):
+        import matplotlib.pyplot as plt
+        strategy = BarPlotStrategy(xlabel='x', ylabel='y', title='t')
+        image = base64.b64decode(strategy.plot({'Math': 87.5, 'Science': 95.0}))
+        self.assertTrue(image.startswith(b'\x89PNG'))
+        self.assertEqual(plt.get_fignums(), [])
+
+    def test_strategy_survives_pickling(self):
+        strategy = pickle.loads(pickle.dumps(BarPlotStrategy(xlabel='x', ylabel='y', title='t')))
+        self.assertTrue(strategy.plot({1: 10, 2: 20}))
+
+    def test_memory_stays_bounded(self):
+        result = BENCHMARKS['plot_memory'](plots=30, warmup=5)
+        self.assertLess(result['rss_growth_mb'], 20)
+
+    def test_worker_startup_skips_plotting_dependencies(self):
+        result = BENCHMARKS['startup'](runs=1)
+        self.assertEqual(result['heavy_modules_at_startup'], [])
+
+
+class ClientChartsTest(TestCase):
+
+    def setUp(self):
+        student = Student.objects.create(name='Ann', age=19, major='Math', year=1, missed_hours=4)
+        StudentGrade.objects.create(student=student, subject='Math', score=80)
+
+    def tearDown(self):
+        register_default_modules(AnalyticsEngine())
+
+    def test_chart_spec_strategy(self):
+        strategy = ChartSpecPlotStrategy(xlabel='x', ylabel='y', title='t')
+        self.assertEqual(strategy.plot({1: 10.5, 2: 20}), {
+            'type': 'bar', 'title': 't', 'xlabel': 'x', 'ylabel': 'y', 'labels': ['1', '2'], 'values': [10.5, 20],
+        })
+
+    @override_settings(EOS_PLOT_RENDERER='json')
+    def test_json_renderer_page_and_api(self):
+        register_default_modules(AnalyticsEngine())
+        response = self.client.get(reverse('run_analysis'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'analytics-chart')
+        self.assertNotContains(response, 'data:image/png')
+
+        response = self.client.get(reverse('analysis_api'))
+        payload = response.json()
+        modules = {module['name']: module for module in payload['modules']}
+        self.assertEqual(modules[PerformanceAnalytics.name]['result'], {'Math': 80.0})
+        self.assertEqual(modules[PerformanceAnalytics.name]['plot']['labels'], ['Math'])
+        self.assertEqual(payload['statistics']['sum'], 4)
+
+        response = self.client.get(reverse('analysis_api'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_png_renderer_api(self):
+        response = self.client.get(reverse('analysis_api'))
+        modules = {module['name']: module for module in response.json()['modules']}
+        self.assertEqual(modules[MajorAnalytics.name]['plot_format'], 'png')
+
+    def test_unknown_renderer(self):
+        with override_settings(EOS_PLOT_RENDERER='svg'), self.assertRaises(ValueError):
+            make_plot_strategy(xlabel='x', ylabel='y', title='t')
+
+
+class PlotStoreTest(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(EOS_PLOT_CACHE_ROOT=Path(directory.name))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_identical_charts_rendered_once(self):
+        store = PlotStore(min_age=0)
+        renders = []
+        digest = store.digest({'Math': 80.0}, ['x', 'y', 't'])
+        for _ in range(3):
+            store.get_or_render(digest, lambda: renders.append(1) or b'png')
+        self.assertEqual(len(renders), 1)
+        self.assertNotEqual(digest, store.digest({'Math': 81.0}, ['x', 'y', 't']))
+        self.assertNotEqual(digest, store.digest({'Math': 80.0}, ['x', 'y', 'other']))
+
+    def test_stored_strategy_serves_stable_url(self):
+        strategy = StoredBarPlotStrategy(xlabel='x', ylabel='y', title='t')
+        url = strategy.plot({'Math': 80.0})
+        self.assertEqual(url, strategy.plot({'Math': 80.0}))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'\x89PNG'))
+        self.assertEqual(self.client.get('/plots/' + '0' * 64 + '.png').status_code, 404)
+
+    def test_least_recently_used_files_evicted(self):
+        store = PlotStore(max_bytes=250, min_age=0)
+        digests = [store.digest({'key': index}, []) for index in range(3)]
+        for age, digest in enumerate(digests):
+            path = store.get_or_render(digest, lambda: b'x' * 100)
+            os.utime(path, (time.time() - 100 + age, time.time() - 100 + age))
+        store.get_or_render(digests[0], lambda: b'x' * 100)
+        store.get_or_render(store.digest({'key': 'new'}, []), lambda: b'x' * 100)
+        self.assertTrue(store.path(digests[0]).exists())
+        self.assertFalse(store.path(digests[1]).exists())
+        self.assertLessEqual(store.size(), 250)
+
+    def test_served_files_evicted_last(self):
+        store = PlotStore(max_bytes=250, min_age=0)
+        digests = [store.digest({'key': index}, []) for index in range(2)]
+        for digest in digests:
+            path = store.get_or_render(digest, lambda: b'x' * 100)
+            os.utime(path, (time.time() - 100, time.time() - 100))
+        self.assertEqual(self.client.get(store.url(digests[0])).status_code, 200)
+        store.get_or_render(store.digest({'key': 'new'}, []), lambda: b'x' * 100)
+        self.assertTrue(store.path(digests[0]).exists())
+        self.assertFalse(store.path(digests[1]).exists())
+
+    @override_settings(EOS_PLOT_RENDERER='url')
+    def test_job_result_restores_evicted_plots(self):
+        self.addCleanup(register_default_modules, AnalyticsEngine())
+        register_default_modules(AnalyticsEngine())
+        student = Student.objects.create(name='Ann', age=19, major='Math', year=1, missed_hours=4)
+        StudentGrade.objects.create(student=student, subject='Math', score=80)
+        results = json_results(AnalyticsEngine().run_analysis(Student.objects.all(), 'missed_hours', use_cache=False))
+        job = AnalysisJob.objects.create(column_name='missed_hours', key='restore', data_version=get_data_version(),
+                                         status=AnalysisJob.DONE, result=results)
+        url = results[PerformanceAnalytics.name]['plot']
+        store = PlotStore(min_age=0)
+        store.clear()
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+        status = job_status(job)
+        self.assertEqual(status['result'][PerformanceAnalytics.name]['plot'], url)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_cleanup_command(self):
+        store = PlotStore(min_age=0)
+        store.get_or_render(store.digest({'key': 1}, []), lambda: b'png')
+        call_command('cleanup_plot_cache', '--all', stdout=StringIO())
+        self.assertEqual(store.size(), 0)
+
+
+@override_settings(EOS_STUDENT_PAGE_SIZE=3)
+class StudentListPaginationTest(TestCase):
+
+    def setUp(self):
+        search.invalidate()
+        self.students = [
+            Student.objects.create(name=f'Student {index}', age=18, major='Math', year=1) for index in range(8)
+        ]
+
+    def names(self, response):
+        return [student.name for student in response.context['students']]
+
+    def test_walk_pages_forward_and_back(self):
+        response = self.client.get(reverse('student_list'))
+        self.assertEqual(self.names(response), ['Student 0', 'Student 1', 'Student 2'])
+        page = response.context['page']
+        self.assertFalse(page.has_previous)
+
+        pages = [self.names(response)]
+        while page.has_next:
+            response = self.client.get(reverse('student_list'), {'after': page.next_cursor})
+            page = response.context['page']
+            pages.append(self.names(response))
+        self.assertEqual(sum(pages, []), [student.name for student in self.students])
+        self.assertEqual(pages[-1], ['Student 6', 'Student 7'])
+
+        response = self.client.get(reverse('student_list'), {'before': page.previous_cursor})
+        self.assertEqual(self.names(response), ['Student 3', 'Student 4', 'Student 5'])
+        self.assertTrue(response.context['page'].has_next)
+
+    def test_page_size_parameter_and_search(self):
+        response = self.client.get(reverse('student_list'), {'size': 5, 'q': 'student'})
+        self.assertEqual(len(response.context['students']), 5)
+        self.assertContains(response, 'after=')
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('student_list'), {'after': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_descending_keyset_on_field(self):
+        paginator = KeysetPaginator(Student.objects.all(), 3, order_field='name', descending=True)
+        page = paginator.page()
+        self.assertEqual([student.name for student in page], ['Student 7', 'Student 6', 'Student 5'])
+        page = paginator.page(after=page.next_cursor)
+        self.assertEqual([student.name for student in page], ['Student 4', 'Student 3', 'Student 2'])
+        page = paginator.page(before=page.previous_cursor)
+        self.assertEqual([student.name for student in page], ['Student 7', 'Student 6', 'Student 5'])
+
+
+class StudentSearchTest(TestCase):
+
+    def setUp(self):
+        search.invalidate()
+        self.ivanov = Student.objects.create(name='Иванов Пётр', age=20, email='petr@example.com',
+                                             major='Физика', year=2)
+        self.petrov = Student.objects.create(name='Петров Иван', age=19, email='ivan.p@example.com',
+                                             major='Информатика', year=1)
+        self.smirnova = Student.objects.create(name='Смирнова Анна', age=21, email='anna@example.com',
+                                               major='Иванология', year=3)
+
+    def ids(self, query):
+        return search.StudentSearch().search_ids(query)
+
+    def test_prefix_search_ranks_name_above_email_and_major(self):
+        self.assertEqual(self.ids('иван'), [self.ivanov.id, self.petrov.id, self.smirnova.id])
+
+    def test_all_words_must_match(self):
+        self.assertEqual(self.ids('Иван физ'), [self.ivanov.id])
+        self.assertEqual(self.ids('анна физика'), [])
+
+    def test_typo_tolerance(self):
+        self.assertEqual(self.ids('Смирнва'), [self.smirnova.id])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.ids('иван')
+        self.smirnova.name = 'Кузнецова Анна'
+        self.smirnova.save()
+        self.assertEqual(self.ids('кузнецова'), [self.smirnova.id])
+        self.assertEqual(self.ids('смирнова'), [])
+        self.petrov.delete()
+        self.assertEqual(self.ids('петров'), [])
+
+    def test_substring_of_name_found_after_ranked_results(self):
+        john = Student.objects.create(name='John Smith', age=20, major='Math', year=1)
+        self.assertEqual(self.ids('ohn'), [john.id])
+        self.assertEqual(self.ids('ванов'), [self.ivanov.id])
+
+    def test_index_rebuilt_after_changes_in_another_process(self):
+        self.ids('иван')
+        # bulk_create не вызывает сигналов; другой процесс сообщает об изменениях только версией данных
+        Student.objects.bulk_create([Student(name='Кузнецов Олег', age=20, major='Физика', year=1)])
+        self.assertEqual(self.ids('кузнецов'), [])
+        DataVersion.objects.update(value=F('value') + 1)
+        self.assertEqual(len(self.ids('кузнецов')), 1)
+
+    def test_student_list_uses_ranked_search(self):
+        response = self.client.get(reverse('student_list'), {'q': 'иван', 'size': 2})
+        self.assertEqual(list(response.context['students']), [self.ivanov, self.petrov])
+        response = self.client.get(reverse('student_list'), {'q': 'иван', 'size': 2,
+                                                             'after': response.context['page'].next_cursor})
+        self.assertEqual(list(response.context['students']), [self.smirnova])
+        self.assertTrue(response.context['page'].has_previous)
+
+
+class StudentExportTest(TestCase):
+
+    def setUp(self):
+        self.students = [
+            Student.objects.create(name=f'Student {index}', age=18 + index, email=f's{index}@example.com',
+                                   major='Math', year=1 + index % 2) for index in range(5)
+        ]
+        for student in self.students[:4]:
+            StudentGrade.objects.create(student=student, subject='Math', score=80 + student.age)
+            StudentGrade.objects.create(student=student, subject='Physics', score=70.5)
+
+    def test_grades_loaded_once_per_chunk(self):
+        # Один запрос студентов и по одному запросу оценок на каждую порцию из двух студентов
+        with self.assertNumQueries(4):
+            chunks = list(StudentExporter(chunk_size=2).chunks())
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+        student, grades = chunks[0][0]
+        self.assertEqual(student['name'], 'Student 0')
+        self.assertEqual(grades, [('Math', 98.0), ('Physics', 70.5)])
+        self.assertEqual(chunks[2][0][1], [])
+
+    def test_csv_has_row_per_grade(self):
+        text = b''.join(StudentExporter(chunk_size=2).stream('csv')).decode('utf-8')
+        rows = list(csv.DictReader(text.splitlines()))
+        self.assertEqual(len(rows), 9)
+        self.assertEqual(rows[1]['subject'], 'Physics')
+        self.assertEqual((rows[-1]['name'], rows[-1]['subject'], rows[-1]['score']), ('Student 4', '', ''))
+
+    def test_jsonl_gzip_endpoint(self):
+        response = self.client.get(reverse('export_students'), {'format': 'jsonl', 'gzip': '1'})
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('students.jsonl.gz', response['Content-Disposition'])
+        lines = gzip.decompress(b''.join(response.streaming_content)).decode('utf-8').splitlines()
+        records = [json.loads(line) for line in lines]
+        self.assertEqual([record['id'] for record in records], [student.id for student in self.students])
+        self.assertEqual(records[0]['grades'], [{'subject': 'Math', 'score': 98.0},
+                                                {'subject': 'Physics', 'score': 70.5}])
+
+    def test_unknown_format(self):
+        response = self.client.get(reverse('export_students'), {'format': 'xml'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_command_writes_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'students.csv.gz')
+            call_command('export_students', '--gzip', '--output', path, stdout=StringIO())
+            with gzip.open(path, 'rt', encoding='utf-8') as file:
+                self.assertEqual(len(list(csv.DictReader(file))), 9)
+
+
+class StudentImportTest(TestCase):
+
+    def setUp(self):
+        search.invalidate()
+        self.records = [
+            {'name': 'Anna', 'age': 19, 'email': 'anna@example.com', 'major': 'Math', 'year': 1,
+             'grades': [{'subject': 'Math', 'score': 90}, {'subject': 'Physics', 'score': 70.5}]},
+            {'name': 'Bad', 'age': 'old', 'major': 'Math', 'year': 1, 'grades': [{'subject': 'Math'}]},
+            {'name': 'Boris', 'age': 20, 'major': 'Physics', 'year': 2, 'missed_hours': 4, 'grades': []},
+            {'name': 'Twice', 'age': 20, 'major': 'Physics', 'year': 2,
+             'grades': [{'subject': 'Math', 'score': 1}, {'subject': 'Math', 'score': 2}]},
+            {'name': 'Vera', 'age': 21, 'major': 'Math', 'year': 3, 'grades': [{'subject': 'Math', 'score': 60}]},
+        ]
+        self.source = '\n'.join(json.dumps(record) for record in self.records)
+
+    def job(self):
+        return StudentImport.objects.create(source='test', digest='test', format='jsonl')
+
+    @override_settings(EOS_ANALYTICS_BACKEND='aggregates')
+    def test_import_reports_row_errors(self):
+        job = StudentImporter(batch_size=2).run(self.source.splitlines(), self.job())
+        self.assertTrue(job.finished)
+        self.assertEqual((job.processed, job.students, job.grades, job.failed), (5, 3, 3, 2))
+        self.assertEqual([error['record'] for error in job.errors], [2, 4])
+        self.assertIn('age', job.errors[0]['errors'])
+        self.assertIn('grades[0].score', job.errors[0]['errors'])
+        self.assertIn('grades[1].subject', job.errors[1]['errors'])
+        self.assertEqual(list(Student.objects.order_by('id').values_list('name', 'missed_hours')),
+                         [('Anna', 0), ('Boris', 4), ('Vera', 0)])
+        self.assertEqual(AggregateStore().drift(), {})
+        self.assertEqual(search.StudentSearch().search_ids('vera'), [Student.objects.get(name='Vera').id])
+        self.assertEqual(list(StudentSummary.objects.order_by('student_id').values_list('gpa', 'major_rank')),
+                         [(80.25, 1), (None, None), (60.0, 2)])
+
+    def test_resume_after_failure(self):
+        job = self.job()
+
+        def failing_lines():
+            yield from self.source.splitlines()[:3]
+            raise OSError('обрыв соединения')
+
+        with self.assertRaises(OSError):
+            StudentImporter(batch_size=1).run(failing_lines(), job)
+        job.refresh_from_db()
+        self.assertFalse(job.finished)
+        self.assertEqual(job.processed, 3)
+        self.assertEqual(Student.objects.count(), 2)
+
+        StudentImporter(batch_size=1).run(self.source.splitlines(), job)
+        self.assertEqual(list(Student.objects.order_by('id').values_list('name', flat=True)),
+                         ['Anna', 'Boris', 'Vera'])
+        self.assertEqual(job.failed, 2)
+
+    def test_csv_export_round_trip_through_endpoint(self):
+        StudentImporter().run(self.source.splitlines(), self.job())
+        exported = b''.join(StudentExporter().stream('csv', compress=True))
+        upload = SimpleUploadedFile('students.csv.gz', exported)
+        response = self.client.post(reverse('import_students'), {'file': upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['students'], 3)
+        self.assertEqual(StudentGrade.objects.count(), 6)
+
+        upload = SimpleUploadedFile('students.csv.gz', exported)
+        response = self.client.post(reverse('import_students'), {'file': upload})
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(EOS_IMPORT_MAX_UPLOAD_BYTES=10)
+    def test_endpoint_rejects_large_files(self):
+        upload = SimpleUploadedFile('students.jsonl', self.source.encode('utf-8'))
+        response = self.client.post(reverse('import_students'), {'file': upload})
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(StudentImport.objects.exists())
+
+    def test_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'students.jsonl')
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write(self.source)
+            out, err = StringIO(), StringIO()
+            call_command('import_students', path, '--batch-size', '2', stdout=out, stderr=err)
+        self.assertIn('студентов 3', out.getvalue())
+        self.assertIn('Запись 2', err.getvalue())
+
+
+@override_settings(EOS_ANALYTICS_BACKEND='aggregates')
+class GradeFormSetBatchSaveTest(TestCase):
+
+    def setUp(self):
+        self.student = Student.objects.create(name='Ann', age=19, major='Math', year=1)
+
+    def create_grades(self, count):
+        for index in range(count):
+            StudentGrade.objects.create(student=self.student, subject=f'Subject {index}', score=50 + index)
+        return list(self.student.grades.order_by('id'))
+
+    def formset(self, grades, changes, extra=None, valid=True):
+        """changes: индекс -> новый балл или 'delete'; extra — (дисциплина, балл) новой оценки."""
+        data = {
+            'grades-TOTAL_FORMS': len(grades) + 1, 'grades-INITIAL_FORMS': len(grades),
+            'grades-MIN_NUM_FORMS': 0, 'grades-MAX_NUM_FORMS': 1000,
+        }
+        for index, grade in enumerate(grades):
+            change = changes.get(index)
+            data.update({
+                f'grades-{index}-id': grade.id, f'grades-{index}-student': self.student.id,
+                f'grades-{index}-subject': grade.subject,
+                f'grades-{index}-score': change if change not in (None, 'delete') else grade.score,
+            })
+            if change == 'delete':
+                data[f'grades-{index}-DELETE'] = 'on'
+        if extra:
+            data[f'grades-{len(grades)}-subject'], data[f'grades-{len(grades)}-score'] = extra
+        formset = StudentGradeFormSet(data, instance=self.student)
+        self.assertEqual(formset.is_valid(), valid, formset.errors)
+        return formset
+
+    def test_query_count_does_not_depend_on_rows(self):
+        for count in (4, 40):
+            StudentGrade.objects.all().delete()
+            grades = self.create_grades(count)
+            changes = {index: 10 + index for index in range(0, count, 2)}
+            changes.update({1: 'delete', 3: 'delete'})
+            formset = self.formset(grades, changes, extra=('Art', 99))
+            # Удаление, bulk_update и bulk_create оценок, чтение, пересчёт границ, обновление,
+            # удаление и создание агрегатов, версия данных в базе, плюс точки сохранения транзакций
+            with self.assertNumQueries(15):
+                formset.save()
+            self.assertEqual(self.student.grades.count(), count - 1)
+            self.assertEqual(StudentGrade.objects.get(pk=grades[2].pk).score, 12)
+            self.assertEqual(len(formset.changed_objects), count // 2)
+            self.assertEqual(AggregateStore().drift(), {})
+
+    def test_delete_query_count_does_not_depend_on_rows(self):
+        for count in (2, 20):
+            StudentGrade.objects.all().delete()
+            grades = self.create_grades(24)
+            formset = self.formset(grades, {index: 'delete' for index in range(count)})
+            # Удаление одним запросом без сигналов, чтение и удаление строк агрегатов, версия данных,
+            # плюс точки сохранения транзакций
+            with self.assertNumQueries(8):
+                formset.save()
+            self.assertEqual(self.student.grades.count(), 24 - count)
+            self.assertEqual(len(formset.deleted_objects), count)
+            self.assertEqual(AggregateStore().drift(), {})
+
+    def test_duplicate_subject_is_rejected(self):
+        grades = self.create_grades(2)
+        formset = self.formset(grades, {}, extra=('Subject 1', 70), valid=False)
+        self.assertTrue(formset.errors[2])
+        self.assertEqual(self.student.grades.count(), 2)
+
+    def test_unchanged_forms_are_skipped(self):
+        grades = self.create_grades(5)
+        formset = self.formset(grades, {})
+        with self.assertNumQueries(0):
+            formset.save()
+        self.assertEqual(formset.changed_objects, [])
+
+
+@override_settings(EOS_ANALYSIS_MODE='queue')
+class AnalysisJobQueueTest(TestCase):
+
+    def setUp(self):
+        student = Student.objects.create(name='Ann', age=19, major='Math', year=1, missed_hours=4)
+        StudentGrade.objects.create(student=student, subject='Math', score=80)
+
+    def run_worker(self):
+        call_command('analysis_worker', '--once', stdout=StringIO())
+
+    def test_identical_requests_share_one_job(self):
+        first = AnalysisQueue().submit()
+        self.assertEqual(AnalysisQueue().submit().pk, first.pk)
+        response = self.client.post(reverse('submit_analysis'))
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['job'], first.pk)
+        self.assertEqual(AnalysisJob.objects.count(), 1)
+
+        # Одно задание забирает только один воркер
+        self.assertEqual(AnalysisQueue.claim('a').pk, first.pk)
+        self.assertIsNone(AnalysisQueue.claim('b'))
+        self.assertEqual(AnalysisQueue().submit().pk, first.pk)
+
+    def test_page_polls_then_shows_result(self):
+        response = self.client.get(reverse('run_analysis'))
+        self.assertContains(response, 'analysis-job')
+        self.assertNotContains(response, 'data:image/png')
+        job = AnalysisJob.objects.get()
+
+        self.run_worker()
+        status = self.client.get(reverse('analysis_job', args=[job.pk])).json()
+        self.assertEqual(status['status'], AnalysisJob.DONE)
+        self.assertEqual(status['result']['statistics']['sum'], 4)
+        self.assertEqual(status['result'][MajorAnalytics.name]['result'], {'Math': 1})
+
+        response = self.client.get(reverse('run_analysis'))
+        self.assertNotContains(response, 'analysis-job')
+        self.assertContains(response, 'data:image/png')
+        self.assertEqual(AnalysisJob.objects.count(), 1)
+
+        # После изменения данных ставится новое задание, а страница показывает прежний результат
+        Student.objects.create(name='Bob', age=20, major='Physics', year=2, missed_hours=6)
+        response = self.client.get(reverse('run_analysis'))
+        self.assertContains(response, 'последний готовый результат')
+        self.assertContains(response, 'data:image/png')
+        self.run_worker()
+        self.assertEqual(AnalysisQueue().latest().result['statistics']['sum'], 10)
+
+    def test_failed_and_stale_jobs(self):
+        job = AnalysisQueue().submit()
+        with mock.patch.object(AnalyticsEngine, 'run_analysis', side_effect=RuntimeError('сбой')):
+            self.run_worker()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), (AnalysisJob.FAILED, 'сбой'))
+        # Неудачное задание не переиспользуется
+        retry = AnalysisQueue().submit()
+        self.assertNotEqual(retry.pk, job.pk)
+
+        AnalysisQueue.claim('stopped-worker')
+        AnalysisJob.objects.filter(pk=retry.pk).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+        self.run_worker()
+        retry.refresh_from_db()
+        self.assertEqual(retry.status, AnalysisJob.DONE)
+
+        AnalysisJob.objects.update(finished_at=timezone.now() - timedelta(days=2))
+        self.assertEqual(AnalysisQueue.prune(), 1)
+        self.assertEqual(list(AnalysisJob.objects.values_list('pk', flat=True)), [retry.pk])
+
+    def test_running_job_with_heartbeat_is_not_requeued(self):
+        job = AnalysisQueue().submit()
+        AnalysisQueue.claim('a')
+        AnalysisJob.objects.filter(pk=job.pk).update(started_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(AnalysisQueue.requeue_stale(), 0)
+
+        # Задание, переданное другому воркеру, не перезаписывается результатом прежнего
+        job.refresh_from_db()
+        AnalysisJob.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(AnalysisQueue.requeue_stale(), 1)
+        AnalysisQueue.claim('b')
+        AnalysisQueue.run(job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker, job.result), (AnalysisJob.RUNNING, 'b', None))
+
+    def test_job_key_does_not_depend_on_process_cache(self):
+        job = AnalysisQueue().submit()
+        # Кэш другого процесса не знает версии данных из этого
+        get_cache().clear()
+        self.assertEqual(AnalysisQueue().submit().pk, job.pk)
+        StudentGrade.objects.update(score=90)
+        Student.objects.get().save()
+        self.assertNotEqual(AnalysisQueue().submit().pk, job.pk)
+
+    def test_queue_mode_requires_shared_cache(self):
+        self.assertEqual([error.id for error in check_analysis_queue_cache(None)], ['eos.E001'])
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+                              'LOCATION': 'redis://localhost:6379'}}
+        with override_settings(CACHES=shared):
+            self.assertEqual(check_analysis_queue_cache(None), [])
+        with override_settings(EOS_ANALYSIS_MODE='sync'):
+            self.assertEqual(check_analysis_queue_cache(None), [])
+
+
+class QueryPlanTest(TestCase):
+
+    def test_analysis_queries_use_indexes(self):
+        result = BENCHMARKS['query_plans'](students=50, grades_per_student=3)
+        # Оценки куба читаются по индексу (student, subject), а не просмотром таблицы
+        grades = result['analysis_sql'][1]
+        self.assertIn('eos_studentgrade', grades['sql'])
+        self.assertTrue(any('eos_studentgrade USING' in line and 'INDEX' in line for line in grades['plan']))
+        self.assertEqual(result['analysis_major'][0]['full_scans'], [])
+        self.assertTrue(all(query['plan'] for query in result['view_student']))
+
+
+class StudentSummaryTest(TestCase):
+
+    def setUp(self):
+        search.invalidate()
+        self.ann = Student.objects.create(name='Ann', age=19, major='Math', year=1)
+        self.bob = Student.objects.create(name='Bob', age=20, major='Math', year=2)
+        self.eve = Student.objects.create(name='Eve', age=21, major='Physics', year=3)
+
+    def add_grade(self, student, subject, score):
+        with self.captureOnCommitCallbacks(execute=True):
+            return StudentGrade.objects.create(student=student, subject=subject, score=score)
+
+    def summary(self, student):
+        return StudentSummary.objects.get(student=student)
+
+    def test_grade_changes_refresh_summary_and_ranks(self):
+        self.add_grade(self.ann, 'Math', 70)
+        grade = self.add_grade(self.ann, 'History', 90)
+        self.add_grade(self.bob, 'Math', 85)
+        summary = self.summary(self.ann)
+        self.assertEqual((summary.gpa, summary.grades), (80.0, 2))
+        self.assertEqual((summary.best_subject, summary.best_score), ('History', 90))
+        self.assertEqual((summary.worst_subject, summary.worst_score), ('Math', 70))
+        self.assertEqual((summary.major_rank, self.summary(self.bob).major_rank), (2, 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            grade.score = 100
+            grade.save()
+        self.assertEqual((self.summary(self.ann).gpa, self.summary(self.ann).major_rank), (85.0, 1))
+        self.assertEqual(self.summary(self.bob).major_rank, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            grade.delete()
+        self.assertEqual(self.summary(self.ann).gpa, 70.0)
+        self.assertEqual(self.summary(self.bob).major_rank, 1)
+
+    def test_major_change_moves_rank(self):
+        self.add_grade(self.ann, 'Math', 70)
+        self.add_grade(self.eve, 'Math', 90)
+        self.assertEqual(self.summary(self.ann).major_rank, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ann.major = 'Physics'
+            self.ann.save()
+        self.assertEqual((self.summary(self.ann).major_rank, self.summary(self.eve).major_rank), (2, 1))
+
+    def test_list_sorted_and_filtered_by_gpa(self):
+        for student, score in ((self.ann, 60), (self.bob, 90), (self.eve, 75)):
+            self.add_grade(student, 'Math', score)
+        url = reverse('student_list')
+        response = self.client.get(url, {'sort': '-gpa', 'size': 2})
+        self.assertEqual([student.name for student in response.context['students']], ['Bob', 'Eve'])
+        self.assertContains(response, 'sort=-gpa')
+        response = self.client.get(url, {'sort': '-gpa', 'size': 2, 'after': response.context['page'].next_cursor})
+        self.assertEqual([student.name for student in response.context['students']], ['Ann'])
+
+        response = self.client.get(url, {'gpa_min': 70, 'sort': 'gpa'})
+        self.assertEqual([student.name for student in response.context['students']], ['Eve', 'Bob'])
+        self.assertEqual(self.client.get(url, {'gpa_min': 'abc'}).status_code, 404)
+
+        # Фильтр и сортировка действуют и на результаты поиска
+        response = self.client.get(url, {'q': 'math', 'gpa_min': 70})
+        self.assertEqual([student.name for student in response.context['students']], ['Bob'])
+        response = self.client.get(url, {'q': 'math', 'sort': '-gpa'})
+        self.assertEqual([student.name for student in response.context['students']], ['Bob', 'Ann'])
+
+        response = self.client.get(reverse('view_student', args=[self.bob.pk]))
+        self.assertContains(response, 'место в специальности: 1')
+
+    def test_rebuild_command(self):
+        StudentGrade.objects.bulk_create([StudentGrade(student=self.ann, subject='Math', score=50)])
+        StudentSummary.objects.all().delete()
+        call_command('rebuild_student_summaries', stdout=StringIO())
+        self.assertEqual(self.summary(self.ann).gpa, 50.0)
+        self.assertIsNone(self.summary(self.bob).gpa)
+        self.assertIsNone(self.summary(self.bob).major_rank)
+
+        StudentSummary.objects.filter(student=self.ann).update(major_rank=5)
+        self.assertEqual(StudentSummaryStore().refresh_ranks(['Math']), 1)
+        self.assertEqual(self.summary(self.ann).major_rank, 1)
+
+    def test_ranks_written_by_one_query(self):
+        carl = Student.objects.create(name='Carl', age=22, major='Math', year=3)
+        StudentGrade.objects.bulk_create([StudentGrade(student=student, subject='Math', score=score)
+                                          for student, score in ((self.ann, 80), (self.bob, 90), (carl, 80))])
+        StudentSummaryStore().refresh([self.ann.pk, self.bob.pk, carl.pk, self.eve.pk], ranks=False)
+        StudentSummary.objects.filter(student=self.eve).update(major_rank=3)
+        with self.assertNumQueries(1):
+            self.assertEqual(StudentSummaryStore().refresh_ranks(), 4)
+        ranks = dict(StudentSummary.objects.values_list('student__name', 'major_rank'))
+        self.assertEqual(ranks, {'Ann': 2, 'Bob': 1, 'Carl': 2, 'Eve': None})
+        with self.assertNumQueries(1):
+            self.assertEqual(StudentSummaryStore().refresh_ranks(['Math']), 0)
+
+    def test_sort_link_keeps_search_and_filters(self):
+        self.add_grade(self.ann, 'Math', 80)
+        response = self.client.get(reverse('student_list'), {'q': 'math', 'gpa_min': 70, 'size': 5})
+        self.assertContains(response, 'href="?q=math&amp;gpa_min=70&sort=-gpa&size=5"')
+
+
+@override_settings(EOS_PROFILING_SAMPLE_RATE=1, EOS_ANALYTICS_EXECUTOR='serial')
+class ProfilingMiddlewareTest(TestCase):
+
+    def setUp(self):
+        METRICS.reset()
+        self.student = Student.objects.create(name='Ann', age=19, major='Math', year=1, missed_hours=4)
+        StudentGrade.objects.create(student=self.student, subject='Math', score=80)
+
+    def timings(self, response):
+        return dict(entry.split(';', 1) for entry in response['Server-Timing'].split(', '))
+
+    def test_server_timing_and_metrics(self):
+        response = self.client.get(reverse('view_student', args=[self.student.pk]))
+        timings = self.timings(response)
+        self.assertIn('queries"', timings['db'])
+        self.assertIn('template', timings)
+        self.assertIn('total', timings)
+
+        timings = self.timings(self.client.get(reverse('run_analysis')))
+        self.assertIn('analyze.PerformanceAnalytics', timings)
+        self.assertIn('plot.PerformanceAnalytics', timings)
+
+        metrics = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('eos_requests_total{view="view_student",method="GET",status="200"} 1', metrics)
+        self.assertIn('eos_request_duration_seconds_count{view="run_analysis"} 1', metrics)
+        self.assertIn('eos_stage_duration_seconds_total{view="run_analysis",stage="plot.MajorAnalytics"}', metrics)
+
+    @override_settings(EOS_PROFILING_SAMPLE_RATE=0)
+    def test_unsampled_requests_only_record_duration(self):
+        response = self.client.get(reverse('student_list'))
+        self.assertEqual(list(self.timings(response)), ['total'])
+        metrics = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('eos_request_duration_seconds_count{view="student_list"} 1', metrics)
+        self.assertNotIn('eos_db_queries_total{view="student_list"}', metrics)
+
+    @override_settings(EOS_SLOW_REQUEST_MS=0)
+    def test_slow_requests_are_logged(self):
+        with self.assertLogs('eos.profiling', 'WARNING') as logs:
+            self.client.get(reverse('student_list'))
+        self.assertIn('student_list', logs.output[0])
+        self.assertIn('eos_slow_requests_total{view="student_list"} 1', METRICS.render())
+
+    @override_settings(EOS_METRICS_TOKEN='secret')
+    def test_metrics_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+
+
+class BenchmarkSuiteTest(TestCase):
+
+    def test_generate_students_is_reproducible(self):
+        call_command('generate_students', '--students', '30', '--grades', '3', '--seed', '7', stdout=StringIO())
+        first = list(Student.objects.order_by('id').values_list('name', 'age', 'major', 'missed_hours'))
+        call_command('generate_students', '--students', '30', '--grades', '3', '--seed', '7', '--clear',
+                     stdout=StringIO())
+        self.assertEqual(list(Student.objects.order_by('id').values_list('name', 'age', 'major', 'missed_hours')),
+                         first)
+        self.assertEqual(StudentGrade.objects.count(), 90)
+        self.assertEqual(StudentSummary.objects.filter(gpa__isnull=False).count(), 30)
+        self.assertEqual(AggregateStore().drift(), {})
+        with self.assertRaises(CommandError):
+            call_command('generate_students', '--grades', '100', stdout=StringIO())
+
+    def test_compare_reports_regressions(self):
+        baseline = {'students': 10, 'page_ms': 10.0, 'small_ms': 0.1, 'peak_mb': 50, 'ratio': 1.0}
+        result = {'students': 10, 'page_ms': 13.0, 'small_ms': 0.5, 'peak_mb': 55, 'ratio': 9.0}
+        self.assertEqual(compare(baseline, result), {'page_ms': (10.0, 13.0)})
+        self.assertEqual(compare(baseline, result, tolerance=50), {})
+
+    def test_pipeline_against_baseline(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'baseline.json')
+            args = ['eos_benchmark', 'pipeline', '--param', 'students=20', '--param', 'repeat=1']
+            call_command(*args, '--output', path, stdout=StringIO())
+            with open(path, encoding='utf-8') as file:
+                report = json.load(file)
+            self.assertIn('page_student_list_ms', report['result'])
+            self.assertIn('plot_MajorAnalytics_ms', report['result'])
+
+            report['result']['page_student_list_ms'] = 0.0
+            with open(path, 'w', encoding='utf-8') as file:
+                json.dump(report, file)
+            with self.assertRaises(CommandError):
+                call_command(*args, '--baseline', path, stdout=StringIO(), stderr=StringIO())
+
+
+class OlapCubeTest(TestCase):
+
+    def setUp(self):
+        ann = Student.objects.create(name='Ann', age=19, major='Math', year=1, missed_hours=4)
+        bob = Student.objects.create(name='Bob', age=20, major='Physics', year=2, missed_hours=10)
+        eve = Student.objects.create(name='Eve', age=21, major='Math', year=2, missed_hours=6)
+        StudentGrade.objects.bulk_create([
+            StudentGrade(student=ann, subject='Math', score=80),
+            StudentGrade(student=ann, subject='History', score=70),
+            StudentGrade(student=bob, subject='Math', score=100),
+            StudentGrade(student=eve, subject='Math', score=60),
+        ])
+
+    def test_queryset_cube_matches_in_memory_cube(self):
+        students = Student.objects.all()
+        cube = OlapCube.from_queryset(students)
+        expected = OlapCube.from_columns(AnalyticsEngine().generate_student_data(students))
+        for fact in ('students', 'grades'):
+            self.assertEqual(list(cube.cells(fact).items()), list(expected.cells(fact).items()))
+        self.assertEqual(cube.rollup('score', by=['major', 'year']),
+                         {('Math', 1): 75.0, ('Physics', 2): 100.0, ('Math', 2): 60.0})
+        filtered = OlapCube.from_queryset(students.filter(year=2))
+        self.assertEqual(filtered.rollup('grades', by=['subject']), {'Math': 2})
+
+    def test_cube_is_cached_until_data_changes(self):
+        CubeStore().cube()
+        with self.assertNumQueries(1):
+            cube = CubeStore().cube()
+        self.assertEqual(cube.rollup('students', by=['major']), {'Math': 2, 'Physics': 1})
+        Student.objects.create(name='Kim', age=22, major='Physics', year=3)
+        self.assertEqual(CubeStore().cube().rollup('students', by=['major']), {'Math': 2, 'Physics': 2})
+
+    def test_cube_failure_becomes_module_errors(self):
+        with mock.patch.object(AnalyticsEngine, 'build_cube', side_effect=RuntimeError('нет куба')):
+            results = AnalyticsEngine().run_analysis(Student.objects.all(), 'missed_hours', use_cache=False)
+        for module_class in (PerformanceAnalytics, MajorAnalytics, YearAttendanceAnalytics):
+            self.assertEqual(results[module_class.name]['error'], 'нет куба')
+        self.assertEqual(results['statistics']['sum'], 20)
+
+    def test_cube_view(self):
+        response = self.client.get(reverse('analysis_cube'), {'measure': 'score', 'by': 'subject', 'year': '2'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['rows'], [{'subject': 'Math', 'value': 80.0}])
+        response = self.client.get(reverse('analysis_cube'), {'measure': 'students', 'major': 'Math'})
+        self.assertEqual(response.json()['rows'], [{'value': 2}])
+        for params in ({'measure': 'height'}, {'measure': 'students', 'by': 'subject'}, {'year': 'first'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(reverse('analysis_cube'), params).status_code, 400)
@@ -1,12 +1,20 @@
 # eos/urls.py
 
-from django.urls import path
+from django.urls import path, re_path
 from . import views
 
 urlpatterns = [
     path('', views.student_list, name='student_list'),
     path('analysis/', views.run_analysis, name='run_analysis'),
+    path('analysis/api/', views.analysis_api, name='analysis_api'),
+    path('analysis/cube/', views.analysis_cube, name='analysis_cube'),
+    path('analysis/jobs/', views.submit_analysis, name='submit_analysis'),
+    path('analysis/jobs/<int:job_id>/', views.analysis_job, name='analysis_job'),
+    re_path(r'^plots/(?P<digest>[0-9a-f]{64})\.png$', views.plot_image, name='plot_image'),
+    path('export/', views.export_students, name='export_students'),
+    path('import/', views.import_students, name='import_students'),
     path('create/', views.create_student, name='create_student'),
     path('edit/<int:student_id>/', views.edit_student, name='edit_student'),
     path('view/<int:student_id>/', views.view_student, name='view_student'),
+    path('metrics', views.metrics, name='metrics'),
 ]
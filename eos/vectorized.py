@@ -0,0 +1,76 @@
+# vectorized.py
+
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def factorize(values: Sequence) -> Tuple[np.ndarray, List]:
+    """Кодирует значения целыми кодами в порядке первого появления.
+
+    Возвращает массив кодов и список уникальных значений (в виде обычных
+    Python-объектов), так что uniques[codes[i]] == values[i].
+    """
+    array = np.asarray(values)
+    if array.size == 0:
+        return np.empty(0, dtype=np.intp), []
+
+    uniques, first_index, inverse = np.unique(array, return_index=True, return_inverse=True)
+    order = np.argsort(first_index, kind='stable')
+    rank = np.empty_like(order)
+    rank[order] = np.arange(order.size)
+    return rank[inverse.reshape(-1)], uniques[order].tolist()
+
+
+# Числа, кратные 2**-10, складываются без округления, пока сумма модулей меньше 2**43
+EXACT_SCALE = 1024.0
+EXACT_LIMIT = 2.0 ** 53 / EXACT_SCALE
+
+
+def exact_sums(codes: np.ndarray, weights: np.ndarray, sums: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Суммы по группам, не зависящие от порядка сложения: (округлённая сумма, ошибка округления).
+
+    sums — суммы bincount (последовательные в порядке строк). Для целых и
+    двоичных дробей вроде 70.5 они уже точны; иначе каждая группа
+    складывается math.fsum, а ошибка — разность точной и округлённой
+    сумм, так что объединение групп (GroupedMoments.merge) тоже точно.
+    """
+    scaled = weights * EXACT_SCALE
+    if np.abs(weights).sum() < EXACT_LIMIT and np.array_equal(scaled, np.floor(scaled)):
+        return sums, np.zeros(len(sums))
+    order = np.argsort(codes, kind='stable')
+    ends = np.cumsum(np.bincount(codes, minlength=len(sums))).tolist()
+    values = weights[order]
+    totals, errors = np.empty(len(sums)), np.empty(len(sums))
+    start = 0
+    for index, end in enumerate(ends):
+        part = values[start:end].tolist()
+        totals[index] = math.fsum(part)
+        part.append(-totals[index])
+        errors[index] = math.fsum(part)
+        start = end
+    return totals, errors
+
+
+def grouped_moments(keys: Sequence, values: Optional[Sequence] = None) -> Dict:
+    """Количество, сумма, минимум и максимум по ключам: ключ -> [count, total, minimum, maximum, error].
+
+    error — ошибка округления total (см. exact_sums). Без values считается
+    только количество (сумма и границы равны количеству и 1).
+    """
+    codes, uniques = factorize(keys)
+    counts = np.bincount(codes, minlength=len(uniques))
+    if values is None:
+        return {key: [count, count, 1, 1, 0] for key, count in zip(uniques, counts.tolist())}
+    weights = np.asarray(values, dtype=np.float64)
+    sums, errors = exact_sums(codes, weights, np.bincount(codes, weights=weights, minlength=len(uniques)))
+    minimums = np.full(len(uniques), np.inf)
+    maximums = np.full(len(uniques), -np.inf)
+    np.minimum.at(minimums, codes, weights)
+    np.maximum.at(maximums, codes, weights)
+    return {
+        key: [count, total, minimum, maximum, error]
+        for key, count, total, minimum, maximum, error in zip(
+            uniques, counts.tolist(), sums.tolist(), minimums.tolist(), maximums.tolist(), errors.tolist())
+    }
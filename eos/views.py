@@ -1,35 +1,237 @@
 # views.py
 
+import gzip
+import io
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.db import transaction
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, \
+    JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_POST
 from django.forms import inlineformset_factory
-from .models import Student, StudentGrade
+from .models import AnalysisJob, Student, StudentGrade
 from .forms import StudentForm, StudentEditForm, StudentGradeForm, StudentGradeFormSet
-from .analytics import AnalyticsEngine, PerformanceAnalytics, MajorAnalytics, YearAttendanceAnalytics, BarPlotStrategy
-from .analytics_service import AnalyticsService
+from .analytics import AnalyticsEngine
+from .cache import get_data_version
+from .cube import DIMENSIONS, CubeStore
+from .export import EXPORT_FORMATS, StudentExporter
+from .jobs import AnalysisQueue, job_status, json_results, restore_plots
+from .importer import IMPORT_FORMATS, InvalidImport, StudentImporter, file_digest, report
+from .pagination import InvalidCursor, KeysetPaginator, SequencePaginator
+from .plot_store import IMMUTABLE_CACHE_CONTROL, PlotStore
+from .profiling import METRICS
+from .search import StudentSearch
+
+def _page_size(request):
+    default = getattr(settings, 'EOS_STUDENT_PAGE_SIZE', 50)
+    maximum = getattr(settings, 'EOS_STUDENT_PAGE_SIZE_MAX', 200)
+    try:
+        size = int(request.GET.get('size', default))
+    except ValueError:
+        size = default
+    return min(max(size, 1), maximum)
+
+# Сортировка списка студентов: параметр ?sort= -> (поле, по убыванию)
+STUDENT_SORTS = {
+    'id': ('id', False),
+    'gpa': ('summary__gpa', False),
+    '-gpa': ('summary__gpa', True),
+}
+
+def _gpa_filters(request):
+    filters = {}
+    for param, lookup in (('gpa_min', 'summary__gpa__gte'), ('gpa_max', 'summary__gpa__lte')):
+        value = request.GET.get(param)
+        if value:
+            try:
+                filters[lookup] = float(value)
+            except ValueError:
+                raise Http404(f"Некорректное значение {param}.")
+    return filters
 
 def student_list(request):
-    query = request.GET.get('q')
-    if query:
-        if query.isdigit():
-            students = Student.objects.filter(id=query)
-        else:
-            students = Student.objects.filter(name__icontains=query)
+    query = (request.GET.get('q') or '').strip()
+    size = _page_size(request)
+    sort = request.GET.get('sort', 'id')
+    if sort not in STUDENT_SORTS:
+        sort = 'id'
+    gpa_filters = _gpa_filters(request)
+    order_field, descending = STUDENT_SORTS[sort]
+    students = Student.objects.select_related('summary')
+    if query and not query.isdigit():
+        # Результаты поиска упорядочены по релевантности, а не по id
+        ids = StudentSearch().search_ids(query)
+        if order_field != 'id' or gpa_filters:
+            # Фильтр и сортировка по среднему баллу применяются к найденным студентам до разбиения на страницы
+            gpas = dict(Student.objects.filter(id__in=ids, summary__gpa__isnull=False, **gpa_filters)
+                        .values_list('id', 'summary__gpa'))
+            ids = [student_id for student_id in ids if student_id in gpas]
+            if order_field != 'id':
+                ids.sort(key=gpas.get, reverse=descending)
+        paginator = SequencePaginator(ids, size)
     else:
-        students = Student.objects.all()
-    return render(request, 'eos/index.html', {'students': students})
+        if query:
+            students = students.filter(id=query)
+        if order_field != 'id' or gpa_filters:
+            # Сортировка и фильтр по среднему баллу используют индекс сводок; студенты без оценок не показываются
+            students = students.filter(summary__gpa__isnull=False, **gpa_filters)
+        paginator = KeysetPaginator(students, size, order_field=order_field, descending=descending)
+
+    try:
+        page = paginator.page(after=request.GET.get('after'), before=request.GET.get('before'))
+    except InvalidCursor:
+        raise Http404('Некорректная страница.')
+    if isinstance(paginator, SequencePaginator):
+        found = students.in_bulk(page.objects)
+        page.objects = [found[student_id] for student_id in page.objects if student_id in found]
+    filters = {key: request.GET[key] for key in ('gpa_min', 'gpa_max') if request.GET.get(key)}
+    # Ссылка сортировки сохраняет поиск и фильтры, ссылки страниц — ещё и сортировку
+    sort_filters = {'q': query, **filters} if query else filters
+    if sort != 'id':
+        filters = {**filters, 'sort': sort}
+    return render(request, 'eos/index.html', {
+        'students': page.objects, 'page': page, 'query': query, 'size': size, 'sort': sort,
+        'filters': urlencode(filters), 'sort_filters': urlencode(sort_filters),
+    })
+
+def _client_charts(analysis_results):
+    return any(
+        result.get('plot_format') == 'json' for module, result in analysis_results.items() if module != 'statistics'
+    )
 
 def run_analysis(request):
+    if getattr(settings, 'EOS_ANALYSIS_MODE', 'sync') == 'queue':
+        return _queued_analysis(request)
     students = Student.objects.all()
+    # Модули регистрируются один раз при запуске приложения (ShopConfig.ready)
     engine = AnalyticsEngine()
-    engine.register_module(PerformanceAnalytics(plot_strategy=BarPlotStrategy(
-            xlabel='Дисциплина', ylabel='Средний балл', title='Средний балл по дисциплинам')))
-    engine.register_module(MajorAnalytics(plot_strategy=BarPlotStrategy(
-            xlabel="Направления", ylabel="Количество студентов", title="Распределение студентов по направлениям")))
-    engine.register_module(YearAttendanceAnalytics(plot_strategy=BarPlotStrategy(
-            xlabel='Курс обучения', ylabel='Пропущенные часы', title='Анализ посещаемости по годам обучения (среднее значение)')))
 
     analysis_results = engine.run_analysis(students, 'missed_hours')
-    return render(request, 'eos/analysis_results.html', {'results': analysis_results})
+    return render(request, 'eos/analysis_results.html',
+                  {'results': analysis_results, 'client_charts': _client_charts(analysis_results)})
+
+def _queued_analysis(request):
+    # Анализ выполняет analysis_worker; пока задание в очереди, показывается последний готовый результат
+    queue = AnalysisQueue('missed_hours')
+    job = queue.submit()
+    shown = job if job.status == AnalysisJob.DONE else queue.latest()
+    analysis_results = restore_plots(shown.result) if shown else None
+    return render(request, 'eos/analysis_results.html', {
+        'results': analysis_results,
+        'client_charts': bool(analysis_results) and _client_charts(analysis_results),
+        'job': job,
+        'stale': shown is not None and shown.pk != job.pk,
+    })
+
+@require_POST
+def submit_analysis(request):
+    job = AnalysisQueue('missed_hours').submit()
+    return JsonResponse(job_status(job), status=200 if job.status == AnalysisJob.DONE else 202,
+                        json_dumps_params={'ensure_ascii': False})
+
+def analysis_job(request, job_id):
+    job = get_object_or_404(AnalysisJob, pk=job_id)
+    return JsonResponse(job_status(job), json_dumps_params={'ensure_ascii': False})
+
+def _analysis_etag(request):
+    return f"{get_data_version()}-{getattr(settings, 'EOS_PLOT_RENDERER', 'png')}"
+
+@cache_control(no_cache=True)
+@condition(etag_func=_analysis_etag)
+def analysis_api(request):
+    analysis_results = json_results(AnalyticsEngine().run_analysis(Student.objects.all(), 'missed_hours'))
+    statistics = analysis_results.pop('statistics')
+    return JsonResponse(
+        {'modules': list(analysis_results.values()), 'statistics': statistics},
+        json_dumps_params={'ensure_ascii': False},
+    )
+
+@cache_control(no_cache=True)
+@condition(etag_func=_analysis_etag)
+def analysis_cube(request):
+    # Свёртка куба: ?measure=score&by=major,subject&year=1&subject=Math
+    measure = request.GET.get('measure', 'score')
+    by = [dimension for dimension in request.GET.get('by', '').split(',') if dimension]
+    where = {}
+    for dimension in DIMENSIONS:
+        values = request.GET.getlist(dimension)
+        if dimension == 'year':
+            if not all(value.isdigit() for value in values):
+                return HttpResponseBadRequest('Курс должен быть целым числом.')
+            values = [int(value) for value in values]
+        if values:
+            where[dimension] = values
+    try:
+        rollup = CubeStore(Student.objects.all()).cube().rollup(measure, by, where)
+    except ValueError as exc:
+        return HttpResponseBadRequest(str(exc))
+    rows = [
+        dict(zip(by, key if len(by) > 1 else (key,)), value=value)
+        for key, value in rollup.items()
+    ]
+    return JsonResponse({'measure': measure, 'by': by, 'rows': rows}, json_dumps_params={'ensure_ascii': False})
+
+def plot_image(request, digest):
+    # Имя файла — хэш содержимого, поэтому ответ можно кэшировать бессрочно
+    try:
+        # Отданный файл считается недавно использованным и вытесняется последним
+        path = PlotStore().touch(digest)
+        response = FileResponse(open(path, 'rb'), content_type='image/png')
+    except FileNotFoundError:
+        raise Http404('График не найден.')
+    response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
+
+def metrics(request):
+    # Метрики процесса в текстовом формате Prometheus (см. eos/profiling.py)
+    token = getattr(settings, 'EOS_METRICS_TOKEN', '')
+    if token and not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponseForbidden()
+    return HttpResponse(METRICS.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+def export_students(request):
+    # Выгрузка отдаётся потоком: строки читаются из базы по мере отправки клиенту
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return HttpResponseBadRequest(f"Неизвестный формат '{export_format}'.")
+    compress = request.GET.get('gzip') in ('1', 'true')
+    filename = f'students.{export_format}'
+    if compress:
+        filename += '.gz'
+    response = StreamingHttpResponse(
+        StudentExporter().stream(export_format, compress=compress),
+        content_type='application/gzip' if compress else EXPORT_FORMATS[export_format],
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+@require_POST
+def import_students(request):
+    # Файл в формате выгрузки (CSV или JSONL, можно .gz); ответ — отчёт о загрузке
+    upload = request.FILES.get('file')
+    if upload is None:
+        return JsonResponse({'error': 'Не передан файл.'}, status=400)
+    if upload.size > getattr(settings, 'EOS_IMPORT_MAX_UPLOAD_BYTES', 10 * 1024 * 1024):
+        # Большой файл загружается командой import_students, а не в обработчике запроса
+        return JsonResponse({'error': 'Файл слишком большой, используйте manage.py import_students.'}, status=413)
+    name = upload.name.removesuffix('.gz')
+    import_format = request.POST.get('format') or name.rpartition('.')[2]
+    if import_format not in IMPORT_FORMATS:
+        return JsonResponse({'error': f"Неизвестный формат '{import_format}'."}, status=400)
+
+    digest = file_digest(upload.chunks())
+    upload.seek(0)
+    stream = gzip.GzipFile(fileobj=upload) if upload.name.endswith('.gz') else upload
+    try:
+        job = StudentImporter.start(upload.name, digest, import_format, resume=request.POST.get('resume') in ('1', 'true'))
+        StudentImporter().run(io.TextIOWrapper(stream, encoding='utf-8', newline=''), job)
+    except (InvalidImport, OSError, UnicodeDecodeError) as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    return JsonResponse(report(job), json_dumps_params={'ensure_ascii': False})
 
 def create_student(request):
     if request.method == 'POST':
@@ -47,8 +249,10 @@ def edit_student(request, student_id):
         form = StudentEditForm(request.POST, instance=student)
         formset = StudentGradeFormSet(request.POST, instance=student)
         if form.is_valid() and formset.is_valid():
-            form.save()
-            formset.save()
+            # Оценки сохраняются пакетно (BaseStudentGradeFormSet.save)
+            with transaction.atomic():
+                form.save()
+                formset.save()
             return redirect('edit_student', student_id=student.id)
     else:
         form = StudentEditForm(instance=student)
@@ -56,6 +260,8 @@ def edit_student(request, student_id):
     return render(request, 'eos/edit_student.html', {'form': form, 'formset': formset, 'student_id': student_id})
 
 def view_student(request, student_id):
-    student = get_object_or_404(Student, id=student_id)
+    student = get_object_or_404(Student.objects.select_related('summary'), id=student_id)
     grades = student.grades.all()
-    return render(request, 'eos/view_student.html', {'student': student, 'grades': grades, 'student_id': student_id})
+    summary = getattr(student, 'summary', None)
+    return render(request, 'eos/view_student.html',
+                  {'student': student, 'grades': grades, 'summary': summary, 'student_id': student_id})
@@ -0,0 +1,20 @@
+# gunicorn.conf.py
+#
+# Число воркеров gunicorn берёт из WEB_CONCURRENCY. При EOS_GUNICORN_PRELOAD=1
+# приложение загружается в мастер-процессе до создания воркеров, вместе с
+# matplotlib и NumPy: воркеры разделяют эту память с мастером (copy-on-write)
+# и не тратят время на импорт при первом анализе.
+
+import gc
+import os
+
+preload_app = os.getenv('EOS_GUNICORN_PRELOAD', '0') == '1'
+
+
+def when_ready(server):
+    if not server.cfg.preload_app:
+        return
+    from eos.analytics import preload_dependencies
+    preload_dependencies()
+    # Объекты мастера не попадают в сборку мусора воркеров, и их страницы не копируются
+    gc.freeze()
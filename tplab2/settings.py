@@ -46,9 +46,11 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 ]
 
 MIDDLEWARE = [
+    'eos.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -63,7 +65,8 @@ ROOT_URLCONF = 'tplab2.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates с замером времени отрисовки для профилирования запросов
+        'BACKEND': 'eos.profiling.ProfiledDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -147,4 +150,88 @@ STATICFILES_DIRS = [
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 STATIC_ROOT = os.path.join(BASE_DIR, STATIC_URL)
+
+# Размер страницы списка студентов (параметр ?size= ограничен максимумом)
+EOS_STUDENT_PAGE_SIZE = int(os.getenv('EOS_STUDENT_PAGE_SIZE', 50))
+EOS_STUDENT_PAGE_SIZE_MAX = 200
+
+# Поиск студентов: порог сходства слов для опечаток и максимум ранжированных результатов
+EOS_SEARCH_SIMILARITY = float(os.getenv('EOS_SEARCH_SIMILARITY', 0.3))
+EOS_SEARCH_MAX_RESULTS = int(os.getenv('EOS_SEARCH_MAX_RESULTS', 500))
+
+# Массовая загрузка студентов: сколько ошибок по записям хранить в отчёте
+EOS_IMPORT_MAX_ERRORS = int(os.getenv('EOS_IMPORT_MAX_ERRORS', 1000))
+# Загрузка через /import/ выполняется в запросе, поэтому размер файла ограничен;
+# файлы больше EOS_IMPORT_MAX_UPLOAD_BYTES загружаются командой import_students
+EOS_IMPORT_MAX_UPLOAD_BYTES = int(os.getenv('EOS_IMPORT_MAX_UPLOAD_BYTES', 10 * 1024 * 1024))
+
+# Режим выполнения аналитики: 'python' — расчёт в памяти, 'sql' — агрегация в базе данных,
+# 'aggregates' — чтение накопленных агрегатов (поддерживаются только в этом режиме; после его
+# включения их пересобирает manage.py rebuild_analytics_aggregates),
+# 'stream' — расчёт по порциям из EOS_ANALYTICS_CHUNK_SIZE студентов в ограниченной памяти
+EOS_ANALYTICS_BACKEND = os.getenv('EOS_ANALYTICS_BACKEND', 'python')
+EOS_ANALYTICS_CHUNK_SIZE = int(os.getenv('EOS_ANALYTICS_CHUNK_SIZE', 5000))
+
+# Приближённая статистика колонки по скетчам: медиана (KLL) с ошибкой ранга
+# EOS_SKETCH_QUANTILE_ERROR и число различных значений (HyperLogLog) с
+# относительной стандартной ошибкой EOS_SKETCH_DISTINCT_ERROR. Скетчи строятся только при
+# потоковом расчёте ('stream'); в режиме 'sql' статистика (и distinct) считается в базе,
+# в памяти — точно (NumPy), к ней лишь добавляется число различных значений
+EOS_ANALYTICS_APPROXIMATE = os.getenv('EOS_ANALYTICS_APPROXIMATE', '0') == '1'
+EOS_SKETCH_QUANTILE_ERROR = float(os.getenv('EOS_SKETCH_QUANTILE_ERROR', 0.01))
+EOS_SKETCH_DISTINCT_ERROR = float(os.getenv('EOS_SKETCH_DISTINCT_ERROR', 0.02))
+
+# Выполнение /analysis/: 'sync' — в запросе, 'queue' — заданием в очереди AnalysisJob,
+# которое выполняет manage.py analysis_worker (страница опрашивает состояние задания).
+# Режим 'queue' требует общего кэша (EOS_CACHE_BACKEND), см. проверку eos.E001.
+# Задание, воркер которого не отмечался дольше EOS_ANALYSIS_JOB_TIMEOUT секунд, возвращается в очередь,
+# завершённые задания хранятся EOS_ANALYSIS_JOB_RETENTION секунд
+EOS_ANALYSIS_MODE = os.getenv('EOS_ANALYSIS_MODE', 'sync')
+EOS_ANALYSIS_JOB_TIMEOUT = int(os.getenv('EOS_ANALYSIS_JOB_TIMEOUT', 600))
+EOS_ANALYSIS_JOB_RETENTION = int(os.getenv('EOS_ANALYSIS_JOB_RETENTION', 86400))
+
+# Исполнитель модулей аналитики: 'serial', 'thread' или 'process'.
+# В режимах 'thread' и 'process' графики строятся в пуле процессов.
+EOS_ANALYTICS_EXECUTOR = os.getenv('EOS_ANALYTICS_EXECUTOR', 'serial')
+EOS_ANALYTICS_WORKERS = int(os.getenv('EOS_ANALYTICS_WORKERS', 2))
+
+# Способ построения графиков: 'png' — изображения на сервере (base64 в HTML),
+# 'url' — изображения на диске по постоянным адресам, 'json' — данные для отрисовки в браузере
+EOS_PLOT_RENDERER = os.getenv('EOS_PLOT_RENDERER', 'png')
+
+# Дисковый кэш графиков для режима 'url': файлы из EOS_PLOT_CACHE_ROOT отдаются
+# по адресу /plots/<хэш>.png с бессрочным кэшированием
+EOS_PLOT_CACHE_ROOT = Path(os.getenv('EOS_PLOT_CACHE_ROOT', BASE_DIR / 'plotcache'))
+EOS_PLOT_CACHE_MAX_BYTES = int(os.getenv('EOS_PLOT_CACHE_MAX_BYTES', 200 * 1024 * 1024))
+EOS_PLOT_URL = '/plots/'
+
+# Кэш результатов анализа. Ключи включают версию данных из базы (DataVersion), поэтому
+# изменения видны всем процессам. LocMemCache хранит данные в памяти одного процесса, и
+# каждый воркер считает результат заново; при нескольких воркерах gunicorn стоит указать общий кэш, например
+# EOS_CACHE_BACKEND=django.core.cache.backends.redis.RedisCache и EOS_CACHE_LOCATION=redis://...
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('EOS_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('EOS_CACHE_LOCATION', 'eos'),
+        'TIMEOUT': int(os.getenv('EOS_CACHE_TIMEOUT', 600)),
+        'OPTIONS': {
+            # При превышении числа записей часть из них вытесняется
+            'MAX_ENTRIES': int(os.getenv('EOS_CACHE_MAX_ENTRIES', 300)),
+        },
+    }
+}
+
+EOS_ANALYSIS_CACHE_ENABLED = os.getenv('EOS_ANALYSIS_CACHE_ENABLED', '1') == '1'
+EOS_ANALYSIS_CACHE_ALIAS = 'default'
+EOS_ANALYSIS_CACHE_TIMEOUT = int(os.getenv('EOS_ANALYSIS_CACHE_TIMEOUT', 600))
+
+# Профилирование запросов (eos/profiling.py): длительность учитывается для всех запросов,
+# подробный профиль (SQL, шаблон, модули аналитики) — для доли EOS_PROFILING_SAMPLE_RATE.
+# Запросы дольше EOS_SLOW_REQUEST_MS мс записываются в журнал. Метрики отдаются по /metrics;
+# если задан EOS_METRICS_TOKEN, нужен заголовок Authorization: Bearer <токен>
+EOS_PROFILING_ENABLED = os.getenv('EOS_PROFILING_ENABLED', '1') == '1'
+EOS_PROFILING_SAMPLE_RATE = float(os.getenv('EOS_PROFILING_SAMPLE_RATE', 0.1))
+EOS_SLOW_REQUEST_MS = int(os.getenv('EOS_SLOW_REQUEST_MS', 1000))
+EOS_METRICS_TOKEN = os.getenv('EOS_METRICS_TOKEN', '')
+
 django_heroku.settings(locals())
\ No newline at end of file